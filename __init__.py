@@ -1,3 +1,8 @@
-from .agent import trip_planner_supervisor as root_agent
+def __getattr__(name):
+    # Resolved lazily so importing the package doesn't build every agent
+    if name == "root_agent":
+        from .agent import get_trip_planner_supervisor
+        return get_trip_planner_supervisor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["root_agent"]
\ No newline at end of file
+__all__ = ["root_agent"]
@@ -1,9 +1,10 @@
 """
 Simplified bridge - no ADK imports needed
 """
+import copy
 from typing import Dict, Any, Optional
 from loguru import logger
-from core.db import db_manager
+from core.db import db_manager, merge_state_changes
 from core.models import Booking
 from datetime import datetime
 
@@ -44,9 +45,20 @@ class ADKDatabaseBridge:
             logger.error(f"❌ Sync user failed: {e}")
             return None
     
-    async def sync_session_from_adk(self, app_name: str, adk_user_id: str, 
-                                   session_id: str, state: Dict[str, Any]) -> bool:
-        """Sync session to custom DB"""
+    async def load_session_state(self, session_id: str) -> Dict[str, Any]:
+        """Copy of the stored state, to pass back as ``base_state`` when the turn is synced"""
+        session = await self.db.get_session(session_id)
+        return copy.deepcopy(session.state) if session else {}
+
+    async def sync_session_from_adk(self, app_name: str, adk_user_id: str,
+                                   session_id: str, state: Dict[str, Any],
+                                   base_state: Dict[str, Any]) -> bool:
+        """
+        Sync session to custom DB
+
+        ``base_state`` is the state the turn started from (see
+        load_session_state); only the keys the turn changed are written.
+        """
         try:
             db_user_id = await self.sync_user_from_state(state)
             if not db_user_id:
@@ -55,9 +67,11 @@ class ADKDatabaseBridge:
             existing_session = await self.db.get_session(session_id)
             
             if existing_session:
-                existing_session.state = state
-                existing_session.last_active = datetime.now()
-                await self.db.update_session(existing_session)
+                # Compare-and-swap merge of this turn's changes only, so keys another
+                # writer changed in the meantime are kept
+                await self.db.mutate_session_state(
+                    session_id, lambda stored: merge_state_changes(stored, base_state, state)
+                )
             else:
                 # Create better session name
                 session_name = state.get('session_name')
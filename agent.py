@@ -1,22 +1,9 @@
-from google.adk.agents import Agent
 from google.adk.runners import Runner
-from sub_agents.accommodation_agent.agent import accommodation_agent
-from sub_agents.travel_agent.agent import travel_agent
-from sub_agents.sightseeing_agent.agent import sightseeing_agent
-from sub_agents.conflict_checker_agent.agent import conflict_checker_agent
-from sub_agents.conversation_agent.agent import convo_agent
-from sub_agents.billing_agent.agent import billing_agent  # ✅ ADD THIS
-from tools.search_tool import perform_search
-from trip_tools.ui_tools import identify_user, list_user_sessions, get_current_user_info
 from core.rate_limiter import gemini_rate_limiter
 from loguru import logger
 import time
 
-trip_planner_supervisor = Agent(
-    name="trip_supervisor",
-    model="gemini-2.0-flash-exp",
-    description="Supervisor agent coordinating all trip planning sub-agents with user management.",
-    instruction="""
+SUPERVISOR_INSTRUCTION = """
 You are the trip planning supervisor. USER IDENTIFICATION IS MANDATORY BEFORE ANY TRIP PLANNING.
 
 **CRITICAL: ALWAYS USE THE identify_user TOOL - DO NOT JUST RESPOND WITH TEXT!**
@@ -46,38 +33,95 @@ Only after user_id exists in state:
 - Route to billing_agent for bill/cost calculations  ← ADD THIS
 - Route to convo_agent for general questions
 
+**WHOLE-TRIP BOOKINGS AND CANCELLATIONS:**
+- When the user wants to book everything at once ("book my whole trip"), call book_itinerary
+- When the user wants to cancel the whole trip, call cancel_trip
+- Both handle all bookings in one call and send one email - do not call the per-item tools instead
+- If the user asks for the email right away, pass email_now=True; otherwise pass email_now=False
+
 **BILLING QUERIES:**
 When user asks about costs, bills, or totals:
 - Route to billing_agent
 - Examples: "What's my total?", "Calculate bill", "Show costs"
 
 Remember: ALWAYS call the tool, don't just respond with text!
-""",
-    sub_agents=[
-        convo_agent,
-        accommodation_agent,
-        travel_agent,
-        sightseeing_agent,
-        conflict_checker_agent,
-        billing_agent  # ✅ ADD THIS
-    ],
-    tools=[
-        perform_search, 
-        identify_user,
-        list_user_sessions,
-        get_current_user_info
-    ]
-)
+"""
+
+_trip_planner_supervisor = None
+
+def get_trip_planner_supervisor():
+    """
+    Build the supervisor and its sub-agents on first use.
+
+    Importing this module stays cheap: the sub-agent modules (and the tool,
+    DB and notification modules they pull in) are only imported when an agent
+    is actually needed. ``agent.trip_planner_supervisor`` still works and
+    resolves through this function.
+    """
+    global _trip_planner_supervisor
+    if _trip_planner_supervisor is None:
+        _trip_planner_supervisor = _build_trip_planner_supervisor()
+    return _trip_planner_supervisor
+
+def __getattr__(name):
+    if name == "trip_planner_supervisor":
+        return get_trip_planner_supervisor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _build_trip_planner_supervisor():
+    from google.adk.agents import Agent
+    from tools.llm_interface import resolve_model
+    from sub_agents.accommodation_agent.agent import accommodation_agent
+    from sub_agents.travel_agent.agent import travel_agent
+    from sub_agents.sightseeing_agent.agent import sightseeing_agent
+    from sub_agents.conflict_checker_agent.agent import conflict_checker_agent
+    from sub_agents.conversation_agent.agent import convo_agent
+    from sub_agents.billing_agent.agent import billing_agent
+    from tools.search_tool import perform_search
+    from trip_tools.ui_tools import identify_user, list_user_sessions, get_current_user_info
+    from trip_tools.batch_tools import book_itinerary, cancel_trip
+    from core.tracing import instrument_agent
+
+    return instrument_agent(Agent(
+        name="trip_supervisor",
+        model=resolve_model("gemini-2.0-flash-exp"),
+        description="Supervisor agent coordinating all trip planning sub-agents with user management.",
+        instruction=SUPERVISOR_INSTRUCTION,
+        sub_agents=[
+            convo_agent,
+            accommodation_agent,
+            travel_agent,
+            sightseeing_agent,
+            conflict_checker_agent,
+            billing_agent  # ✅ ADD THIS
+        ],
+        tools=[
+            perform_search, 
+            identify_user,
+            list_user_sessions,
+            get_current_user_info,
+            book_itinerary,
+            cancel_trip
+        ]
+    ))
 
 class TripPlannerRunner(Runner):
     def __init__(self, session_service):
         super().__init__(
             app_name="trip_planner",
-            agent=trip_planner_supervisor,
+            agent=get_trip_planner_supervisor(),
             session_service=session_service
         )
         logger.info("✅ TripPlannerRunner initialized with per-session rate limiting")
-    
+
+    async def run_async(self, *, user_id: str, session_id: str, new_message, **kwargs):
+        """Rate-limit each turn per session (without blocking other sessions), then run it"""
+        await gemini_rate_limiter.acquire(session_id=session_id)
+        async for event in super().run_async(
+            user_id=user_id, session_id=session_id, new_message=new_message, **kwargs
+        ):
+            yield event
+
     async def run(self, user_input: str, session_id: str):
         """Override run to add per-session rate limiting"""
         
@@ -0,0 +1,3 @@
+"""
+Standalone benchmark and load-test runners for the trip planner
+"""
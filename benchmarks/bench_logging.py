@@ -0,0 +1,142 @@
+"""
+Per-turn logging overhead: loguru's default handler vs core.logging_config
+
+Runs the load-test conversation turn by turn through SessionMultiplexer with
+the fake model at zero latency, so a turn is nothing but orchestration,
+tools, DB and logging. The same turns are timed under each logging setup:
+
+    off              no handlers (the floor)
+    default          loguru's stock handler: DEBUG, text, written on the calling thread
+    configured       configure_logging(): INFO, enqueued writer
+    configured-json  the same with JSON lines
+
+Every setup writes to a file in a temporary directory (a terminal would
+measure the terminal), and the setups take turns conversation by
+conversation. The table shows the median and p95 turn time, the overhead over
+``off``, and the cost of a single log call at INFO (written) and DEBUG
+(dropped by the configured setups); the run is written to benchmarks/results/.
+
+Usage:
+    python -m benchmarks.bench_logging [--conversations 20] [--iterations 5000] [--modes off default configured configured-json]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import measure_latencies, percentile, print_table, write_results
+from benchmarks.load_test import CONVERSATION
+
+MODES = ("off", "default", "configured", "configured-json")
+
+
+def _set_logging(mode: str, path: str) -> None:
+    from loguru import logger
+    from core.logging_config import LoggingSettings, configure_logging
+
+    logger.remove()
+    if mode == "default":
+        # What ``from loguru import logger`` gives you, pointed at a file
+        logger.add(path, level="DEBUG", enqueue=False)
+    elif mode != "off":
+        configure_logging(LoggingSettings(json=mode == "configured-json", sink=path))
+
+
+async def _conversation(multiplexer, n: int) -> List[float]:
+    from core.db import db_manager
+
+    email = f"logbench{n}-{time.time_ns()}@example.com"
+    user = await db_manager.create_user(name=f"Log Bench {n}", email=email)
+    session = await db_manager.create_session(user.user_id)
+    latencies = []
+    for template in CONVERSATION:
+        started = time.perf_counter()
+        await multiplexer.run_turn(user.user_id, session.session_id, template.format(email=email, n=n))
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _record_costs(mode: str, path: str, iterations: int) -> Dict[str, float]:
+    """Microseconds per enabled (INFO) and disabled-by-default (DEBUG) log call"""
+    from loguru import logger
+
+    details = {"location": "Jaipur", "check_in": "2025-12-28", "nights": 3, "total_price": 7500}
+    _set_logging(mode, path)
+    info = measure_latencies(lambda: logger.info("✅ Saved booking {}: {}", "HTL-JAI-1A2B", details), iterations)
+    debug = measure_latencies(lambda: logger.debug("💰 Indexed {} price candidate(s)", 12), iterations)
+    logger.remove()
+    return {"info_call_us": info["mean_us"], "debug_call_us": debug["mean_us"]}
+
+
+async def _run(args) -> List[Dict]:
+    from google.adk.sessions import InMemorySessionService
+    from loguru import logger
+    from agent import TripPlannerRunner
+    from core.rate_limiter import gemini_rate_limiter
+    from core.serving import SessionMultiplexer
+    from tools.fake_llm import FakeModelConfig, fake_backend
+
+    fake_backend.configure(FakeModelConfig(latency_ms=0, seed=args.seed))
+    # The per-session limiter would dominate back-to-back turns
+    gemini_rate_limiter.calls_per_minute = 10 ** 9
+    gemini_rate_limiter.second_interval = 0.0
+    multiplexer = SessionMultiplexer(TripPlannerRunner(InMemorySessionService()))
+
+    latencies = {mode: [] for mode in args.modes}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {mode: os.path.join(tmp, f"{mode}.log") for mode in args.modes}
+        _set_logging("off", "")
+        await _conversation(multiplexer, -1)  # warm-up
+        # Modes take turns conversation by conversation, so drift (a growing
+        # database, a warming cache) is spread evenly across them
+        for n in range(args.conversations):
+            for mode in args.modes:
+                _set_logging(mode, paths[mode])
+                latencies[mode] += await _conversation(multiplexer, n)
+                await logger.complete()
+        logger.remove()  # flushes enqueued writers
+        log_bytes = {mode: os.path.getsize(path) if os.path.exists(path) else 0 for mode, path in paths.items()}
+        costs = {mode: _record_costs(mode, os.path.join(tmp, f"{mode}-calls.log"), args.iterations)
+                 for mode in args.modes}
+
+    floor = statistics.median(latencies["off"]) if "off" in latencies else None
+    rows = []
+    for mode in args.modes:
+        median = statistics.median(latencies[mode])
+        rows.append({
+            "mode": mode,
+            "turns": len(latencies[mode]),
+            "median_ms": median * 1000,
+            "p95_ms": percentile(latencies[mode], 95) * 1000,
+            "overhead_ms": (median - floor) * 1000 if floor is not None else float("nan"),
+            "log_bytes_per_turn": log_bytes[mode] / len(latencies[mode]),
+            **costs[mode],
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-turn logging overhead")
+    parser.add_argument("--conversations", type=int, default=20, help=f"conversations of {len(CONVERSATION)} turns")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--iterations", type=int, default=5000, help="calls per log-call measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/logging-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TRIP_DB_PATH"] = os.path.join(tmp, "trip_planner.db")
+        os.environ["TRIP_MODEL_BACKEND"] = "fake"
+        rows = asyncio.run(_run(args))
+
+    print_table("Per-turn logging overhead (fake model, zero latency)", rows)
+    path = write_results("logging", rows, {"conversations": args.conversations,
+                                                 "iterations": args.iterations}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
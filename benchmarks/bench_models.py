@@ -0,0 +1,153 @@
+"""
+Benchmark row-to-model decoding and per-object memory for core.models
+
+Compares the slotted models (eager and lazy JSON decoding) against the
+previous plain-dataclass layout decoded field by field. Lazy objects share
+the row's JSON string in this benchmark, so their bytes/object excludes the
+raw payload they keep alive until first access.
+
+Usage:
+    python -m benchmarks.bench_models [--rows 2000] [--history 20]
+"""
+import argparse
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Optional, Dict, Any
+
+from core.models import User, Session, Booking
+from benchmarks.common import measure_throughput, measure_bytes_per_object, print_table
+
+
+# Previous (unslotted) layout, kept here only as the comparison baseline
+@dataclass
+class LegacyUser:
+    user_id: str
+    name: str
+    email: Optional[str]
+    created_at: datetime
+
+
+@dataclass
+class LegacySession:
+    session_id: str
+    user_id: str
+    created_at: datetime
+    last_active: datetime
+    state: Dict[str, Any]
+
+
+@dataclass
+class LegacyBooking:
+    booking_id: str
+    user_id: str
+    session_id: str
+    booking_type: str
+    details: Dict[str, Any]
+    created_at: datetime
+    status: str
+
+
+def build_rows(history: int):
+    """Create one realistic row per table in an in-memory SQLite database"""
+    now = datetime.now(UTC).isoformat()
+    details = {
+        "from": "Delhi", "to": "Jaipur", "date": "2025-12-28", "mode": "train",
+        "transport_name": "Shatabdi Express", "price": 750, "ticket_id": "PNR-2BU6QU"
+    }
+    state = {
+        "user_id": "u-1", "user_name": "Traveler", "user_email": "traveler@example.com",
+        "trip_plan": {"travel": details},
+        "interaction_history": [
+            {"action": "user_query", "query": f"message {i} about my trip to Jaipur",
+             "timestamp": "2025-12-01 10:00:00"}
+            for i in range(history)
+        ],
+    }
+
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    user_row = conn.execute(
+        "SELECT ? AS user_id, ? AS name, ? AS email, ? AS created_at",
+        ("u-1", "Traveler", "traveler@example.com", now)
+    ).fetchone()
+    session_row = conn.execute(
+        "SELECT ? AS session_id, ? AS user_id, ? AS created_at, ? AS last_active, ? AS state, ? AS version",
+        ("s-1", "u-1", now, now, json.dumps(state), 1)
+    ).fetchone()
+    booking_row = conn.execute(
+        "SELECT ? AS booking_id, ? AS user_id, ? AS session_id, ? AS booking_type, "
+        "? AS details, ? AS created_at, ? AS status",
+        ("PNR-2BU6QU", "u-1", "s-1", "travel", json.dumps(details), now, "confirmed")
+    ).fetchone()
+    return user_row, session_row, booking_row
+
+
+def legacy_user(row):
+    return LegacyUser(
+        user_id=row['user_id'],
+        name=row['name'],
+        email=row['email'],
+        created_at=datetime.fromisoformat(row['created_at'])
+    )
+
+
+def legacy_session(row):
+    return LegacySession(
+        session_id=row['session_id'],
+        user_id=row['user_id'],
+        created_at=datetime.fromisoformat(row['created_at']),
+        last_active=datetime.fromisoformat(row['last_active']),
+        state=json.loads(row['state'])
+    )
+
+
+def legacy_booking(row):
+    return LegacyBooking(
+        booking_id=row['booking_id'],
+        user_id=row['user_id'],
+        session_id=row['session_id'],
+        booking_type=row['booking_type'],
+        details=json.loads(row['details']),
+        created_at=datetime.fromisoformat(row['created_at']),
+        status=row['status']
+    )
+
+
+def run(rows: int, history: int):
+    user_row, session_row, booking_row = build_rows(history)
+
+    cases = [
+        ("User (legacy)", lambda: legacy_user(user_row)),
+        ("User (slotted)", lambda: User.from_row(user_row)),
+        ("Session (legacy)", lambda: legacy_session(session_row)),
+        ("Session (slotted)", lambda: Session.from_row(session_row)),
+        ("Session (slotted, lazy)", lambda: Session.from_row(session_row, lazy=True)),
+        ("Booking (legacy)", lambda: legacy_booking(booking_row)),
+        ("Booking (slotted)", lambda: Booking.from_row(booking_row)),
+        ("Booking (slotted, lazy)", lambda: Booking.from_row(booking_row, lazy=True)),
+    ]
+
+    results = []
+    for name, factory in cases:
+        results.append({
+            "model": name,
+            "objects/sec": measure_throughput(factory, rows),
+            "bytes/object": measure_bytes_per_object(factory, count=rows),
+        })
+
+    print_table(f"📦 MODEL DECODING ({rows} rows, {history} history entries per session)", results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="objects built per measurement")
+    parser.add_argument("--history", type=int, default=20, help="interaction_history entries in session state")
+    args = parser.parse_args()
+    run(args.rows, args.history)
+
+
+if __name__ == "__main__":
+    main()
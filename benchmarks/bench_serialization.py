@@ -0,0 +1,88 @@
+"""
+Benchmark the session-state codecs in core.serialization
+
+Builds realistic session states with long interaction histories and measures
+encode/decode throughput and stored size for every codec that is installed.
+
+Usage:
+    python -m benchmarks.bench_serialization [--history 50 200 1000]
+"""
+import argparse
+
+from core.serialization import SERIALIZERS, get_serializer, decode
+from benchmarks.common import measure_throughput, print_table
+
+
+def build_state(history: int) -> dict:
+    """A session state shaped like the ones the agents accumulate"""
+    travel = {
+        "from": "Delhi", "to": "Jaipur", "date": "2025-12-28", "mode": "train",
+        "transport_name": "Shatabdi Express", "price": 750, "ticket_id": "PNR-2BU6QU"
+    }
+    accommodation = {
+        "location": "Jaipur", "check_in": "2025-12-28", "check_out": "2025-12-30",
+        "nights": 2, "budget": 2500, "total_price": 5000,
+        "booking_id": "HTL-JAI-20251228-1A2B3C4D"
+    }
+    interaction_history = []
+    for i in range(history):
+        interaction_history.append({
+            "action": "user_query",
+            "query": f"Can you find me a hotel near Hawa Mahal for night {i}? Budget ₹2500 per night.",
+            "timestamp": "2025-12-01 10:00:00"
+        })
+        interaction_history.append({
+            "action": "agent_response",
+            "agent": "accommodation_agent",
+            "response": "✅ **Hotel booking confirmed!**\n\n🏨 Location: Jaipur\n" * 4,
+            "timestamp": "2025-12-01 10:00:05"
+        })
+    return {
+        "user_id": "2f0c6a8e-8d7b-4bb2-9a57-1f6f3f2d9b11",
+        "user_name": "Traveler",
+        "user_email": "traveler@example.com",
+        "trip_plan": {"travel": travel, "accommodation": accommodation},
+        "cancelled_bookings": [
+            {"type": "travel", "booking_id": f"PNR-OLD{i}", "details": travel,
+             "cancelled_at": "2025-11-30T09:00:00"}
+            for i in range(5)
+        ],
+        "conversation_result": "Top places to visit in Jaipur: Amber Fort (₹500), City Palace (₹700). " * 20,
+        "interaction_history": interaction_history,
+    }
+
+
+def run(histories, iterations: int):
+    results = []
+    for history in histories:
+        state = build_state(history)
+        for name in SERIALIZERS:
+            try:
+                codec = get_serializer(name)
+            except RuntimeError:
+                print(f"⚠️ Skipping {name}: package not installed")
+                continue
+            encoded = codec.encode(state)
+            assert decode(encoded) == state
+            results.append({
+                "history": history,
+                "codec": name,
+                "size (bytes)": len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded),
+                "encode/sec": measure_throughput(lambda: codec.encode(state), iterations),
+                "decode/sec": measure_throughput(lambda: decode(encoded), iterations),
+            })
+    print_table("🗜️ SESSION STATE CODECS", results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[50, 200, 1000],
+                        help="interaction_history turn counts to benchmark")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    run(args.history, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
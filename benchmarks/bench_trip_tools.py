@@ -0,0 +1,167 @@
+"""
+Benchmark the trip_tools hot paths over generated session states
+
+Every tool the agents call on a turn is timed call by call against states of
+increasing size: the interaction history, the last search result (and the
+price index built from it) and the cancelled-bookings list all grow with
+``--sizes``. Email notifications are replaced by a stub that returns at once,
+so ``book_*`` timings cover only the tool's own work. The ``book_*`` rows clear
+the booking dedup index first so every call is a fresh booking; the
+``*_retry`` rows time a repeated call answered from that index.
+
+Each run is written to benchmarks/results/ as JSON (commit, platform and
+parameters included). Pass ``--compare`` with an earlier file to see the
+change per benchmark; the run exits non-zero when any benchmark's mean got
+slower by more than ``--threshold``, so it can gate a deploy.
+
+Usage:
+    python -m benchmarks.bench_trip_tools [--sizes 10 100 1000] [--iterations 500]
+        [--compare benchmarks/results/trip_tools-<timestamp>.json] [--threshold 0.2]
+"""
+import argparse
+import asyncio
+import copy
+import random
+import sys
+from datetime import datetime, UTC
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.common import compare_results, measure_latencies, print_table, write_results
+
+CITIES = ("Delhi", "Jaipur", "Agra", "Goa", "Mumbai", "Udaipur", "Varanasi", "Kochi")
+MODES = ("train", "flight", "bus")
+
+TRAVEL_INPUT = "Book a train from Delhi to Jaipur on December 28 by Shatabdi Express for ₹750"
+ACCOMMODATION_INPUT = "Book a hotel in Jaipur from December 28 for 3 nights at ₹2500 per night"
+SIGHTSEEING_INPUT = "Plan sightseeing in Jaipur on December 29 with a budget of ₹500"
+RAW_RESPONSE = "Your train from Delhi to Jaipur on 2025-12-28 is confirmed."
+
+
+def build_state(size: int, seed: int = 0) -> Dict:
+    """A session state as the tools leave it after ``size`` turns"""
+    rng = random.Random(seed)
+    search_lines = []
+    for i in range(size):
+        origin, destination = rng.sample(CITIES, 2)
+        search_lines.append(
+            f"- {origin} to {destination} by {rng.choice(MODES)}: typically ₹{rng.randint(400, 6000)}, about {rng.randint(1, 16)}h."
+            if i % 2 else f"- Hotels in {destination}: typically ₹{rng.randint(800, 3000)} to ₹{rng.randint(3000, 12000)} per night."
+        )
+    return {
+        "user_id": "bench-user", "user_name": "Bench Traveler", "user_email": "bench@example.com",
+        "last_user_message": TRAVEL_INPUT,
+        "conversation_result": "\n".join(search_lines),
+        "interaction_history": [
+            {"action": "user_query", "query": f"question {i} about Jaipur", "timestamp": datetime.now(UTC).isoformat()}
+            if i % 2 == 0 else
+            {"action": "agent_response", "agent": "travel_agent", "response": "Here is what I found. " * 10}
+            for i in range(size)
+        ],
+        "cancelled_bookings": [
+            {"type": "travel", "booking_id": f"PNR-{i:06d}", "cancelled_at": datetime.now(UTC).isoformat(),
+             "details": {"from": "Delhi", "to": "Agra", "date": "2025-12-01", "mode": "train", "price": 690}}
+            for i in range(size // 10)
+        ],
+        "total_budget": 50_000,
+        "trip_plan": {
+            "travel": {"from": "Delhi", "to": "Jaipur", "date": "2025-12-28", "mode": "train",
+                       "transport_name": "Shatabdi Express", "price": 750, "ticket_id": "PNR-2BU6QU"},
+            "accommodation": {"location": "Jaipur", "check_in": "2025-12-28", "check_out": "2025-12-31",
+                              "nights": 3, "budget": 2500, "total_price": 7500, "booking_id": "HTL-JAI-20251228-1A2B3C4D"},
+            "sightseeing": {"location": "Jaipur", "date": "2025-12-29", "budget": 500,
+                            "booking_id": "SSG-JAI-20251229-5E6F7A8B"},
+        },
+    }
+
+
+async def _stub_notification(**kwargs) -> Dict:
+    return {"email_sent": True, "sms_sent": False}
+
+
+def _suite(state: Dict) -> List[Tuple[str, Callable[[], object]]]:
+    from core.response_formatter import format_booking_response
+    from trip_tools.accom_tools import book_accommodation, check_accommodation_state, parse_accommodation_details
+    from trip_tools.billing_tools import calculate_total_bill
+    from trip_tools.common import list_active_bookings
+    from trip_tools.conflict_tools import check_trip_conflicts
+    from trip_tools.idempotency import STATE_KEY as DEDUP_STATE_KEY
+    from trip_tools.price_index import index_search_result
+    from trip_tools.sightseeing_tools import book_sightseeing, check_sightseeing_state, parse_sightseeing_details
+    from trip_tools.travel_tools import book_travel, check_travel_state, parse_travel_details
+
+    context = SimpleNamespace(state=copy.deepcopy(state))
+    index_search_result(context.state, context.state["conversation_result"])
+    # check_trip_conflicts iterates sightseeing as a list of activities
+    conflicts_context = SimpleNamespace(state=copy.deepcopy(context.state))
+    conflicts_context.state["trip_plan"]["sightseeing"] = [
+        {**state["trip_plan"]["sightseeing"], "entry_fee": 500}
+    ]
+    loop = asyncio.new_event_loop()
+    run = loop.run_until_complete
+
+    def fresh(booking):
+        context.state.pop(DEDUP_STATE_KEY, None)
+        return run(booking(context))
+
+    return [
+        ("parse_travel_details", lambda: parse_travel_details(context, TRAVEL_INPUT)),
+        ("parse_accommodation_details", lambda: parse_accommodation_details(context, ACCOMMODATION_INPUT)),
+        ("parse_sightseeing_details", lambda: parse_sightseeing_details(context, SIGHTSEEING_INPUT)),
+        ("check_travel_state", lambda: check_travel_state(context)),
+        ("check_accommodation_state", lambda: check_accommodation_state(context)),
+        ("check_sightseeing_state", lambda: check_sightseeing_state(context)),
+        ("book_travel", lambda: fresh(book_travel)),
+        ("book_accommodation", lambda: fresh(book_accommodation)),
+        ("book_sightseeing", lambda: fresh(book_sightseeing)),
+        ("book_travel_retry", lambda: run(book_travel(context))),
+        ("index_search_result", lambda: index_search_result(context.state, context.state["conversation_result"])),
+        ("calculate_total_bill", lambda: calculate_total_bill(context)),
+        ("check_trip_conflicts", lambda: check_trip_conflicts(conflicts_context)),
+        ("list_active_bookings", lambda: list_active_bookings(context)),
+        ("format_booking_response", lambda: format_booking_response(context.state, RAW_RESPONSE)),
+    ]
+
+
+def run(sizes: List[int], iterations: int) -> List[Dict]:
+    from core.notifications import notification_service
+    notification_service.send_booking_notification = _stub_notification
+    notification_service.send_cancellation_notification = _stub_notification
+
+    rows = []
+    for size in sizes:
+        for name, fn in _suite(build_state(size)):
+            rows.append({"benchmark": name, "size": size, **measure_latencies(fn, iterations)})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark trip_tools over growing session states")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="history entries / search result lines per state")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/trip_tools-<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+    logger.remove()  # the tools log every call
+
+    rows = run(args.sizes, args.iterations)
+    print_table("trip_tools hot paths (per call)", rows)
+    path = write_results("trip_tools", rows, {"sizes": args.sizes, "iterations": args.iterations}, args.output)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        comparison, regressions = compare_results(rows, args.compare, key=("benchmark", "size"),
+                                                  threshold=args.threshold)
+        print_table(f"Mean latency (us) vs {args.compare}", comparison)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Shared helpers for the benchmark runners
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, UTC
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def measure_throughput(fn: Callable[[], Any], iterations: int, repeat: int = 3) -> float:
+    """Return the best-of-``repeat`` rate of ``fn`` calls per second"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return iterations / best if best > 0 else float("inf")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (0 when empty)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure_latencies(fn: Callable[[], Any], iterations: int, warmup: int = 10) -> Dict[str, float]:
+    """Time ``iterations`` individual calls of ``fn``; returns ops/s and mean/p50/p95/p99 in microseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    return {
+        "ops_per_s": iterations / total if total > 0 else float("inf"),
+        "mean_us": total / iterations * 1e6,
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p95_us": percentile(samples, 95) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+    }
+
+
+def write_results(suite: str, rows: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None,
+                  path: Optional[str] = None) -> str:
+    """Save benchmark rows with run metadata as JSON; returns the file path"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    timestamp = datetime.now(UTC)
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{timestamp.strftime('%Y%m%dT%H%M%SZ')}.json")
+    payload = {
+        "suite": suite,
+        "timestamp": timestamp.isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params or {},
+        "results": rows,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def compare_results(rows: List[Dict[str, Any]], baseline_path: str, key: Tuple[str, ...],
+                    metric: str = "mean_us", threshold: float = 0.2) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Compare ``rows`` with a saved run on ``metric`` (lower is better)
+
+    Returns:
+        (comparison rows, names of benchmarks more than ``threshold`` slower)
+    """
+    with open(baseline_path) as f:
+        baseline = {tuple(r[k] for k in key): r for r in json.load(f)["results"]}
+    comparison, regressions = [], []
+    for row in rows:
+        name = "/".join(str(row[k]) for k in key)
+        before = baseline.get(tuple(row[k] for k in key))
+        if before is None or not before.get(metric):
+            comparison.append({"benchmark": name, "baseline": "-", "current": row[metric], "change_%": "-"})
+            continue
+        change = row[metric] / before[metric] - 1
+        comparison.append({"benchmark": name, "baseline": before[metric], "current": row[metric],
+                           "change_%": change * 100})
+        if change > threshold:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def measure_bytes_per_object(factory: Callable[[], Any], count: int = 10_000) -> float:
+    """Return the average traced allocation size of objects built by ``factory``"""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        objects = [factory() for _ in range(count)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # The list itself holds one pointer per object; don't charge it to them
+    list_overhead = objects.__sizeof__()
+    return (after - before - list_overhead) / count
+
+
+def print_table(title: str, rows: List[Dict[str, Any]]) -> None:
+    """Print benchmark rows as an aligned table"""
+    print("\n" + "=" * 80)
+    print(title)
+    print("=" * 80)
+    if not rows:
+        print("(no results)")
+        return
+    columns = list(rows[0].keys())
+    widths = {
+        col: max(len(col), *(len(_fmt(row[col])) for row in rows))
+        for col in columns
+    }
+    print("  ".join(col.ljust(widths[col]) for col in columns))
+    print("  ".join("-" * widths[col] for col in columns))
+    for row in rows:
+        print("  ".join(_fmt(row[col]).ljust(widths[col]) for col in columns))
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    return str(value)
@@ -0,0 +1,238 @@
+"""
+Load generator for DatabaseManager
+
+Populates a database with ``--users`` users, ``--sessions-per-user``
+sessions each, ``--bookings-per-session`` bookings and ``--history``
+interaction-history entries per session, then replays a realistic operation
+mix against it for ``--duration`` seconds:
+
+    login     get_user_by_email + update_user_login
+    resume    list_user_sessions + get_session
+    update    mutate_session_state (append a history entry)
+    booking   save_booking
+    bill      get_session_bill
+
+``--concurrency`` worker threads each run their own event loop and their own
+DatabaseManager on the shared file, the way separate worker processes do in
+production (SQLite releases the GIL while it works, so the threads really
+contend for the file). Reports ops/s and p50/p95/p99 latency per operation,
+and writes the run to benchmarks/results/ as JSON.
+
+With ``--db`` the file is kept, and an already populated file is replayed
+as is, so one population can be measured against several schema or index
+changes.
+
+Usage:
+    python -m benchmarks.db_load [--users 1000] [--sessions-per-user 3] [--bookings-per-session 4]
+        [--history 20] [--concurrency 4] [--duration 10]
+        [--mix login=1,resume=2,update=5,booking=1,bill=1] [--db path/to/trip_planner.db]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Dict, List, Tuple
+
+from benchmarks.common import percentile, print_table, write_results
+
+OPERATIONS = ("login", "resume", "update", "booking", "bill")
+DEFAULT_MIX = "login=1,resume=2,update=5,booking=1,bill=1"
+BOOKING_TYPES = (
+    ("travel", lambda rng: {"from": "Delhi", "to": "Jaipur", "mode": "train", "price": rng.randint(400, 6000)}),
+    ("accommodation", lambda rng: {"location": "Jaipur", "nights": 2, "total_price": rng.randint(1500, 20000)}),
+    ("sightseeing", lambda rng: {"location": "Amber Fort", "budget": rng.randint(0, 500)}),
+)
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def populate(db_path: str, users: int, sessions_per_user: int, bookings_per_session: int,
+             history: int, seed: int = 0) -> List[Tuple[str, str, List[str]]]:
+    """Bulk-insert the dataset; returns (user_id, email, session_ids) per user"""
+    from core.db import DatabaseManager, booking_amount
+    from core.serialization import encode_json_text, encode_state
+
+    rng = random.Random(seed)
+    db = DatabaseManager(db_path=db_path)
+    now = datetime.now(UTC).isoformat()
+    population = []
+    user_rows, session_rows, booking_rows = [], [], []
+    for u in range(users):
+        user_id, email = str(uuid.uuid4()), f"user{u}-{seed}@example.com"
+        user_rows.append((user_id, f"User {u}", email, None, now, now, encode_json_text({})))
+        session_ids = []
+        for s in range(sessions_per_user):
+            session_id = str(uuid.uuid4())
+            session_ids.append(session_id)
+            state = {
+                "user_id": user_id, "user_email": email, "user_name": f"User {u}",
+                "interaction_history": [
+                    {"action": "user_query", "query": f"question {h} about Jaipur", "timestamp": now}
+                    for h in range(history)
+                ],
+            }
+            session_rows.append((session_id, user_id, f"Session {s}", now, now, encode_state(state)))
+            for _ in range(bookings_per_session):
+                booking_type, details = rng.choice(BOOKING_TYPES)
+                details = details(rng)
+                booking_rows.append((
+                    str(uuid.uuid4()), user_id, session_id, booking_type, encode_json_text(details),
+                    now, now, "confirmed", booking_amount(booking_type, details)
+                ))
+        population.append((user_id, email, session_ids))
+
+    with db._get_connection() as conn:
+        conn.executemany(
+            """INSERT INTO users (user_id, name, email, phone, created_at, last_login, metadata)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""", user_rows)
+        conn.executemany(
+            """INSERT INTO sessions (session_id, user_id, session_name, created_at, last_active, state, is_active)
+               VALUES (?, ?, ?, ?, ?, ?, 1)""", session_rows)
+        conn.executemany(
+            """INSERT INTO bookings (booking_id, user_id, session_id, booking_type, details,
+                                     created_at, updated_at, status, amount)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", booking_rows)
+        conn.execute("ANALYZE")
+    return population
+
+
+def load_population(db_path: str) -> List[Tuple[str, str, List[str]]]:
+    """Read (user_id, email, session_ids) back from an already populated file"""
+    from core.db import DatabaseManager
+
+    sessions: Dict[str, List[str]] = {}
+    with DatabaseManager(db_path=db_path)._get_connection() as conn:
+        for row in conn.execute("SELECT user_id, session_id FROM sessions WHERE is_active = 1"):
+            sessions.setdefault(row["user_id"], []).append(row["session_id"])
+        users = conn.execute("SELECT user_id, email FROM users WHERE email IS NOT NULL").fetchall()
+    return [(row["user_id"], row["email"], sessions[row["user_id"]]) for row in users if row["user_id"] in sessions]
+
+
+async def _worker(db_path: str, population, mix: Dict[str, int], deadline: float, seed: int,
+                  samples: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    from core.db import DatabaseManager
+    from core.models import Booking
+
+    db = DatabaseManager(db_path=db_path)
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+
+    while time.perf_counter() < deadline:
+        operation = rng.choices(names, weights)[0]
+        user_id, email, session_ids = rng.choice(population)
+        session_id = rng.choice(session_ids)
+        started = time.perf_counter()
+        try:
+            if operation == "login":
+                user = await db.get_user_by_email(email)
+                await db.update_user_login(user.user_id)
+            elif operation == "resume":
+                sessions = await db.list_user_sessions(user_id)
+                await db.get_session(sessions[0]["session_id"] if sessions else session_id)
+            elif operation == "update":
+                await db.mutate_session_state(session_id, lambda state: state.setdefault(
+                    "interaction_history", []).append({"action": "user_query", "query": "load test"}))
+            elif operation == "booking":
+                booking_type, details = rng.choice(BOOKING_TYPES)
+                await db.save_booking(Booking(f"LOAD-{uuid.uuid4().hex[:12]}", user_id, session_id,
+                                              booking_type, details(rng), datetime.now(UTC), "confirmed"))
+            else:
+                await db.get_session_bill(session_id)
+        except Exception as e:
+            errors[f"{operation}: {type(e).__name__}"] = errors.get(f"{operation}: {type(e).__name__}", 0) + 1
+            continue
+        samples[operation].append(time.perf_counter() - started)
+
+
+def replay(db_path: str, population, mix: Dict[str, int], concurrency: int, duration: float,
+           seed: int = 0) -> Tuple[List[Dict], Dict[str, int]]:
+    """Run the operation mix from ``concurrency`` threads; returns per-operation rows and errors"""
+    samples = [{name: [] for name in mix} for _ in range(concurrency)]
+    errors = [{} for _ in range(concurrency)]
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=lambda i=i: asyncio.run(
+            _worker(db_path, population, mix, deadline, seed + i, samples[i], errors[i])))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    rows = []
+    for name in list(mix) + ["all"]:
+        latencies = [s for worker in samples for op, values in worker.items()
+                     if name in ("all", op) for s in values]
+        rows.append({
+            "operation": name,
+            "count": len(latencies),
+            "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        })
+    merged: Dict[str, int] = {}
+    for worker in errors:
+        for key, count in worker.items():
+            merged[key] = merged.get(key, 0) + count
+    return rows, merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Populate a trip planner DB and replay a realistic operation mix")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--sessions-per-user", type=int, default=3)
+    parser.add_argument("--bookings-per-session", type=int, default=4)
+    parser.add_argument("--history", type=int, default=20, help="interaction-history entries per session")
+    parser.add_argument("--concurrency", type=int, default=4, help="worker threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of replay")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database file to populate and keep (default: a temporary file)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/db_load-<timestamp>.json)")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    from loguru import logger
+    logger.remove()  # every DB call logs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "trip_planner.db")
+        started = time.perf_counter()
+        population = load_population(db_path) if os.path.exists(db_path) else []
+        if population:
+            print(f"Replaying against {db_path}: {len(population)} users")
+        else:
+            population = populate(db_path, args.users, args.sessions_per_user, args.bookings_per_session,
+                                  args.history, args.seed)
+            print(f"Populated {args.users} users / {args.users * args.sessions_per_user} sessions / "
+                  f"{args.users * args.sessions_per_user * args.bookings_per_session} bookings "
+                  f"in {time.perf_counter() - started:.1f}s ({os.path.getsize(db_path) / 1e6:.1f} MB)")
+        rows, errors = replay(db_path, population, mix, args.concurrency, args.duration, args.seed)
+
+    print_table(f"DatabaseManager load ({args.concurrency} threads, {args.duration:g}s)", rows)
+    if errors:
+        print("errors: " + ", ".join(f"{k}={v}" for k, v in sorted(errors.items())))
+    params = {k: v for k, v in vars(args).items() if k not in ("db", "output")}
+    path = write_results("db_load", rows, {**params, "errors": errors}, args.output)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
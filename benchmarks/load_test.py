@@ -0,0 +1,125 @@
+"""
+Load test: the full agent orchestration layer against the offline fake model
+
+Drives TripPlannerRunner through SessionMultiplexer (the same path the HTTP
+server uses) with many concurrent simulated sessions. Each session plays a
+short scripted conversation: identify, book a train, book a hotel, ask a
+question, ask for the bill. Gemini is replaced by ``tools.fake_llm``, so the
+run needs no network or API key and is repeatable for a given ``--seed``.
+
+Reports turn throughput, p50/p95/p99 turn latency, failed turns by cause,
+fake model calls and time spent waiting in the per-session rate limiter.
+
+Usage:
+    python -m benchmarks.load_test [--sessions 50] [--concurrency 16]
+        [--latency-ms 200] [--jitter-ms 100] [--distribution lognormal]
+        [--rate-429 0.02] [--rate-503 0.01] [--seed 0]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import percentile, print_table
+
+CONVERSATION = (
+    "{email}",
+    "My name is Load Tester {n}",
+    "Book a train from Delhi to Jaipur on December 5",
+    "Find a hotel in Jaipur from December 5 for 2 nights at ₹2000 per night",
+    "What are the top places to visit in Jaipur?",
+    "What's my total bill?",
+)
+
+
+async def _simulate_session(multiplexer, db, n: int, latencies: List[float], failures: Dict[str, int]) -> None:
+    email = f"load{n}-{time.time_ns()}@example.com"
+    user = await db.create_user(name=f"Load Tester {n}", email=email)
+    session = await db.create_session(user.user_id)
+    for template in CONVERSATION:
+        message = template.format(email=email, n=n)
+        started = time.perf_counter()
+        try:
+            await multiplexer.run_turn(user.user_id, session.session_id, message)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            cause = str(getattr(e, "code", None) or type(e).__name__)
+            failures[cause] = failures.get(cause, 0) + 1
+
+
+async def _run(args) -> Dict:
+    # Imported here so TRIP_DB_PATH / TRIP_MODEL_BACKEND are set first
+    from google.adk.sessions import InMemorySessionService
+    from agent import TripPlannerRunner
+    from core.db import db_manager
+    from core.rate_limiter import gemini_rate_limiter
+    from core.serving import SessionMultiplexer
+    from tools.fake_llm import FakeModelConfig, fake_backend
+
+    fake_backend.configure(FakeModelConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, distribution=args.distribution,
+        rate_429=args.rate_429, rate_503=args.rate_503, seed=args.seed,
+    ))
+    runner = TripPlannerRunner(InMemorySessionService())
+    multiplexer = SessionMultiplexer(
+        runner, max_concurrent_turns=args.concurrency, max_pending=args.sessions * 2, turn_timeout=args.turn_timeout
+    )
+    limiter_before = gemini_rate_limiter.stats()
+
+    latencies: List[float] = []
+    failures: Dict[str, int] = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _simulate_session(multiplexer, db_manager, n, latencies, failures) for n in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - started
+
+    limiter = gemini_rate_limiter.stats()
+    model = fake_backend.stats
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "turns_ok": len(latencies),
+        "turns_failed": sum(failures.values()),
+        "failures": ", ".join(f"{k}={v}" for k, v in sorted(failures.items())) or "-",
+        "turns_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "model_calls": model.calls,
+        "model_errors": ", ".join(f"{k}={v}" for k, v in sorted(model.errors.items())) or "-",
+        "limiter_waits": limiter["waits"] - limiter_before["waits"],
+        "limiter_wait_s": limiter["total_wait"] - limiter_before["total_wait"],
+        "limiter_max_wait_s": limiter["max_wait"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the agent layer with the fake model backend")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16, help="max turns running at once")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mean fake model latency")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--distribution", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-503", type=float, default=0.0)
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TRIP_DB_PATH"] = os.path.join(tmp, "trip_planner.db")
+        os.environ["TRIP_MODEL_BACKEND"] = "fake"
+        from loguru import logger
+        logger.remove()  # per-turn logging would dominate the timing
+        result = asyncio.run(_run(args))
+
+    row = {k: v for k, v in result.items() if k not in ("failures", "model_errors")}
+    print_table("Agent load test (fake model backend)", [row])
+    print(f"failed turns: {result['failures']}   injected model errors: {result['model_errors']}")
+
+
+if __name__ == "__main__":
+    main()
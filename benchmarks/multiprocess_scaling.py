@@ -0,0 +1,108 @@
+"""
+Load test: turn throughput vs. number of worker processes on one SQLite file
+
+Each worker process runs simulated agent turns against a shared database:
+read the session, spend ``--cpu-ms`` of CPU (standing in for prompt building
+and response formatting), then append to the interaction history through the
+compare-and-swap ``mutate_session_state`` path. Sessions are shared between
+workers, so the run also exercises busy waits, lock retries and CAS conflicts.
+
+Usage:
+    python -m benchmarks.multiprocess_scaling [--workers 1 2 4] [--duration 5] [--cpu-ms 2]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import print_table
+
+
+def _burn_cpu(ms: float) -> None:
+    deadline = time.perf_counter() + ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def _worker_loop(db_path: str, session_ids, duration: float, cpu_ms: float, start_at: float) -> int:
+    from core.db import DatabaseManager
+    db = DatabaseManager(db_path=db_path)
+    rng = random.Random(os.getpid())
+
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    deadline = time.time() + duration
+    turns = 0
+    while time.time() < deadline:
+        session_id = rng.choice(session_ids)
+        await db.get_session(session_id)
+        _burn_cpu(cpu_ms)
+        await db.mutate_session_state(
+            session_id,
+            lambda state: state.setdefault("interaction_history", []).append(
+                {"action": "user_query", "query": f"turn {turns}", "worker": os.getpid()}
+            ),
+            max_retries=20,
+        )
+        turns += 1
+    return turns
+
+
+def _worker(db_path, session_ids, duration, cpu_ms, start_at, results) -> None:
+    from loguru import logger
+    logger.remove()  # keep per-turn debug/warning output out of the timing
+    results.put(asyncio.run(_worker_loop(db_path, session_ids, duration, cpu_ms, start_at)))
+
+
+async def _seed(db_path: str, sessions: int):
+    from core.db import DatabaseManager
+    db = DatabaseManager(db_path=db_path)
+    user = await db.create_user(name="Load Test", email=f"load-{time.time_ns()}@example.com")
+    return [(await db.create_session(user.user_id, initial_state={})).session_id for _ in range(sessions)]
+
+
+def run(workers: int, duration: float, cpu_ms: float, sessions: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "trip_planner.db")
+        session_ids = asyncio.run(_seed(db_path, sessions))
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        # Give every process time to import before the clock starts
+        start_at = time.time() + 1.0 + 0.2 * workers
+        procs = [ctx.Process(target=_worker, args=(db_path, session_ids, duration, cpu_ms, start_at, results))
+                 for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        turns = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    total = sum(turns)
+    return {
+        "workers": workers,
+        "turns": total,
+        "turns/s": total / duration,
+        "per worker/s": total / duration / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of load per worker count")
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="CPU time spent per simulated turn")
+    parser.add_argument("--sessions", type=int, default=32, help="sessions shared by all workers")
+    args = parser.parse_args()
+
+    rows = [run(n, args.duration, args.cpu_ms, args.sessions) for n in args.workers]
+    base = rows[0]["turns/s"] or 1.0
+    for row in rows:
+        row["speedup"] = f"{row['turns/s'] / base:.2f}x"
+    print_table(f"Multi-process turn throughput ({args.cpu_ms} ms CPU/turn, {args.sessions} shared sessions)", rows)
+
+
+if __name__ == "__main__":
+    main()
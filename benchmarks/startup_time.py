@@ -0,0 +1,92 @@
+"""
+Benchmark cold-start import cost of the main entry points
+
+Each module is imported in a fresh interpreter under ``-X importtime``. The
+table reports the wall-clock time of the whole process, the cumulative
+import time of the module itself, and the slowest imports it pulled in, so
+regressions (an eager agent build, a DB connection at import, a heavyweight
+client configured at import) show up immediately.
+
+Usage:
+    python -m benchmarks.startup_time [--modules agent main core.db] [--repeat 5] [--top 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import print_table
+
+DEFAULT_MODULES = [
+    "agent",
+    "core.db",
+    "core.notifications",
+    "tools.llm_interface",
+    "main",
+    "server",
+]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def measure(module: str):
+    """Import ``module`` in a fresh interpreter; returns (wall seconds, importtime entries)"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    return wall, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module (median reported)")
+    parser.add_argument("--top", type=int, default=5, help="slowest dependencies to list per module")
+    args = parser.parse_args()
+
+    rows, slowest = [], []
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(e)
+            continue
+        walls = [wall for wall, _ in runs]
+        entries = runs[walls.index(statistics.median_low(walls))][1]
+        own = next((cum for name, _, cum, _ in reversed(entries) if name == module), 0)
+        rows.append({
+            "module": module,
+            "wall ms": statistics.median(walls) * 1000,
+            "import ms": own / 1000,
+            "modules loaded": len(entries),
+        })
+        top_level = sorted((e for e in entries if e[3] <= 1 and e[0] != module), key=lambda e: -e[2])
+        slowest += [{"module": module, "dependency": name, "cumulative ms": cum / 1000}
+                    for name, _, cum, _ in top_level[:args.top]]
+
+    print_table(f"Cold start (median of {args.repeat} fresh interpreters)", rows)
+    print_table("Slowest direct dependencies", slowest)
+
+
+if __name__ == "__main__":
+    main()
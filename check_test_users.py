@@ -1,5 +1,6 @@
 import sqlite3
 import json
+from core.serialization import decode
 
 def check_test_user():
     """Check session data for Test User"""
@@ -59,7 +60,7 @@ def check_test_user():
             # Parse state
             if session['state']:
                 try:
-                    state = json.loads(session['state'])
+                    state = decode(session['state'])
                     
                     print("\n📋 STATE CONTENTS:")
                     
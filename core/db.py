@@ -1,27 +1,158 @@
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
+import asyncio
+import functools
+import random
 import sqlite3
-import json
 import uuid
 import os
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator, Callable
 from contextlib import contextmanager
 from loguru import logger
-from .models import User, Session, Booking
+from .models import User, Session, Booking, BookingEvent
+from .serialization import encode_state, encode_json_text, decode as decode_json
+from .migrations import MigrationRunner, BOOKING_AMOUNT_SQL
+from .tracing import instrument_class
+from .session_cache import (SessionCache, SNAPSHOT_PATH, SNAPSHOT_SESSIONS,
+                            write_snapshot, read_snapshot, seed_from_snapshot)
+
+
+DEFAULT_DB_PATH = "temp_backup/trip_planner.db"
+
+# Several worker processes may share one database file; these keep writers
+# from failing fast on each other's locks.
+BUSY_TIMEOUT_SECONDS = 5.0
+LOCK_RETRY_ATTEMPTS = 5
+LOCK_RETRY_BASE_DELAY = 0.05
+
+
+class SessionVersionConflict(Exception):
+    """Raised when a compare-and-swap state write finds the session changed underneath it"""
+
+
+# Field holding the billable amount for each booking type (mirrors BOOKING_AMOUNT_SQL)
+BOOKING_AMOUNT_FIELDS = {
+    'travel': 'price',
+    'accommodation': 'total_price',
+    'sightseeing': 'budget',
+}
+
+
+# Live-table columns copied into the archive tables (archived_at is appended)
+ARCHIVED_SESSION_COLUMNS = "session_id, user_id, session_name, created_at, last_active, state, is_active, version"
+ARCHIVED_BOOKING_COLUMNS = (
+    "booking_id, user_id, session_id, booking_type, details, created_at, updated_at, status, amount"
+)
+
+
+# Keys whose lists only ever grow: a turn's new entries are appended to the stored list
+APPEND_ONLY_KEYS = ("interaction_history",)
+
+
+def booking_amount(booking_type: str, details: Dict[str, Any]) -> int:
+    """Billable amount of a booking, stored in the typed ``bookings.amount`` column"""
+    value = details.get(BOOKING_AMOUNT_FIELDS.get(booking_type, ''))
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def merge_state_changes(stored: Dict[str, Any], base: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply what changed between ``base`` and ``current`` to ``stored``
+
+    Keys the turn did not touch keep their stored value, so writes made to
+    the DB in the meantime (another worker, maintenance) are not undone.
+    New entries of an APPEND_ONLY_KEYS list are appended to the stored list.
+    """
+    merged = dict(stored)
+    for key, value in current.items():
+        old = base.get(key)
+        if key in base and old == value:
+            continue
+        if (key in APPEND_ONLY_KEYS and isinstance(old, list) and isinstance(value, list)
+                and value[:len(old)] == old):
+            merged[key] = list(stored.get(key) or []) + value[len(old):]
+        else:
+            merged[key] = value
+    for key in base.keys() - current.keys():
+        merged.pop(key, None)
+    return merged
+
+
+def _is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def _retry_on_locked(method: Callable) -> Callable:
+    """
+    Retry an async DB method when SQLite reports lock contention
+
+    busy_timeout already makes SQLite wait for the lock; this covers the cases
+    it cannot (e.g. a read transaction upgrading to a write while another
+    process commits) with jittered exponential backoff that yields the loop.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        for attempt in range(LOCK_RETRY_ATTEMPTS):
+            try:
+                return await method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_lock_error(e) or attempt == LOCK_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = LOCK_RETRY_BASE_DELAY * 2 ** attempt
+                logger.warning(f"⚠️ {method.__name__}: database locked, retrying in {delay:.2f}s")
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+    return wrapper
+
 
 class DatabaseManager:
     """Manages database operations for trip planner with multi-user support"""
     
-    def __init__(self, db_path: str = "temp_backup/trip_planner.db"):
-        """Initialize database connection and tables"""
-        self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self._init_db()
+    def __init__(self, db_path: Optional[str] = None, session_cache: Optional[SessionCache] = None):
+        """
+        Initialize the database manager
+
+        ``db_path`` defaults to $TRIP_DB_PATH, then temp_backup/trip_planner.db.
+        Nothing touches the filesystem until the first connection, which also
+        creates the schema, so importing ``db_manager`` is free. Connections
+        are opened per operation, so an instance is safe to use from several
+        worker processes sharing the same file.
+
+        Sessions read through ``get_session`` are kept in ``session_cache``
+        (validated against the row version on every hit).
+        """
+        self.db_path = db_path or os.getenv("TRIP_DB_PATH", DEFAULT_DB_PATH)
+        self.session_cache = session_cache if session_cache is not None else SessionCache()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with row factory and multi-process pragmas"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS)
+        conn.row_factory = sqlite3.Row
+        # WAL (set once in _init_db) lets readers run alongside the writer;
+        # NORMAL sync is durable across process crashes in WAL mode.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _ensure_schema(self) -> None:
+        """Create the database directory and schema once, on first use"""
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._init_db()
+            self._schema_ready = True
 
     @contextmanager
     def _get_connection(self):
-        """Get database connection with row factory"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Get database connection, initializing the schema on first use"""
+        if not self._schema_ready:
+            self._ensure_schema()
+        conn = self._connect()
         try:
             yield conn
             conn.commit()
@@ -32,72 +163,83 @@ class DatabaseManager:
             conn.close()
 
     def _init_db(self):
-        """Initialize database tables with enhanced schema for multi-user support"""
+        """Bring the schema up to date (a single SELECT when it already is)"""
+        version = MigrationRunner(self._connect).run()
+        logger.info(f"Database ready at schema version {version}")
+
+    # Pagination Helpers
+    @staticmethod
+    def _encode_cursor(*values: str) -> str:
+        """Build an opaque keyset cursor from the sort key of the last row"""
+        return "|".join(values)
+
+    @staticmethod
+    def _decode_cursor(cursor: str, parts: int) -> List[str]:
+        """Split a keyset cursor back into its sort key values"""
+        values = cursor.split("|", parts - 1)
+        if len(values) != parts:
+            raise ValueError(f"Invalid pagination cursor: {cursor}")
+        return values
+
+    def _fetch_page(self, query: str, params: List, order_columns: Tuple[str, str],
+                    limit: int, after: Optional[str], row_mapper: Callable) -> Tuple[List, Optional[str]]:
+        """
+        Run a keyset-paginated query ordered by ``order_columns`` descending.
+
+        ``query`` must end with its WHERE clause; the cursor predicate, ORDER BY
+        and LIMIT are appended here. Returns the mapped rows and the cursor for
+        the next page (None when this is the last page).
+        """
+        if limit <= 0:
+            raise ValueError("limit must be a positive integer")
+
+        sort_col, id_col = order_columns
+        params = list(params)
+        if after:
+            query += f" AND ({sort_col}, {id_col}) < (?, ?)"
+            params.extend(self._decode_cursor(after, 2))
+        query += f" ORDER BY {sort_col} DESC, {id_col} DESC LIMIT ?"
+        # Fetch one extra row to learn whether another page exists
+        params.append(limit + 1)
+
         with self._get_connection() as conn:
-            conn.executescript("""
-                -- Users table with unique identification
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE,
-                    phone TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1,
-                    metadata JSON
-                );
-
-                -- Sessions table linked to users
-                CREATE TABLE IF NOT EXISTS sessions (
-                    session_id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    session_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    state JSON,
-                    is_active BOOLEAN DEFAULT 1,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
-                );
-
-                -- Bookings table with user and session tracking
-                CREATE TABLE IF NOT EXISTS bookings (
-                    booking_id TEXT PRIMARY KEY,
-                    user_id TEXT NOT NULL,
-                    session_id TEXT NOT NULL,
-                    booking_type TEXT NOT NULL CHECK(booking_type IN ('accommodation', 'travel', 'sightseeing')),
-                    details JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'confirmed' CHECK(status IN ('pending', 'confirmed', 'cancelled', 'completed')),
-                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
-                );
-
-                -- Create indexes for performance
-                CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
-                CREATE INDEX IF NOT EXISTS idx_sessions_active ON sessions(is_active);
-                CREATE INDEX IF NOT EXISTS idx_bookings_user_id ON bookings(user_id);
-                CREATE INDEX IF NOT EXISTS idx_bookings_session_id ON bookings(session_id);
-                CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);
-                
-                -- Create view for active sessions with user details
-                CREATE VIEW IF NOT EXISTS active_user_sessions AS
-                SELECT 
-                    s.session_id,
-                    s.user_id,
-                    u.name as user_name,
-                    u.email as user_email,
-                    s.session_name,
-                    s.created_at,
-                    s.last_active,
-                    s.state
-                FROM sessions s
-                JOIN users u ON s.user_id = u.user_id
-                WHERE s.is_active = 1 AND u.is_active = 1;
-            """)
-            logger.info("Database initialized with enhanced multi-user schema")
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self._encode_cursor(last[sort_col], last[id_col])
+        return [row_mapper(row) for row in rows], next_cursor
+
+    @staticmethod
+    async def _iter_pages(page_fn: Callable, page_size: int, **kwargs) -> AsyncIterator:
+        """Yield items from a ``*_page`` method one page at a time"""
+        after = None
+        while True:
+            items, after = await page_fn(limit=page_size, after=after, **kwargs)
+            for item in items:
+                yield item
+            if not after:
+                break
+
+    @staticmethod
+    def _lazy_booking(row: sqlite3.Row) -> Booking:
+        """Bulk listings defer decoding ``details`` until it is accessed"""
+        return Booking.from_row(row, lazy=True)
+
+    @staticmethod
+    def _row_to_session_summary(row: sqlite3.Row) -> Dict:
+        return {
+            'session_id': row['session_id'],
+            'session_name': row['session_name'],
+            'created_at': row['created_at'],
+            'last_active': row['last_active'],
+            'is_active': bool(row['is_active'])
+        }
 
     # User Management Methods
+    @_retry_on_locked
     async def create_user(self, name: str, email: Optional[str] = None, phone: Optional[str] = None, metadata: Optional[Dict] = None) -> User:
         """Create a new user in the database"""
         user_id = str(uuid.uuid4())
@@ -109,7 +251,7 @@ class DatabaseManager:
                     """INSERT INTO users (user_id, name, email, phone, created_at, last_login, metadata)
                        VALUES (?, ?, ?, ?, ?, ?, ?)""",
                     (user_id, name, email, phone, now.isoformat(), now.isoformat(), 
-                     json.dumps(metadata or {}))
+                     encode_json_text(metadata or {}))
                 )
             
             logger.info(f"Created user: {user_id} - {name}")
@@ -134,12 +276,7 @@ class DatabaseManager:
                 if not row:
                     return None
                     
-                return User(
-                    user_id=row['user_id'],
-                    name=row['name'],
-                    email=row['email'],
-                    created_at=datetime.fromisoformat(row['created_at'])
-                )
+                return User.from_row(row)
         except Exception as e:
             logger.error(f"Failed to get user: {str(e)}")
             raise
@@ -157,12 +294,7 @@ class DatabaseManager:
                 if not row:
                     return None
                     
-                return User(
-                    user_id=row['user_id'],
-                    name=row['name'],
-                    email=row['email'],
-                    created_at=datetime.fromisoformat(row['created_at'])
-                )
+                return User.from_row(row)
         except Exception as e:
             logger.error(f"Failed to get user by email: {str(e)}")
             raise
@@ -174,19 +306,39 @@ class DatabaseManager:
                 cursor = conn.execute(
                     "SELECT * FROM users WHERE is_active = 1 ORDER BY created_at DESC"
                 )
-                return [
-                    User(
-                        user_id=row['user_id'],
-                        name=row['name'],
-                        email=row['email'],
-                        created_at=datetime.fromisoformat(row['created_at'])
-                    )
-                    for row in cursor.fetchall()
-                ]
+                return [User.from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Failed to list users: {str(e)}")
             raise
 
+    async def list_users_page(self, limit: int = 50, after: Optional[str] = None) -> Tuple[List[User], Optional[str]]:
+        """
+        List active users newest first, one keyset page at a time
+
+        Args:
+            limit: Maximum number of users to return
+            after: Cursor returned by the previous page (None for the first page)
+
+        Returns:
+            tuple: (users, next_cursor) - next_cursor is None on the last page
+        """
+        try:
+            return self._fetch_page(
+                "SELECT * FROM users WHERE is_active = 1",
+                [],
+                ('created_at', 'user_id'),
+                limit, after, User.from_row
+            )
+        except Exception as e:
+            logger.error(f"Failed to list users page: {str(e)}")
+            raise
+
+    async def iter_users(self, page_size: int = 100) -> AsyncIterator[User]:
+        """Stream all active users newest first without loading them all at once"""
+        async for user in self._iter_pages(self.list_users_page, page_size):
+            yield user
+
+    @_retry_on_locked
     async def update_user_login(self, user_id: str) -> None:
         """Update user's last login timestamp"""
         try:
@@ -201,6 +353,7 @@ class DatabaseManager:
             raise
 
     # Session Management Methods
+    @_retry_on_locked
     async def create_session(self, user_id: str, session_name: Optional[str] = None, initial_state: Dict = None) -> Session:
         """Create a new session for a user"""
         session_id = str(uuid.uuid4())
@@ -220,7 +373,7 @@ class DatabaseManager:
                     """INSERT INTO sessions (session_id, user_id, session_name, created_at, last_active, state, is_active)
                        VALUES (?, ?, ?, ?, ?, ?, 1)""",
                     (session_id, user_id, session_name, now.isoformat(), now.isoformat(), 
-                     json.dumps(initial_state or {}))
+                     encode_state(initial_state or {}))
                 )
             
             logger.info(f"Created session: {session_id} for user: {user_id}")
@@ -236,9 +389,21 @@ class DatabaseManager:
             raise
 
     async def get_session(self, session_id: str) -> Optional[Session]:
-        """Retrieve session by ID"""
+        """Retrieve session by ID, from the session cache when the cached version is current"""
         try:
             with self._get_connection() as conn:
+                if session_id in self.session_cache:
+                    # Primary-key probe; the state blob is only read on a miss
+                    current = conn.execute(
+                        "SELECT version, last_active FROM sessions WHERE session_id = ? AND is_active = 1",
+                        (session_id,)
+                    ).fetchone()
+                    session = self.session_cache.get(
+                        session_id, *(tuple(current) if current else (None,))
+                    )
+                    if session:
+                        return session
+
                 cursor = conn.execute(
                     "SELECT * FROM sessions WHERE session_id = ? AND is_active = 1",
                     (session_id,)
@@ -248,14 +413,9 @@ class DatabaseManager:
                 if not row:
                     logger.warning(f"Session not found: {session_id}")
                     return None
-                    
-                return Session(
-                    session_id=row['session_id'],
-                    user_id=row['user_id'],
-                    created_at=datetime.fromisoformat(row['created_at']),
-                    last_active=datetime.fromisoformat(row['last_active']),
-                    state=json.loads(row['state'])
-                )
+
+                self.session_cache.put_row(row)
+                return Session.from_row(row)
         except Exception as e:
             logger.error(f"Failed to get session: {str(e)}")
             raise
@@ -277,53 +437,143 @@ class DatabaseManager:
                 query += " ORDER BY last_active DESC"
                 
                 cursor = conn.execute(query, params)
-                return [
-                    {
-                        'session_id': row['session_id'],
-                        'session_name': row['session_name'],
-                        'created_at': row['created_at'],
-                        'last_active': row['last_active'],
-                        'is_active': bool(row['is_active'])
-                    }
-                    for row in cursor.fetchall()
-                ]
+                return [self._row_to_session_summary(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Failed to list user sessions: {str(e)}")
             raise
 
-    async def update_session(self, session: Session) -> None:
-        """Update session state and last active time"""
+    async def list_user_sessions_page(self, user_id: str, limit: int = 20, after: Optional[str] = None,
+                                      active_only: bool = True) -> Tuple[List[Dict], Optional[str]]:
+        """
+        List a user's sessions most recently active first, one keyset page at a time
+
+        Returns:
+            tuple: (session summaries, next_cursor) - next_cursor is None on the last page
+        """
         try:
-            with self._get_connection() as conn:
-                conn.execute(
-                    """UPDATE sessions 
-                       SET last_active = ?, state = ?
-                       WHERE session_id = ? AND is_active = 1""",
-                    (session.last_active.isoformat(), 
-                     json.dumps(session.state), 
-                     session.session_id)
-                )
-            logger.debug(f"Updated session: {session.session_id}")
+            query = """
+                SELECT session_id, session_name, created_at, last_active, is_active
+                FROM sessions
+                WHERE user_id = ?
+            """
+            if active_only:
+                query += " AND is_active = 1"
+            return self._fetch_page(
+                query, [user_id], ('last_active', 'session_id'),
+                limit, after, self._row_to_session_summary
+            )
         except Exception as e:
-            logger.error(f"Failed to update session: {str(e)}")
+            logger.error(f"Failed to list user sessions page: {str(e)}")
             raise
 
-    async def update_session_state(self, session_id: str, state: Dict) -> None:
-        """Update session state"""
+    async def iter_user_sessions(self, user_id: str, active_only: bool = True,
+                                 page_size: int = 100) -> AsyncIterator[Dict]:
+        """Stream a user's sessions most recently active first"""
+        async for session in self._iter_pages(self.list_user_sessions_page, page_size,
+                                              user_id=user_id, active_only=active_only):
+            yield session
+
+    async def update_session(self, session: Session) -> None:
+        """
+        Update session state and last active time
+
+        The write only succeeds if the row is still at ``session.version``;
+        otherwise SessionVersionConflict is raised. On success the new
+        version is stored back on ``session``.
+        """
+        session.version = await self.update_session_state(
+            session.session_id, session.state,
+            expected_version=session.version, last_active=session.last_active
+        )
+
+    @_retry_on_locked
+    async def update_session_state(self, session_id: str, state: Dict,
+                                   expected_version: Optional[int] = None,
+                                   last_active: Optional[datetime] = None) -> Optional[int]:
+        """
+        Update session state and bump its version
+
+        Args:
+            session_id: Session to update
+            state: New state (replaces the stored state)
+            expected_version: If given, only write when the stored version
+                still matches (compare-and-swap)
+            last_active: Activity timestamp to record (defaults to now)
+
+        Returns:
+            int: The new version, or None if the session does not exist
+
+        Raises:
+            SessionVersionConflict: ``expected_version`` no longer matches
+        """
         try:
-            now = datetime.now(UTC)
+            query = """UPDATE sessions
+                       SET last_active = ?, state = ?, version = version + 1
+                       WHERE session_id = ? AND is_active = 1"""
+            last_active = (last_active or datetime.now(UTC)).isoformat()
+            payload = encode_state(state)
+            params = [last_active, payload, session_id]
+            if expected_version is not None:
+                query += " AND version = ?"
+                params.append(expected_version)
+            query += " RETURNING version"
+
             with self._get_connection() as conn:
-                conn.execute(
-                    """UPDATE sessions 
-                       SET last_active = ?, state = ?
-                       WHERE session_id = ? AND is_active = 1""",
-                    (now.isoformat(), json.dumps(state), session_id)
-                )
-            logger.debug(f"Updated session state: {session_id}")
+                row = conn.execute(query, params).fetchone()
+
+            if row is None:
+                if expected_version is not None:
+                    raise SessionVersionConflict(
+                        f"Session {session_id} is no longer at version {expected_version}"
+                    )
+                return None
+            self.session_cache.update(session_id, row['version'], last_active, payload)
+            logger.debug("Updated session state: {} (v{})", session_id, row['version'])
+            return row['version']
+        except SessionVersionConflict:
+            raise
         except Exception as e:
             logger.error(f"Failed to update session state: {str(e)}")
             raise
 
+    async def mutate_session_state(self, session_id: str, mutator: Callable[[Dict], Optional[Dict]],
+                                   max_retries: int = 5) -> Session:
+        """
+        Apply ``mutator`` to the session state with optimistic concurrency
+
+        The state is read, passed to ``mutator`` (which may edit it in place
+        or return a replacement) and written back, with ``last_active`` set
+        to now, by a compare-and-swap on the version read. When another writer got there first the whole
+        read-modify-write is retried with jittered backoff, so concurrent
+        updates are never silently lost.
+
+        Returns:
+            Session: The session as written, with its new version
+
+        Raises:
+            ValueError: Session does not exist
+            SessionVersionConflict: Still conflicting after ``max_retries`` retries
+        """
+        for attempt in range(max_retries + 1):
+            session = await self.get_session(session_id)
+            if not session:
+                raise ValueError(f"Session {session_id} not found")
+
+            new_state = mutator(session.state)
+            if new_state is not None:
+                session.state = new_state
+            session.last_active = datetime.now(UTC)
+            try:
+                await self.update_session(session)
+                return session
+            except SessionVersionConflict:
+                if attempt == max_retries:
+                    logger.warning(f"⚠️ Gave up on session {session_id} after {attempt + 1} conflicting writes")
+                    raise
+                logger.debug("Session {} changed concurrently, retrying (attempt {})", session_id, attempt + 1)
+                await asyncio.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+
+    @_retry_on_locked
     async def delete_session(self, session_id: str) -> bool:
         """Soft delete a session"""
         try:
@@ -333,6 +583,7 @@ class DatabaseManager:
                     (session_id,)
                 )
                 deleted = cursor.rowcount > 0
+                self.session_cache.invalidate(session_id)
                 if deleted:
                     logger.info(f"Deleted session: {session_id}")
                 return deleted
@@ -341,6 +592,7 @@ class DatabaseManager:
             raise
 
     # Booking Management Methods
+    @_retry_on_locked
     async def save_booking(self, booking: Booking) -> Booking:
         """Save a new booking"""
         try:
@@ -348,17 +600,18 @@ class DatabaseManager:
                 conn.execute(
                     """INSERT INTO bookings (
                         booking_id, user_id, session_id, booking_type,
-                        details, created_at, updated_at, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                        details, created_at, updated_at, status, amount
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                     (
                         booking.booking_id,
                         booking.user_id,
                         booking.session_id,
                         booking.booking_type,
-                        json.dumps(booking.details),
+                        encode_json_text(booking.details),
                         booking.created_at.isoformat(),
                         booking.created_at.isoformat(),
-                        booking.status
+                        booking.status,
+                        booking_amount(booking.booking_type, booking.details)
                     )
                 )
             logger.info(f"Saved booking: {booking.booking_id}")
@@ -375,22 +628,30 @@ class DatabaseManager:
                     "SELECT * FROM bookings WHERE session_id = ? ORDER BY created_at DESC",
                     (session_id,)
                 )
-                return [
-                    Booking(
-                        booking_id=row['booking_id'],
-                        user_id=row['user_id'],
-                        session_id=row['session_id'],
-                        booking_type=row['booking_type'],
-                        details=json.loads(row['details']),
-                        created_at=datetime.fromisoformat(row['created_at']),
-                        status=row['status']
-                    )
-                    for row in cursor.fetchall()
-                ]
+                return [Booking.from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Failed to get bookings: {str(e)}")
             raise
 
+    async def get_session_bookings_page(self, session_id: str, limit: int = 50,
+                                        after: Optional[str] = None) -> Tuple[List[Booking], Optional[str]]:
+        """Get a session's bookings newest first, one keyset page at a time"""
+        try:
+            return self._fetch_page(
+                "SELECT * FROM bookings WHERE session_id = ?",
+                [session_id], ('created_at', 'booking_id'),
+                limit, after, self._lazy_booking
+            )
+        except Exception as e:
+            logger.error(f"Failed to get bookings page: {str(e)}")
+            raise
+
+    async def iter_session_bookings(self, session_id: str, page_size: int = 100) -> AsyncIterator[Booking]:
+        """Stream a session's bookings newest first"""
+        async for booking in self._iter_pages(self.get_session_bookings_page, page_size,
+                                              session_id=session_id):
+            yield booking
+
     async def get_user_bookings(self, user_id: str) -> List[Booking]:
         """Get all bookings for a user across all sessions"""
         try:
@@ -399,22 +660,31 @@ class DatabaseManager:
                     "SELECT * FROM bookings WHERE user_id = ? ORDER BY created_at DESC",
                     (user_id,)
                 )
-                return [
-                    Booking(
-                        booking_id=row['booking_id'],
-                        user_id=row['user_id'],
-                        session_id=row['session_id'],
-                        booking_type=row['booking_type'],
-                        details=json.loads(row['details']),
-                        created_at=datetime.fromisoformat(row['created_at']),
-                        status=row['status']
-                    )
-                    for row in cursor.fetchall()
-                ]
+                return [Booking.from_row(row) for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Failed to get user bookings: {str(e)}")
             raise
 
+    async def get_user_bookings_page(self, user_id: str, limit: int = 50,
+                                     after: Optional[str] = None) -> Tuple[List[Booking], Optional[str]]:
+        """Get a user's bookings across all sessions newest first, one keyset page at a time"""
+        try:
+            return self._fetch_page(
+                "SELECT * FROM bookings WHERE user_id = ?",
+                [user_id], ('created_at', 'booking_id'),
+                limit, after, self._lazy_booking
+            )
+        except Exception as e:
+            logger.error(f"Failed to get user bookings page: {str(e)}")
+            raise
+
+    async def iter_user_bookings(self, user_id: str, page_size: int = 100) -> AsyncIterator[Booking]:
+        """Stream a user's bookings across all sessions newest first"""
+        async for booking in self._iter_pages(self.get_user_bookings_page, page_size,
+                                              user_id=user_id):
+            yield booking
+
+    @_retry_on_locked
     async def update_booking_status(self, booking_id: str, status: str) -> None:
         """Update booking status"""
         try:
@@ -443,15 +713,7 @@ class DatabaseManager:
                 row = cursor.fetchone()
                 
                 if row:
-                    return Booking(
-                        booking_id=row['booking_id'],
-                        user_id=row['user_id'],
-                        session_id=row['session_id'],
-                        booking_type=row['booking_type'],
-                        details=json.loads(row['details']) if row['details'] else {},
-                        created_at=datetime.fromisoformat(row['created_at']),
-                        status=row['status']
-                    )
+                    return Booking.from_row(row)
                 
                 return None
                 
@@ -464,15 +726,9 @@ class DatabaseManager:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT SUM(
-                        CASE 
-                            WHEN booking_type = 'travel' THEN CAST(json_extract(details, '$.price') AS INTEGER)
-                            WHEN booking_type = 'accommodation' THEN CAST(json_extract(details, '$.total_price') AS INTEGER)
-                            WHEN booking_type = 'sightseeing' THEN CAST(json_extract(details, '$.entry_fee') AS INTEGER)
-                            ELSE 0
-                        END
-                    ) as total
+                # amount is NULL only for rows an in-progress backfill hasn't reached yet
+                cursor.execute(f"""
+                    SELECT SUM(COALESCE(amount, {BOOKING_AMOUNT_SQL})) as total
                     FROM bookings
                     WHERE session_id = ? AND status = 'confirmed'
                 """, (session_id,))
@@ -484,4 +740,405 @@ class DatabaseManager:
             logger.error(f"Failed to calculate session bill: {str(e)}")
             return 0
 
+    # Booking Event Log
+    @staticmethod
+    def _project_booking_event(conn: sqlite3.Connection, session_id: str, user_id: str, event: Dict) -> None:
+        """Apply one booking event to the ``bookings`` table (its projection)"""
+        booking_type, booking_id, at = event['booking_type'], event['booking_id'], event['at']
+        if event['event_type'] in ('booked', 'modified'):
+            if event.get('previous_booking_id'):
+                conn.execute(
+                    "UPDATE bookings SET status = 'cancelled', updated_at = ? WHERE booking_id = ? AND session_id = ?",
+                    (at, event['previous_booking_id'], session_id)
+                )
+            details = event.get('details') or {}
+            # Some generated IDs are not unique across sessions; never take over another session's row
+            conn.execute(
+                """INSERT INTO bookings (
+                    booking_id, user_id, session_id, booking_type,
+                    details, created_at, updated_at, status, amount
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 'confirmed', ?)
+                ON CONFLICT(booking_id) DO UPDATE SET
+                    details = excluded.details, updated_at = excluded.updated_at,
+                    status = 'confirmed', amount = excluded.amount
+                WHERE bookings.session_id = excluded.session_id""",
+                (booking_id, user_id, session_id, booking_type, encode_json_text(details), at, at,
+                 event.get('amount', 0))
+            )
+        elif event['event_type'] == 'cancelled':
+            conn.execute(
+                "UPDATE bookings SET status = 'cancelled', updated_at = ? WHERE booking_id = ? AND session_id = ?",
+                (at, booking_id, session_id)
+            )
+        # 'refunded' only lives in the log: the booking row is already cancelled
+
+    @_retry_on_locked
+    async def append_booking_events(self, session_id: str, events: List[Dict]) -> int:
+        """
+        Append a session's booking events and apply them to ``bookings``
+
+        ``events`` are the session's new events as kept in its state (see
+        trip_tools.booking_events). An event already in the log (same
+        booking, type and time) is skipped, so re-sending events after a
+        partial failure is safe. Each worker numbers events from its own copy
+        of the state, so a new event whose ``seq`` is taken, or falls below
+        the log's last one, is numbered after ``MAX(seq)`` instead; the read
+        and the inserts share one write transaction.
+
+        Returns:
+            int: Number of events appended
+        """
+        if not events:
+            return 0
+        try:
+            with self._get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    """SELECT s.user_id, (SELECT MAX(seq) FROM booking_events WHERE session_id = ?) AS last_seq
+                       FROM sessions s WHERE s.session_id = ?""",
+                    (session_id, session_id)
+                ).fetchone()
+                if row is None:
+                    return 0
+                last_seq = -1 if row['last_seq'] is None else row['last_seq']
+                appended = 0
+                for event in events:
+                    stored = conn.execute(
+                        """SELECT 1 FROM booking_events
+                           WHERE booking_id = ? AND session_id = ? AND event_type = ? AND occurred_at = ?""",
+                        (event['booking_id'], session_id, event['event_type'], event['at'])
+                    ).fetchone()
+                    if stored:
+                        continue
+                    seq = event['seq'] if event['seq'] > last_seq else last_seq + 1
+                    if seq != event['seq']:
+                        logger.debug("Booking event seq {} of session {} is taken, stored as {}",
+                                     event['seq'], session_id, seq)
+                    conn.execute(
+                        """INSERT INTO booking_events (
+                            session_id, user_id, seq, event_type, booking_type, booking_id,
+                            previous_booking_id, amount, details, occurred_at
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (session_id, row['user_id'], seq, event['event_type'], event['booking_type'],
+                         event['booking_id'], event.get('previous_booking_id'), event.get('amount', 0),
+                         encode_json_text(event.get('details') or {}), event['at'])
+                    )
+                    last_seq = seq
+                    self._project_booking_event(conn, session_id, row['user_id'], event)
+                    appended += 1
+            if appended:
+                logger.debug("Appended {} booking event(s) for session {}", appended, session_id)
+            return appended
+        except Exception as e:
+            logger.error(f"Failed to append booking events: {str(e)}")
+            raise
+
+    async def get_booking_events(self, event_type: Optional[str] = None, since: Optional[datetime] = None,
+                                 until: Optional[datetime] = None, session_id: Optional[str] = None,
+                                 user_id: Optional[str] = None, limit: int = 100) -> List[BookingEvent]:
+        """
+        Query the booking log, newest first
+
+        e.g. all cancellations in the last week:
+            await db_manager.get_booking_events("cancelled", since=datetime.now(UTC) - timedelta(days=7))
+        Filters by type, time range and user are served by indexes on
+        (event_type, occurred_at) and (user_id, occurred_at).
+        """
+        conditions, params = [], []
+        for column, value in (('event_type', event_type), ('session_id', session_id), ('user_id', user_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("occurred_at >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            conditions.append("occurred_at < ?")
+            params.append(until.isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    f"SELECT * FROM booking_events {where} ORDER BY occurred_at DESC, event_id DESC LIMIT ?",
+                    [*params, limit]
+                ).fetchall()
+            return [BookingEvent.from_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to get booking events: {str(e)}")
+            raise
+
+    @staticmethod
+    def _event_from_row(row: sqlite3.Row) -> Dict:
+        """A ``booking_events`` row in the shape trip_tools.booking_events records"""
+        return {**dict(row), 'at': row['occurred_at'], 'details': decode_json(row['details'])}
+
+    async def get_session_event_log(self, session_id: str) -> List[Dict]:
+        """A session's whole booking log in order, as event dicts (see trip_tools.booking_events.rebuild)"""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM booking_events WHERE session_id = ? ORDER BY seq", (session_id,)
+                ).fetchall()
+            return [self._event_from_row(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to get session event log: {str(e)}")
+            raise
+
+    @_retry_on_locked
+    async def rebuild_session_bookings(self, session_id: str) -> int:
+        """Rebuild a session's ``bookings`` rows by replaying its event log; returns events replayed"""
+        try:
+            with self._get_connection() as conn:
+                events = conn.execute(
+                    "SELECT * FROM booking_events WHERE session_id = ? ORDER BY seq", (session_id,)
+                ).fetchall()
+                if not events:
+                    return 0
+                conn.execute(
+                    "DELETE FROM bookings WHERE session_id = ? AND booking_id IN "
+                    "(SELECT booking_id FROM booking_events WHERE session_id = ?)",
+                    (session_id, session_id)
+                )
+                for row in events:
+                    self._project_booking_event(conn, session_id, row['user_id'], self._event_from_row(row))
+            logger.info(f"Rebuilt bookings for session {session_id} from {len(events)} event(s)")
+            return len(events)
+        except Exception as e:
+            logger.error(f"Failed to rebuild session bookings: {str(e)}")
+            raise
+
+    # Multi-process Coordination
+    @_retry_on_locked
+    async def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """
+        Take or renew the named lease for ``ttl`` seconds
+
+        Succeeds if the lease is free, expired, or already held by ``holder``;
+        the upsert is a single statement, so two processes can never both win.
+        """
+        now = datetime.now(UTC).timestamp()
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT(name) DO UPDATE
+                   SET holder = excluded.holder, expires_at = excluded.expires_at
+                   WHERE leases.holder = excluded.holder OR leases.expires_at < ?""",
+                (name, holder, now + ttl, now)
+            )
+            return cursor.rowcount > 0
+
+    @_retry_on_locked
+    async def release_lease(self, name: str, holder: str) -> None:
+        """Give up the named lease if ``holder`` still owns it"""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    @_retry_on_locked
+    async def checkpoint(self) -> Dict[str, int]:
+        """Checkpoint the WAL into the main file and truncate it"""
+        with self._get_connection() as conn:
+            busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+    @_retry_on_locked
+    async def optimize(self) -> None:
+        """Refresh query planner statistics where SQLite thinks they are stale"""
+        with self._get_connection() as conn:
+            conn.execute("PRAGMA optimize")
+
+    # Warm Restart Snapshots
+    async def save_session_snapshot(self, path: str = SNAPSHOT_PATH,
+                                    limit: int = SNAPSHOT_SESSIONS) -> Dict[str, int]:
+        """Write the ``limit`` most recently active sessions to a compressed snapshot file"""
+        try:
+            with self._get_connection() as conn:
+                rows = conn.execute(
+                    "SELECT * FROM sessions WHERE is_active = 1 ORDER BY last_active DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+            size = write_snapshot(path, rows)
+            logger.info(f"💾 Snapshotted {len(rows)} session(s) to {path} ({size:,} bytes)")
+            return {"sessions": len(rows), "bytes": size}
+        except Exception as e:
+            logger.error(f"Failed to save session snapshot: {str(e)}")
+            raise
+
+    async def load_session_snapshot(self, path: str = SNAPSHOT_PATH) -> Dict[str, int]:
+        """
+        Pre-warm the session cache from a snapshot file
+
+        Entries whose session changed in the DB since the snapshot (newer
+        version or last_active), or is no longer active, are skipped.
+        """
+        try:
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                return {"loaded": 0, "stale": 0}
+            buffer, index = snapshot
+
+            current = {}
+            ids = [entry["session_id"] for entry in index]
+            with self._get_connection() as conn:
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    current.update(
+                        (row['session_id'], (row['version'], row['last_active']))
+                        for row in conn.execute(
+                            f"""SELECT session_id, version, last_active FROM sessions
+                                WHERE is_active = 1 AND session_id IN ({','.join('?' * len(chunk))})""",
+                            chunk
+                        )
+                    )
+            loaded = seed_from_snapshot(self.session_cache, buffer, index, current)
+            logger.info(f"🔥 Warmed session cache with {loaded} session(s), {len(index) - loaded} stale")
+            return {"loaded": loaded, "stale": len(index) - loaded}
+        except Exception as e:
+            logger.error(f"Failed to load session snapshot: {str(e)}")
+            return {"loaded": 0, "stale": 0}
+
+    # Expiry, Archival and Compaction
+    @_retry_on_locked
+    async def expire_idle_sessions(self, ttl_seconds: float, batch_size: int = 500) -> int:
+        """Deactivate sessions idle for longer than ``ttl_seconds``; returns how many"""
+        cutoff = (datetime.now(UTC) - timedelta(seconds=ttl_seconds)).isoformat()
+        expired = 0
+        while True:
+            with self._get_connection() as conn:
+                changed = conn.execute(
+                    """UPDATE sessions SET is_active = 0
+                       WHERE rowid IN (
+                           SELECT rowid FROM sessions
+                           WHERE is_active = 1 AND datetime(last_active) < datetime(?)
+                           LIMIT ?
+                       )""",
+                    (cutoff, batch_size)
+                ).rowcount
+            expired += changed
+            if changed < batch_size:
+                break
+            await asyncio.sleep(0)  # let other writers in between batches
+        if expired:
+            logger.info(f"⌛ Expired {expired} session(s) idle since before {cutoff}")
+        return expired
+
+    @_retry_on_locked
+    async def archive_inactive_sessions(self, batch_size: int = 200) -> Dict[str, int]:
+        """
+        Move inactive sessions and their bookings into the archive tables
+
+        Only sessions whose bookings are all cancelled or completed are
+        archived; a session with a pending or confirmed booking stays live
+        until that booking is done. Each batch is one short transaction, so
+        live writers are only held off for a batch at a time.
+
+        Returns:
+            dict: {"sessions": n, "bookings": n} archived
+        """
+        archived = {"sessions": 0, "bookings": 0}
+        while True:
+            now = datetime.now(UTC).isoformat()
+            with self._get_connection() as conn:
+                ids = [row['session_id'] for row in conn.execute(
+                    """SELECT session_id FROM sessions
+                       WHERE is_active = 0 AND NOT EXISTS (
+                           SELECT 1 FROM bookings
+                           WHERE bookings.session_id = sessions.session_id
+                             AND bookings.status IN ('pending', 'confirmed')
+                       )
+                       LIMIT ?""",
+                    (batch_size,)
+                )]
+                if not ids:
+                    break
+                placeholders = ",".join("?" * len(ids))
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO bookings_archive
+                        SELECT {ARCHIVED_BOOKING_COLUMNS}, ? FROM bookings
+                        WHERE session_id IN ({placeholders})""",
+                    [now, *ids]
+                )
+                archived["bookings"] += conn.execute(
+                    f"DELETE FROM bookings WHERE session_id IN ({placeholders})", ids
+                ).rowcount
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO sessions_archive
+                        SELECT {ARCHIVED_SESSION_COLUMNS}, ? FROM sessions
+                        WHERE session_id IN ({placeholders})""",
+                    [now, *ids]
+                )
+                archived["sessions"] += conn.execute(
+                    f"DELETE FROM sessions WHERE session_id IN ({placeholders})", ids
+                ).rowcount
+            if len(ids) < batch_size:
+                break
+            await asyncio.sleep(0)
+        if archived["sessions"]:
+            logger.info(f"📦 Archived {archived['sessions']} session(s) and {archived['bookings']} booking(s)")
+        return archived
+
+    @_retry_on_locked
+    async def archive_cancelled_bookings(self, older_than_seconds: float = 0.0, batch_size: int = 500) -> int:
+        """Move bookings cancelled more than ``older_than_seconds`` ago into bookings_archive"""
+        cutoff = (datetime.now(UTC) - timedelta(seconds=older_than_seconds)).isoformat()
+        archived = 0
+        while True:
+            now = datetime.now(UTC).isoformat()
+            with self._get_connection() as conn:
+                ids = [row['booking_id'] for row in conn.execute(
+                    """SELECT booking_id FROM bookings
+                       WHERE status = 'cancelled' AND datetime(updated_at) <= datetime(?) LIMIT ?""",
+                    (cutoff, batch_size)
+                )]
+                if not ids:
+                    break
+                placeholders = ",".join("?" * len(ids))
+                conn.execute(
+                    f"""INSERT OR REPLACE INTO bookings_archive
+                        SELECT {ARCHIVED_BOOKING_COLUMNS}, ? FROM bookings
+                        WHERE booking_id IN ({placeholders})""",
+                    [now, *ids]
+                )
+                archived += conn.execute(
+                    f"DELETE FROM bookings WHERE booking_id IN ({placeholders})", ids
+                ).rowcount
+            if len(ids) < batch_size:
+                break
+            await asyncio.sleep(0)
+        if archived:
+            logger.info(f"📦 Archived {archived} cancelled booking(s)")
+        return archived
+
+    def _file_bytes(self) -> int:
+        """Size of the database file plus its WAL"""
+        return sum(
+            os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+            if os.path.exists(path)
+        )
+
+    def free_page_ratio(self) -> float:
+        """Fraction of database pages that are free (what VACUUM would reclaim)"""
+        with self._get_connection() as conn:
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return free / pages if pages else 0.0
+
+    @_retry_on_locked
+    async def vacuum(self) -> Dict[str, int]:
+        """
+        Rebuild the database file, then truncate the WAL
+
+        Returns:
+            dict: bytes_before, bytes_after and reclaimed_bytes (file + WAL)
+        """
+        before = self._file_bytes()
+        with self._get_connection() as conn:
+            conn.isolation_level = None  # VACUUM cannot run inside a transaction
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        after = self._file_bytes()
+        logger.info(f"🧹 VACUUM reclaimed {before - after:,} bytes ({before:,} -> {after:,})")
+        return {"bytes_before": before, "bytes_after": after, "reclaimed_bytes": before - after}
+
+instrument_class(DatabaseManager, "db")
+
 db_manager = DatabaseManager()
\ No newline at end of file
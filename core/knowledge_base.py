@@ -0,0 +1,216 @@
+"""
+Pre-warmed destination knowledge base backed by SQLite FTS5
+
+Common questions ("things to do in Jaipur", "train fare Delhi to Agra",
+"Taj Mahal entry fee") are answered from a bundled dataset of attractions,
+routes, typical prices and entry fees instead of a model round trip.
+``perform_search`` consults the knowledge base first and only falls back to
+the model on a miss.
+
+The index is built from ``data/destinations.json`` the first time it is
+searched. By default it lives in memory (the dataset is small and every
+worker process builds its own copy in a few milliseconds); set
+``TRIP_KB_PATH`` to keep it in a file, which is rebuilt whenever the dataset
+changes.
+
+Answers put each entry on its own line with prices as ``₹<amount>``, the
+layout ``trip_tools.price_index`` parses booking prices from.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from loguru import logger
+
+DATASET_PATH = os.getenv(
+    "TRIP_KB_DATASET",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "destinations.json")
+)
+KB_PATH = os.getenv("TRIP_KB_PATH", ":memory:")
+
+# Column weights for bm25(): a match on the title or destination counts most
+BM25_WEIGHTS = (8.0, 2.0, 6.0, 1.0)
+
+STOPWORDS = frozenset(
+    "a an and are at best by can do for from go how i in is it me of on or place places please see "
+    "should show some tell the there things to top visit what where which with".split()
+)
+
+# Query words that say which kind of entry the user is after
+KIND_HINTS = {
+    "route": {"train", "flight", "bus", "fare", "fares", "ticket", "tickets", "travel", "route", "routes", "reach", "get"},
+    "attraction": {"attraction", "attractions", "sightseeing", "entry", "fee", "fees", "timings", "hours", "sights"},
+    "stay": {"hotel", "hotels", "stay", "accommodation", "night", "room", "rooms"},
+}
+
+
+@dataclass
+class KnowledgeHit:
+    destination: str
+    kind: str
+    title: str
+    text: str
+    rank: float
+
+
+class DestinationKnowledgeBase:
+    """Ranked full-text lookup over the bundled destination dataset"""
+
+    def __init__(self, dataset_path: str = DATASET_PATH, db_path: str = KB_PATH):
+        self.dataset_path = dataset_path
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._destinations: Dict[str, str] = {}  # lowercase name -> display name
+        self._attractions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._open()
+        return self._conn
+
+    def _open(self) -> sqlite3.Connection:
+        with open(self.dataset_path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        dataset = json.loads(raw)
+
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS kb_entries USING fts5(
+                destination, kind, title, body, text UNINDEXED,
+                tokenize = 'porter unicode61 remove_diacritics 2'
+            )"""
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS kb_meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM kb_meta WHERE key = 'digest'").fetchone()
+        if row is None or row[0] != digest:
+            with conn:
+                conn.execute("DELETE FROM kb_entries")
+                conn.executemany(
+                    "INSERT INTO kb_entries (destination, kind, title, body, text) VALUES (?, ?, ?, ?, ?)",
+                    self._entries(dataset)
+                )
+                conn.execute("INSERT OR REPLACE INTO kb_meta (key, value) VALUES ('digest', ?)", (digest,))
+                conn.execute("INSERT INTO kb_entries (kb_entries) VALUES ('optimize')")
+            logger.info(f"📚 Knowledge base built from {self.dataset_path}")
+
+        self._destinations = {d["destination"].lower(): d["destination"] for d in dataset["destinations"]}
+        self._attractions = {
+            a["name"].lower(): a["name"] for d in dataset["destinations"] for a in d.get("attractions", [])
+        }
+        return conn
+
+    @staticmethod
+    def _entries(dataset: Dict) -> List[tuple]:
+        """Flatten the dataset into (destination, kind, title, body, text) rows"""
+        entries = []
+        for dest in dataset["destinations"]:
+            name = dest["destination"]
+            entries.append((
+                name, "overview", f"{name} travel guide",
+                f"{dest['summary']} {dest.get('state', '')} best time {dest.get('best_time', '')}",
+                f"{name}, {dest.get('state', '')}: {dest['summary']} Best time to visit: {dest.get('best_time', 'all year')}."
+            ))
+            for attraction in dest.get("attractions", []):
+                fee = attraction["entry_fee"]
+                fee_text = f"entry fee ₹{fee}" if fee else "free entry"
+                entries.append((
+                    name, "attraction", attraction["name"],
+                    f"{attraction['description']} sightseeing attraction {fee_text}",
+                    f"{attraction['name']} ({name}): {attraction['description']} "
+                    f"Entry fee: {'₹' + str(fee) if fee else 'free'}. Timings: {attraction.get('hours', 'n/a')}."
+                ))
+            low, high = dest.get("hotel_price_per_night", (None, None))
+            if low:
+                entries.append((
+                    name, "stay", f"Hotels in {name}",
+                    "hotel stay accommodation room price per night",
+                    f"Hotels in {name}: typically ₹{low} to ₹{high} per night."
+                ))
+        for route in dataset.get("routes", []):
+            # Routes are indexed under both ends so "Jaipur to Delhi" finds "Delhi to Jaipur" too
+            entries.append((
+                f"{route['from']} {route['to']}", "route",
+                f"{route['from']} to {route['to']} by {route['mode']}",
+                f"{route['mode']} {route.get('operator', '')} fare ticket travel route",
+                f"{route['from']} to {route['to']} by {route['mode']} ({route.get('operator', 'various operators')}): "
+                f"typically ₹{route['typical_price']}, about {route['duration']}."
+            ))
+        return entries
+
+    def _match_expression(self, query: str) -> Optional[str]:
+        """Build an FTS5 MATCH expression, or None when the query names no known destination or attraction"""
+        text = query.lower()
+        words = re.findall(r"[\w']+", text)
+        destinations = [d for d in self._destinations if re.search(rf"\b{re.escape(d)}\b", text)]
+        attractions = [a for a in self._attractions if re.search(rf"\b{re.escape(a)}\b", text)]
+        if not destinations and not attractions:
+            return None
+
+        if attractions:
+            # A named attraction is specific enough on its own
+            return " OR ".join(f'title:"{a}"' for a in attractions)
+
+        named = {w for d in destinations for w in d.split()}
+        terms = [w for w in words if w not in STOPWORDS and w not in named and len(w) > 1]
+        clauses = [" AND ".join(f'destination:"{d}"' for d in destinations)]
+        # Without a hint ("what to see in Jaipur") the user wants sights, not fares
+        kinds = [kind for kind, hints in KIND_HINTS.items() if hints & set(words)] or ["overview", "attraction"]
+        clauses.append("(" + " OR ".join(f'kind:"{k}"' for k in kinds) + ")")
+        if terms:
+            # Extra words only rank results; any of them may be missing
+            clauses.append("(" + " OR ".join(f'"{t}"' for t in terms) + f' OR destination:"{destinations[0]}")')
+        return " AND ".join(clauses)
+
+    def search(self, query: str, limit: int = 5) -> List[KnowledgeHit]:
+        """
+        Ranked full-text lookup
+
+        Args:
+            query: free-text question; must name a destination in the dataset
+            limit: maximum number of entries to return
+
+        Returns:
+            list of KnowledgeHit, best match first (empty on a miss)
+        """
+        conn = self._connection()
+        expression = self._match_expression(query)
+        if expression is None:
+            return []
+        try:
+            rows = conn.execute(
+                f"""SELECT destination, kind, title, text, bm25(kb_entries, {', '.join(map(str, BM25_WEIGHTS))}) AS rank
+                    FROM kb_entries WHERE kb_entries MATCH ? ORDER BY rank LIMIT ?""",
+                (expression, limit)
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Knowledge base query failed for {query!r}: {e}")
+            return []
+        return [KnowledgeHit(*row) for row in rows]
+
+    def answer(self, query: str, limit: int = 5) -> Optional[str]:
+        """Return a formatted answer for ``query``, or None so the caller can ask the model"""
+        hits = self.search(query, limit)
+        if not hits:
+            self.misses += 1
+            logger.debug("📚 Knowledge base miss: {!r}", query)
+            return None
+        self.hits += 1
+        logger.info(f"📚 Knowledge base answered {query!r} with {len(hits)} entr{'y' if len(hits) == 1 else 'ies'}")
+        return "\n".join(f"- {hit.text}" for hit in hits)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Global knowledge base; built on first search
+knowledge_base = DestinationKnowledgeBase()
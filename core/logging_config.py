@@ -0,0 +1,203 @@
+"""
+Logging configuration for the trip planner processes
+
+loguru's default handler writes every record (DEBUG and up) to stderr
+synchronously on the calling thread. ``configure_logging`` replaces it with a
+single handler that:
+
+- hands formatted lines to a background writer thread, so a slow terminal,
+  file or pipe never stalls a turn. This is an in-process queue rather than
+  loguru's ``enqueue=True``, whose multiprocessing queue pickles every record
+  and made each call about 4x slower than writing synchronously here
+  (benchmarks/bench_logging.py)
+- only accepts the most verbose level any module asks for, so loguru drops
+  calls below it before building a record; messages passed as ``"{}"``
+  arguments (``logger.debug("Cache miss: {}", key)``) are then never formatted
+- applies per-module levels (``core.db=WARNING``) by longest module prefix
+- samples high-frequency levels (``DEBUG=0.05`` keeps about 1 in 20)
+- optionally emits one JSON object per line for log shippers
+
+Settings come from the environment:
+    TRIP_LOG_LEVEL=INFO                               default level
+    TRIP_LOG_LEVELS=core.db=WARNING,trip_tools=DEBUG  per-module levels
+    TRIP_LOG_SAMPLE=DEBUG=0.05                        keep-rates per level (WARNING and up are always kept)
+    TRIP_LOG_JSON=1                                   JSON lines instead of text
+    TRIP_LOG_FILE=logs/trip.log                       file instead of stderr
+    TRIP_LOG_ENQUEUE=0                                write synchronously (e.g. when debugging a crash)
+"""
+import json
+import os
+import queue
+import random
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from loguru import logger
+
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+ALWAYS_KEPT_LEVEL = logger.level("WARNING").no
+
+
+def _parse_pairs(text: str) -> Dict[str, str]:
+    pairs = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected key=value, got {item!r}")
+        pairs[key.strip()] = value.strip()
+    return pairs
+
+
+@dataclass
+class LoggingSettings:
+    level: str = "INFO"
+    module_levels: Dict[str, str] = field(default_factory=dict)
+    sample_rates: Dict[str, float] = field(default_factory=dict)
+    json: bool = False
+    sink: Optional[str] = None  # file path; None = stderr
+    enqueue: bool = True
+
+    @classmethod
+    def from_env(cls) -> "LoggingSettings":
+        return cls(
+            level=os.getenv("TRIP_LOG_LEVEL", "INFO").upper(),
+            module_levels={k: v.upper() for k, v in _parse_pairs(os.getenv("TRIP_LOG_LEVELS", "")).items()},
+            sample_rates={k.upper(): float(v) for k, v in _parse_pairs(os.getenv("TRIP_LOG_SAMPLE", "")).items()},
+            json=os.getenv("TRIP_LOG_JSON", "0").lower() in ("1", "true", "yes"),
+            sink=os.getenv("TRIP_LOG_FILE") or None,
+            enqueue=os.getenv("TRIP_LOG_ENQUEUE", "1").lower() not in ("0", "false", "no"),
+        )
+
+
+class _LevelAndSampleFilter:
+    """Per-module levels by longest prefix, then per-level sampling"""
+
+    def __init__(self, settings: LoggingSettings):
+        self.default = logger.level(settings.level).no
+        self.modules = sorted(((name, logger.level(level).no) for name, level in settings.module_levels.items()),
+                              key=lambda item: len(item[0]), reverse=True)
+        self.rates = {logger.level(level).no: rate for level, rate in settings.sample_rates.items()}
+        self._resolved: Dict[str, int] = {}
+
+    def level_for(self, module: Optional[str]) -> int:
+        module = module or ""
+        level = self._resolved.get(module)
+        if level is None:
+            level = next((no for name, no in self.modules
+                          if module == name or module.startswith(name + ".")), self.default)
+            self._resolved[module] = level
+        return level
+
+    def __call__(self, record) -> bool:
+        levelno = record["level"].no
+        if levelno < self.level_for(record["name"]):
+            return False
+        rate = self.rates.get(levelno)
+        return rate is None or levelno >= ALWAYS_KEPT_LEVEL or random.random() < rate
+
+
+class BackgroundWriter:
+    """
+    loguru sink that writes lines from a daemon thread
+
+    Callers only append to an in-process queue; the thread writes whatever
+    has accumulated and flushes once per batch. loguru calls ``stop`` when
+    the handler is removed (including at exit), which drains the queue.
+    """
+    _STOP = object()
+
+    def __init__(self, target):
+        self._owns_stream = isinstance(target, str)
+        if self._owns_stream:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            self._stream = open(target, "a", encoding="utf-8")
+        else:
+            self._stream = target
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        self._queue.put(str(message))
+
+    def isatty(self) -> bool:
+        return getattr(self._stream, "isatty", lambda: False)()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is self._STOP
+            if stop:
+                batch.pop()
+            try:
+                self._stream.write("".join(batch))
+                self._stream.flush()
+            except (OSError, ValueError):
+                pass  # nowhere left to report a failed log write
+            if stop:
+                return
+
+    def stop(self) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=5)
+        if self._owns_stream:
+            self._stream.close()
+
+
+def _json_format(record) -> str:
+    payload: Dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    if record["extra"]:
+        payload["extra"] = record["extra"]
+    if record["exception"] is not None:
+        exc_type, exc, _ = record["exception"]
+        payload["exception"] = f"{exc_type.__name__}: {exc}" if exc_type else None
+    record["extra"]["_json"] = json.dumps(payload, default=str, ensure_ascii=False)
+    return "{extra[_json]}\n"
+
+
+def configure_logging(settings: Optional[LoggingSettings] = None, sink=None) -> int:
+    """
+    Replace loguru's handlers with one configured from ``settings`` (default: the environment)
+
+    ``sink`` overrides the settings' destination (anything loguru accepts;
+    a path or stream is wrapped in a BackgroundWriter when ``enqueue`` is
+    set). Returns the handler id; ``logger.remove()`` flushes the writer.
+    """
+    settings = settings or LoggingSettings.from_env()
+    log_filter = _LevelAndSampleFilter(settings)
+    # The handler level is the most verbose level any module uses, so calls
+    # below it return before loguru builds a record
+    handler_level = min([log_filter.default] + [no for _, no in log_filter.modules])
+
+    target = sink or settings.sink or sys.stderr
+    colorize = not settings.json and target is sys.stderr and sys.stderr.isatty()
+    if settings.enqueue and (isinstance(target, str) or hasattr(target, "write")):
+        target = BackgroundWriter(target)
+
+    logger.remove()
+    handler_id = logger.add(
+        target,
+        level=handler_level,
+        filter=log_filter,
+        format=_json_format if settings.json else TEXT_FORMAT,
+        colorize=colorize,
+        backtrace=False,
+        diagnose=False,
+    )
+    return handler_id
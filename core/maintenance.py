@@ -0,0 +1,160 @@
+"""
+Leader-elected database maintenance for multi-process deployments
+
+Every worker process runs a MaintenanceScheduler, but only the one holding
+the ``maintenance`` lease in the shared database actually does the work on
+each tick. The lease expires on its own if the leader dies, so another
+worker takes over within ``lease_ttl`` seconds.
+
+Jobs are plain async callables taking the DatabaseManager; register extra
+ones with ``add_job``. A job may run less often than every tick (``every``
+seconds), which is how the expensive VACUUM is kept to a daily schedule.
+
+Run one pass by hand (ignores the lease):
+    python -m core.maintenance [--ttl-hours 168] [--vacuum]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from core.db import DatabaseManager
+
+LEASE_NAME = "maintenance"
+
+# Sessions untouched for this long are expired, then archived on the same pass
+SESSION_TTL_SECONDS = float(os.getenv("TRIP_SESSION_TTL_SECONDS", 7 * 24 * 3600))
+# Cancelled bookings stay in the live table this long (refund lookups etc.)
+CANCELLED_BOOKING_RETENTION_SECONDS = float(os.getenv("TRIP_CANCELLED_RETENTION_SECONDS", 24 * 3600))
+VACUUM_INTERVAL_SECONDS = float(os.getenv("TRIP_VACUUM_INTERVAL_SECONDS", 24 * 3600))
+# VACUUM rewrites the whole file; skip it unless enough pages are free
+VACUUM_MIN_FREE_RATIO = 0.2
+
+MaintenanceJob = Callable[[DatabaseManager], Awaitable[object]]
+
+
+async def checkpoint_wal(db: DatabaseManager) -> Dict[str, int]:
+    """Fold the WAL back into the database file so it doesn't grow unbounded"""
+    return await db.checkpoint()
+
+
+async def optimize_planner(db: DatabaseManager) -> None:
+    """Keep query planner statistics fresh"""
+    await db.optimize()
+
+
+def expire_and_archive(ttl_seconds: float = SESSION_TTL_SECONDS,
+                       cancelled_retention: float = CANCELLED_BOOKING_RETENTION_SECONDS,
+                       batch_size: int = 200) -> MaintenanceJob:
+    """Job: expire idle sessions, then move inactive sessions and old cancellations to the archive"""
+    async def job(db: DatabaseManager) -> Dict[str, int]:
+        expired = await db.expire_idle_sessions(ttl_seconds)
+        archived = await db.archive_inactive_sessions(batch_size)
+        cancelled = await db.archive_cancelled_bookings(cancelled_retention)
+        return {"expired_sessions": expired, "archived_sessions": archived["sessions"],
+                "archived_bookings": archived["bookings"] + cancelled}
+    return job
+
+
+def vacuum_if_fragmented(min_free_ratio: float = VACUUM_MIN_FREE_RATIO) -> MaintenanceJob:
+    """Job: VACUUM when at least ``min_free_ratio`` of the pages are free; reports reclaimed bytes"""
+    async def job(db: DatabaseManager) -> Dict[str, object]:
+        ratio = db.free_page_ratio()
+        if ratio < min_free_ratio:
+            return {"skipped": True, "free_ratio": round(ratio, 3)}
+        return await db.vacuum()
+    return job
+
+
+class MaintenanceScheduler:
+    """Runs maintenance jobs on whichever worker currently holds the lease"""
+
+    def __init__(self, db: DatabaseManager, interval: float = 300.0,
+                 lease_ttl: Optional[float] = None, holder: Optional[str] = None):
+        self.db = db
+        self.interval = interval
+        self.lease_ttl = lease_ttl or interval * 3
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # (name, job, minimum seconds between runs; None = every tick)
+        self.jobs: List[Tuple[str, MaintenanceJob, Optional[float]]] = [
+            ("archive", expire_and_archive(), None),
+            ("wal_checkpoint", checkpoint_wal, None),
+            ("optimize", optimize_planner, None),
+            ("vacuum", vacuum_if_fragmented(), VACUUM_INTERVAL_SECONDS),
+        ]
+        self._last_run: Dict[str, float] = {}
+        self.is_leader = False
+
+    def add_job(self, name: str, job: MaintenanceJob, every: Optional[float] = None) -> None:
+        self.jobs.append((name, job, every))
+
+    async def run_once(self) -> Dict[str, object]:
+        """
+        Run the due jobs if this worker is (or becomes) the leader
+
+        Returns:
+            dict: job name -> result (or error message); empty when not leader
+        """
+        self.is_leader = await self.db.acquire_lease(LEASE_NAME, self.holder, self.lease_ttl)
+        if not self.is_leader:
+            return {}
+        return await self.run_jobs()
+
+    async def run_jobs(self, force: bool = False) -> Dict[str, object]:
+        """Run every job whose schedule is due (all of them with ``force``)"""
+        results = {}
+        now = time.monotonic()
+        for name, job, every in self.jobs:
+            last = self._last_run.get(name)
+            if not force and every and last is not None and now - last < every:
+                continue
+            self._last_run[name] = now
+            try:
+                results[name] = await job(self.db)
+                logger.debug("🧹 Maintenance job {} done: {}", name, results[name])
+            except Exception as e:
+                logger.error(f"❌ Maintenance job {name} failed: {e}")
+                results[name] = f"error: {e}"
+        return results
+
+    async def run_forever(self) -> None:
+        """Tick every ``interval`` seconds until cancelled, then hand the lease back"""
+        logger.info(f"🗳️ Maintenance scheduler started as {self.holder}")
+        try:
+            while True:
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"❌ Maintenance tick failed: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            if self.is_leader:
+                await self.db.release_lease(LEASE_NAME, self.holder)
+
+
+async def _run_cli(args) -> Dict[str, object]:
+    from core.db import db_manager
+    scheduler = MaintenanceScheduler(db_manager)
+    scheduler.jobs = [
+        ("archive", expire_and_archive(args.ttl_hours * 3600), None),
+        ("wal_checkpoint", checkpoint_wal, None),
+    ]
+    if args.vacuum:
+        scheduler.add_job("vacuum", vacuum_if_fragmented(min_free_ratio=0.0))
+    return await scheduler.run_jobs(force=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one database maintenance pass now")
+    parser.add_argument("--ttl-hours", type=float, default=SESSION_TTL_SECONDS / 3600,
+                        help="expire sessions idle for longer than this")
+    parser.add_argument("--vacuum", action="store_true", help="also VACUUM and report reclaimed bytes")
+    print(json.dumps(asyncio.run(_run_cli(parser.parse_args(argv))), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
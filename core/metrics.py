@@ -0,0 +1,321 @@
+"""
+In-process metrics registry with Prometheus text exposition
+
+Counters, gauges and histograms, optionally labelled. Values that other
+components already count (session cache and knowledge base hits) are read
+by callback when the registry is rendered, so those paths pay nothing extra.
+
+The server exposes ``GET /metrics``; ``write_metrics`` / ``dump_periodically``
+write the same text to a file (atomically) for node-exporter style textfile
+collection. Every process keeps its own registry, so with several workers
+give each its own file (``{pid}`` in the path is replaced).
+
+Metric names:
+    trip_turns_total{status}                      ok / error / cancelled (incl. timeouts)
+    trip_turn_duration_seconds                    whole turn
+    trip_tool_duration_seconds{operation}         each agent tool call
+    trip_db_duration_seconds{operation}           each DatabaseManager method
+    trip_email_duration_seconds{operation}        notification sends
+    trip_operation_errors_total{kind,operation,error}
+    trip_rate_limiter_wait_seconds                every limiter reservation (0 = no wait)
+    trip_model_errors_total{type}                 API status code or exception type
+    trip_emails_total{result}                     sent / failed / skipped
+    trip_emails_in_flight                         SMTP sends in progress
+    trip_emails_digested_total                    notifications folded into a digest email
+    trip_email_digest_failures_total              digest emails that failed to send
+    trip_cache_hits_total{cache} / trip_cache_misses_total{cache}
+    trip_session_cache_entries
+"""
+import asyncio
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from loguru import logger
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable] = None
+
+    def labels(self, *values) -> object:
+        """The child for these label values (created on first use)"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, function: Callable[[], Union[float, Dict[LabelValues, float]]]) -> None:
+        """
+        Read the value at render time instead
+
+        ``function`` returns a number, or for labelled metrics a dict of
+        label-value tuples to numbers.
+        """
+        self._function = function
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _values(self) -> Iterable[Tuple[LabelValues, object]]:
+        if self._function is None:
+            return list(self._children.items())
+        try:
+            result = self._function()
+        except Exception as e:
+            logger.warning(f"⚠️ Metric {self.name} callback failed: {e}")
+            return []
+        if isinstance(result, dict):
+            return [(tuple(str(v) for v in key), value) for key, value in result.items()]
+        return [((), result)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._values(), key=lambda item: item[0]):
+            value = child if isinstance(child, (int, float)) else child.value
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class _ValueChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonic count; name it ``*_total``"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets (seconds by convention)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def set_function(self, function) -> None:
+        raise ValueError("Histograms cannot be read from a callback")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items(), key=lambda item: item[0]):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts + [0]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative if bound != math.inf else child.count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics; asking for an existing name returns the registered metric"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name in sorted(self._metrics):
+            lines += self._metrics[name].render()
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Global registry and the runtime's metrics
+registry = MetricsRegistry()
+
+turns_total = registry.counter("trip_turns_total", "Agent turns processed", ("status",))
+turn_seconds = registry.histogram("trip_turn_duration_seconds", "Agent turn latency")
+tool_seconds = registry.histogram("trip_tool_duration_seconds", "Agent tool call latency", ("operation",))
+db_seconds = registry.histogram("trip_db_duration_seconds", "DatabaseManager operation latency", ("operation",))
+email_seconds = registry.histogram("trip_email_duration_seconds", "Notification send latency", ("operation",))
+operation_errors = registry.counter("trip_operation_errors_total", "Instrumented calls that raised",
+                                    ("kind", "operation", "error"))
+limiter_wait_seconds = registry.histogram("trip_rate_limiter_wait_seconds", "Wait imposed per rate-limiter reservation",
+                                          buckets=(0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 60.0))
+model_errors = registry.counter("trip_model_errors_total", "Model call failures by type", ("type",))
+emails_total = registry.counter("trip_emails_total", "Email notifications by result", ("result",))
+emails_in_flight = registry.gauge("trip_emails_in_flight", "SMTP sends in progress")
+emails_digested = registry.counter("trip_emails_digested_total", "Notifications folded into a digest email")
+digest_failures = registry.counter("trip_email_digest_failures_total",
+                                   "Digest emails that failed to send (their notifications stay queued)")
+
+OPERATION_HISTOGRAMS = {"tool": tool_seconds, "db": db_seconds, "smtp": email_seconds}
+
+
+def operation_timer(kind: str, operation: str) -> Optional[Callable[[float], None]]:
+    """
+    Observer for the latency histogram of this kind of operation, if there is one
+
+    The labelled series is created on the first observation, so operations
+    that never run do not fill the exposition with empty histograms.
+    """
+    histogram = OPERATION_HISTOGRAMS.get(kind)
+    if histogram is None:
+        return None
+
+    def observe(seconds: float) -> None:
+        histogram.labels(operation).observe(seconds)
+    return observe
+
+
+def _cache_counts(field: str) -> Dict[LabelValues, float]:
+    from core.db import db_manager
+    from core.knowledge_base import knowledge_base
+    return {("session",): getattr(db_manager.session_cache, field), ("knowledge_base",): getattr(knowledge_base, field)}
+
+
+registry.counter("trip_cache_hits_total", "Cache hits", ("cache",)).set_function(lambda: _cache_counts("hits"))
+registry.counter("trip_cache_misses_total", "Cache misses", ("cache",)).set_function(lambda: _cache_counts("misses"))
+registry.gauge("trip_session_cache_entries", "Sessions held in the state cache").set_function(
+    lambda: len(__import__("core.db", fromlist=["db_manager"]).db_manager.session_cache))
+
+
+def write_metrics(path: str, target: Optional[MetricsRegistry] = None) -> str:
+    """Write the exposition text to ``path`` (atomically); returns the path written"""
+    path = path.replace("{pid}", str(os.getpid()))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write((target or registry).render())
+    os.replace(tmp, path)
+    return path
+
+
+async def dump_periodically(path: str, interval: float = 15.0) -> None:
+    """Rewrite the metrics file every ``interval`` seconds until cancelled (and once more then)"""
+    try:
+        while True:
+            write_metrics(path)
+            await asyncio.sleep(interval)
+    finally:
+        write_metrics(path)
@@ -0,0 +1,304 @@
+"""
+Versioned schema migrations for the trip planner database
+
+The applied version is recorded in ``schema_version``. On startup
+``MigrationRunner.run`` does one SELECT and, when the schema is already
+current, no DDL at all. Otherwise the pending migrations are applied in
+order inside a single ``BEGIN IMMEDIATE`` transaction, so concurrent worker
+processes cannot apply the same step twice.
+
+Migrations that need to rewrite existing rows declare a ``backfill`` that runs
+*after* the DDL commits, in small autocommitted batches. Each batch holds the
+write lock only briefly, so a large backfill never stalls live writers. A
+backfill is resumable: until it finishes, its ``schema_version`` row has no
+``backfilled_at`` and the next startup carries on from where it stopped.
+
+To add a migration, append a ``Migration`` with the next version number to
+``MIGRATIONS``. Never edit or reorder one that has shipped.
+"""
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Callable, Optional, Sequence, Tuple
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Sequence[str] = ()
+    # DDL that has to look at the live schema (e.g. conditional ALTERs); runs before ``statements``
+    apply: Optional[Callable[[sqlite3.Connection], None]] = None
+    # One batch of row rewrites: (conn, batch_size) -> rows changed; repeated until a short batch
+    backfill: Optional[Callable[[sqlite3.Connection, int], int]] = None
+
+
+def _add_column_if_missing(table: str, column: str, definition: str) -> Callable[[sqlite3.Connection], None]:
+    """Databases touched by pre-migration code may already have the column"""
+    def apply(conn: sqlite3.Connection) -> None:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return apply
+
+
+INITIAL_SCHEMA = (
+    # Users table with unique identification
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE,
+        phone TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1,
+        metadata JSON
+    )""",
+    # Sessions table linked to users
+    """CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        session_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        state JSON,
+        is_active BOOLEAN DEFAULT 1,
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    )""",
+    # Bookings table with user and session tracking
+    """CREATE TABLE IF NOT EXISTS bookings (
+        booking_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        booking_type TEXT NOT NULL CHECK(booking_type IN ('accommodation', 'travel', 'sightseeing')),
+        details JSON NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'confirmed' CHECK(status IN ('pending', 'confirmed', 'cancelled', 'completed')),
+        FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+        FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_active ON sessions(is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_id ON bookings(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_session_id ON bookings(session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status)",
+    # Composite indexes backing keyset pagination (ORDER BY ... DESC, id DESC)
+    "CREATE INDEX IF NOT EXISTS idx_users_active_created ON users(is_active, created_at, user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user_last_active ON sessions(user_id, last_active, session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_session_created ON bookings(session_id, created_at, booking_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_created ON bookings(user_id, created_at, booking_id)",
+    # View for active sessions with user details
+    """CREATE VIEW IF NOT EXISTS active_user_sessions AS
+    SELECT
+        s.session_id,
+        s.user_id,
+        u.name as user_name,
+        u.email as user_email,
+        s.session_name,
+        s.created_at,
+        s.last_active,
+        s.state
+    FROM sessions s
+    JOIN users u ON s.user_id = u.user_id
+    WHERE s.is_active = 1 AND u.is_active = 1""",
+)
+
+# Same field per booking type that get_session_bill has always summed
+BOOKING_AMOUNT_SQL = """CAST(CASE booking_type
+        WHEN 'travel' THEN json_extract(details, '$.price')
+        WHEN 'accommodation' THEN json_extract(details, '$.total_price')
+        WHEN 'sightseeing' THEN json_extract(details, '$.budget')
+    END AS INTEGER)"""
+
+
+def _backfill_booking_amounts(conn: sqlite3.Connection, batch_size: int) -> int:
+    return conn.execute(
+        f"""UPDATE bookings SET amount = COALESCE({BOOKING_AMOUNT_SQL}, 0)
+            WHERE rowid IN (SELECT rowid FROM bookings WHERE amount IS NULL LIMIT ?)""",
+        (batch_size,)
+    ).rowcount
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "initial_schema", INITIAL_SCHEMA),
+    Migration(
+        2, "session_versions",
+        apply=_add_column_if_missing("sessions", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ),
+    Migration(3, "maintenance_leases", (
+        """CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+    )),
+    Migration(
+        4, "booking_amounts",
+        # Covering index: session bills sum ``amount`` without touching the JSON
+        ("CREATE INDEX IF NOT EXISTS idx_bookings_bill ON bookings(session_id, status, amount)",),
+        apply=_add_column_if_missing("bookings", "amount", "INTEGER"),
+        backfill=_backfill_booking_amounts,
+    ),
+    Migration(5, "session_archive", (
+        """CREATE TABLE IF NOT EXISTS sessions_archive (
+            session_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            session_name TEXT,
+            created_at TIMESTAMP,
+            last_active TIMESTAMP,
+            state JSON,
+            is_active BOOLEAN,
+            version INTEGER NOT NULL DEFAULT 0,
+            archived_at TIMESTAMP NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS bookings_archive (
+            booking_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            booking_type TEXT NOT NULL,
+            details JSON NOT NULL,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            status TEXT,
+            amount INTEGER,
+            archived_at TIMESTAMP NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_archive_user ON sessions_archive(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_archive_user ON bookings_archive(user_id)",
+        # A boolean index is useless for lookups; partial indexes serve the two scans that need it.
+        # Timestamps are stored both as CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS') and as ISO
+        # strings ('...T...+00:00'), so the maintenance scans compare datetime(column)
+        "DROP INDEX IF EXISTS idx_sessions_active",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_idle ON sessions(datetime(last_active)) WHERE is_active = 1",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_inactive ON sessions(session_id) WHERE is_active = 0",
+        "CREATE INDEX IF NOT EXISTS idx_bookings_cancelled ON bookings(datetime(updated_at)) "
+        "WHERE status = 'cancelled'",
+    )),
+    Migration(6, "booking_events", (
+        # Append-only booking history; ``bookings`` is the projection of it. ``seq`` is the
+        # event's position in the session's log.
+        """CREATE TABLE IF NOT EXISTS booking_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event_type TEXT NOT NULL CHECK(event_type IN ('booked', 'modified', 'cancelled', 'refunded')),
+            booking_type TEXT NOT NULL,
+            booking_id TEXT NOT NULL,
+            previous_booking_id TEXT,
+            amount INTEGER NOT NULL DEFAULT 0,
+            details JSON,
+            occurred_at TEXT NOT NULL,
+            UNIQUE (session_id, seq)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_booking_events_type_time ON booking_events(event_type, occurred_at)",
+        "CREATE INDEX IF NOT EXISTS idx_booking_events_user_time ON booking_events(user_id, occurred_at)",
+        "CREATE INDEX IF NOT EXISTS idx_booking_events_booking ON booking_events(booking_id, event_id)",
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+class MigrationRunner:
+    """Brings a database up to ``LATEST_VERSION``"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 migrations: Sequence[Migration] = MIGRATIONS,
+                 batch_size: int = 500, batch_pause: float = 0.0):
+        self.connect = connect
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+
+    def _open(self) -> sqlite3.Connection:
+        conn = self.connect()
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        return conn
+
+    @staticmethod
+    def _status(conn: sqlite3.Connection) -> Tuple[int, int]:
+        """(applied version, migrations with unfinished backfills); (0, 0) on a fresh DB"""
+        try:
+            row = conn.execute(
+                "SELECT COALESCE(MAX(version), 0), COALESCE(SUM(backfilled_at IS NULL), 0) FROM schema_version"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return 0, 0
+        return row[0], row[1]
+
+    def run(self) -> int:
+        """Apply pending migrations and backfills; returns the schema version"""
+        conn = self._open()
+        try:
+            current, unfinished = self._status(conn)
+            latest = self.migrations[-1].version if self.migrations else 0
+            if current >= latest and not unfinished:
+                return current
+
+            if current < latest:
+                current = self._apply_pending(conn)
+            self._run_backfills(conn)
+            return current
+        finally:
+            conn.close()
+
+    def _apply_pending(self, conn: sqlite3.Connection) -> int:
+        # journal_mode is persistent in the file and cannot change inside a transaction
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TEXT NOT NULL,
+                    backfilled_at TEXT
+                )"""
+            )
+            # Re-read under the write lock: another process may have migrated meanwhile
+            current, _ = self._status(conn)
+            for migration in self.migrations:
+                if migration.version <= current:
+                    continue
+                if migration.apply:
+                    migration.apply(conn)
+                for statement in migration.statements:
+                    conn.execute(statement)
+                now = datetime.now(UTC).isoformat()
+                conn.execute(
+                    "INSERT INTO schema_version (version, name, applied_at, backfilled_at) VALUES (?, ?, ?, ?)",
+                    (migration.version, migration.name, now, None if migration.backfill else now)
+                )
+                current = migration.version
+                logger.info(f"🗄️ Applied migration {migration.version}: {migration.name}")
+            conn.execute("COMMIT")
+            return current
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _run_backfills(self, conn: sqlite3.Connection) -> None:
+        pending = {row[0] for row in conn.execute(
+            "SELECT version FROM schema_version WHERE backfilled_at IS NULL"
+        )}
+        for migration in self.migrations:
+            if migration.version not in pending or not migration.backfill:
+                continue
+            total = 0
+            while True:
+                # Autocommit: each batch is its own short write transaction
+                changed = migration.backfill(conn, self.batch_size)
+                total += changed
+                if changed < self.batch_size:
+                    break
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+            conn.execute(
+                "UPDATE schema_version SET backfilled_at = ? WHERE version = ?",
+                (datetime.now(UTC).isoformat(), migration.version)
+            )
+            logger.info(f"🗄️ Backfilled {total} row(s) for migration {migration.version}: {migration.name}")
@@ -1,8 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Mapping, Union
+from .serialization import decode as _decode_json
 
-@dataclass
+
+@dataclass(slots=True)
 class User:
     """User model representing trip planner users"""
     user_id: str
@@ -10,22 +12,147 @@ class User:
     email: Optional[str]
     created_at: datetime
 
-@dataclass
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "User":
+        """Build a User from a ``users`` table row"""
+        return cls(
+            row['user_id'],
+            row['name'],
+            row['email'],
+            datetime.fromisoformat(row['created_at'])
+        )
+
+
+@dataclass(slots=True)
 class Session:
-    """Session model for maintaining user state"""
+    """
+    Session model for maintaining user state
+
+    When built with ``from_row(row, lazy=True)`` the ``state`` slot is left
+    empty and the raw JSON is kept in ``_raw_state``; it is decoded on first
+    access of ``state`` and cached in the slot from then on.
+
+    ``version`` is bumped on every state write and is what compare-and-swap
+    updates (``DatabaseManager.update_session_state(expected_version=...)``)
+    check against.
+    """
     session_id: str
     user_id: str
     created_at: datetime
     last_active: datetime
     state: Dict[str, Any]
+    version: int = 0
+    _raw_state: Optional[Union[str, bytes]] = field(default=None, repr=False, compare=False)
 
-@dataclass
+    def __getattr__(self, name: str) -> Any:
+        # Only reached when a slot is unset, i.e. a lazily decoded ``state``
+        if name != 'state':
+            raise AttributeError(name)
+        state = _decode_json(self._raw_state)
+        self.state = state
+        self._raw_state = None
+        return state
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any], lazy: bool = False) -> "Session":
+        """Build a Session from a ``sessions`` table row"""
+        if not lazy:
+            return cls(
+                row['session_id'],
+                row['user_id'],
+                datetime.fromisoformat(row['created_at']),
+                datetime.fromisoformat(row['last_active']),
+                _decode_json(row['state']),
+                row['version']
+            )
+        session = cls.__new__(cls)
+        session.session_id = row['session_id']
+        session.user_id = row['user_id']
+        session.created_at = datetime.fromisoformat(row['created_at'])
+        session.last_active = datetime.fromisoformat(row['last_active'])
+        session.version = row['version']
+        session._raw_state = row['state']
+        return session
+
+
+@dataclass(slots=True)
 class Booking:
-    """Booking model for all types of reservations"""
+    """
+    Booking model for all types of reservations
+
+    ``from_row(row, lazy=True)`` defers decoding ``details`` until first access,
+    the same way ``Session`` handles ``state``.
+    """
     booking_id: str
     user_id: str
     session_id: str
     booking_type: str  # 'accommodation', 'travel', 'sightseeing'
     details: Dict[str, Any]
     created_at: datetime
-    status: str
\ No newline at end of file
+    status: str
+    _raw_details: Optional[Union[str, bytes]] = field(default=None, repr=False, compare=False)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached when a slot is unset, i.e. lazily decoded ``details``
+        if name != 'details':
+            raise AttributeError(name)
+        details = _decode_json(self._raw_details)
+        self.details = details
+        self._raw_details = None
+        return details
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any], lazy: bool = False) -> "Booking":
+        """Build a Booking from a ``bookings`` table row"""
+        if not lazy:
+            return cls(
+                row['booking_id'],
+                row['user_id'],
+                row['session_id'],
+                row['booking_type'],
+                _decode_json(row['details']),
+                datetime.fromisoformat(row['created_at']),
+                row['status']
+            )
+        booking = cls.__new__(cls)
+        booking.booking_id = row['booking_id']
+        booking.user_id = row['user_id']
+        booking.session_id = row['session_id']
+        booking.booking_type = row['booking_type']
+        booking.created_at = datetime.fromisoformat(row['created_at'])
+        booking.status = row['status']
+        booking._raw_details = row['details']
+        return booking
+
+
+@dataclass(slots=True)
+class BookingEvent:
+    """One entry of the append-only booking log (``booking_events`` table)"""
+    event_id: int
+    session_id: str
+    user_id: str
+    seq: int
+    event_type: str  # 'booked', 'modified', 'cancelled', 'refunded'
+    booking_type: str
+    booking_id: str
+    previous_booking_id: Optional[str]  # set on 'modified': the booking it replaced
+    amount: int
+    details: Dict[str, Any]
+    occurred_at: datetime
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "BookingEvent":
+        """Build a BookingEvent from a ``booking_events`` table row"""
+        return cls(
+            row['event_id'],
+            row['session_id'],
+            row['user_id'],
+            row['seq'],
+            row['event_type'],
+            row['booking_type'],
+            row['booking_id'],
+            row['previous_booking_id'],
+            row['amount'],
+            _decode_json(row['details']) if row['details'] else {},
+            datetime.fromisoformat(row['occurred_at'])
+        )
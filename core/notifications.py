@@ -1,33 +1,139 @@
 """
 Universal email notification service - works with ANY recipient email
+
+Digest mode (optional) batches a user's booking and cancellation
+notifications into one itinerary email with all items and totals, instead of
+sending one email per event:
+
+    TRIP_EMAIL_DIGEST=120       buffer for up to 120 s after the first event, then send
+    TRIP_EMAIL_DIGEST=session   buffer until the session ends (CLI) or the server shuts down
+    TRIP_EMAIL_DIGEST_MAX_AGE   cap on how long any digest waits (default 3600 s)
+
+Unset or 0 sends every notification immediately, as before. A caller can
+still ask for an immediate email per event (``immediate=True``). Digests are
+kept per process, one per (session, recipient), so bookings from different
+sessions never share an email.
 """
+import math
 import os
 import smtplib
 import asyncio
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
 from loguru import logger
-from dotenv import load_dotenv
+from .metrics import digest_failures, emails_digested, emails_in_flight, emails_total
+from .tracing import instrument_class
+
+
+EMAIL_STYLE = """    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f4f4f4; }
+        .container { max-width: 600px; margin: 20px auto; background: #fff; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }
+        .header h1 { margin: 0; font-size: 28px; }
+        .content { padding: 30px; }
+        .booking-id { background: #667eea; color: white; padding: 12px 20px; border-radius: 8px; display: inline-block; margin: 15px 0; font-weight: bold; font-size: 16px; }
+        .booking-info { background: #f8f9fa; padding: 20px; margin: 20px 0; border-radius: 8px; }
+        .booking-info h3 { margin: 0 0 15px 0; color: #667eea; border-bottom: 2px solid #667eea; padding-bottom: 10px; }
+        .info-row { padding: 10px 0; border-bottom: 1px solid #e0e0e0; display: flex; justify-content: space-between; }
+        .info-row:last-child { border-bottom: none; }
+        .label { font-weight: 600; color: #667eea; }
+        .value { color: #333; text-align: right; }
+        .footer { text-align: center; padding: 20px; color: #888; font-size: 12px; background: #f8f9fa; }
+    </style>
+"""
+# Detail keys that are never shown in an email
+HIDDEN_DETAIL_KEYS = ('booking_id', 'user_id', 'created_at')
+# Detail fields holding what a booking costs, most specific first
+AMOUNT_KEYS = ('total_price', 'price', 'budget', 'entry_fee')
+DIGEST_TITLE = "Your Trip Itinerary"
+# A digest whose email fails is kept and retried this much later, up to DIGEST_MAX_ATTEMPTS sends
+DIGEST_RETRY_SECONDS = 60.0
+DIGEST_MAX_ATTEMPTS = 3
+DEFAULT_DIGEST_MAX_AGE = 3600.0
+
+
+def parse_digest_window(value: Optional[str]) -> Optional[float]:
+    """TRIP_EMAIL_DIGEST: None for immediate emails, seconds to buffer, or inf for 'session'"""
+    value = (value or "").strip().lower()
+    if value in ("", "0", "off"):
+        return None
+    if value == "session":
+        return math.inf
+    window = float(value)
+    if window < 0:
+        raise ValueError(f"TRIP_EMAIL_DIGEST must be 'session' or seconds >= 0, got {value}")
+    return window or None
 
-load_dotenv()
 
+@dataclass(frozen=True)
+class SmtpSettings:
+    server: str
+    port: int
+    sender_email: str
+    sender_password: str
+    digest_window: Optional[float] = None  # see parse_digest_window
+    digest_max_age: float = DEFAULT_DIGEST_MAX_AGE
+
+    @classmethod
+    def from_env(cls) -> "SmtpSettings":
+        """Read SMTP settings from the environment (and .env, loaded here rather than at import)"""
+        from dotenv import load_dotenv
+        load_dotenv()
+        return cls(
+            server=os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            sender_email=os.getenv("SENDER_EMAIL", ""),
+            sender_password=os.getenv("SENDER_PASSWORD", ""),
+            digest_window=parse_digest_window(os.getenv("TRIP_EMAIL_DIGEST")),
+            digest_max_age=float(os.getenv("TRIP_EMAIL_DIGEST_MAX_AGE", DEFAULT_DIGEST_MAX_AGE)),
+        )
+
+    @property
+    def digest_delay(self) -> float:
+        """How long a digest waits after its first notification before it is sent"""
+        return min(self.digest_window, self.digest_max_age)
+
+
+@dataclass
+class PendingDigest:
+    """Notifications buffered for one recipient in one session"""
+    session_id: Optional[str]
+    user_email: str
+    user_name: str
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    timer: Optional[asyncio.Task] = None
+    failures: int = 0
+    # Held while the digest email is sent, so two flushes never send the same items
+    sending: asyncio.Lock = field(default_factory=asyncio.Lock)
 
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SENDER_EMAIL = os.getenv("SENDER_EMAIL", "")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD", "")
 
 class NotificationService:
     """Universal email service - works with ANY recipient"""
     
     def __init__(self):
-        self.email_enabled = bool(SENDER_EMAIL and SENDER_PASSWORD)
-        
-        if self.email_enabled:
-            logger.info(f"✅ Email service ready - Sender: {SENDER_EMAIL}")
-        else:
-            logger.warning("⚠️ Email not configured - set SENDER_EMAIL and SENDER_PASSWORD in .env")
+        # Settings are read on first send so importing this module stays cheap
+        self._settings: Optional[SmtpSettings] = None
+        self._digests: Dict[Tuple[str, str], PendingDigest] = {}
+
+    @property
+    def settings(self) -> SmtpSettings:
+        if self._settings is None:
+            self._settings = SmtpSettings.from_env()
+            if self.email_enabled:
+                logger.info(f"✅ Email service ready - Sender: {self._settings.sender_email}")
+            else:
+                logger.warning("⚠️ Email not configured - set SENDER_EMAIL and SENDER_PASSWORD in .env")
+        return self._settings
+
+    @property
+    def email_enabled(self) -> bool:
+        return bool(self.settings.sender_email and self.settings.sender_password)
+
+    @property
+    def digest_enabled(self) -> bool:
+        return self.settings.digest_window is not None
     
     def send_email(self, to_email: str, subject: str, html_body: str, text_body: str = "") -> bool:
         """
@@ -44,18 +150,23 @@ class NotificationService:
         """
         if not self.email_enabled:
             logger.warning("❌ Cannot send - email service not configured")
+            emails_total.labels("skipped").inc()
             return False
         
         # ✅ Validate recipient email format (basic check)
         if not to_email or '@' not in to_email or '.' not in to_email:
             logger.error(f"❌ Invalid recipient email: {to_email}")
+            emails_total.labels("skipped").inc()
             return False
         
+        settings = self.settings
+        emails_in_flight.inc()
+        sent = False
         try:
-            logger.info(f"📧 Sending email from {SENDER_EMAIL} to {to_email}")
+            logger.info(f"📧 Sending email from {settings.sender_email} to {to_email}")
             
             msg = MIMEMultipart('alternative')
-            msg['From'] = SENDER_EMAIL
+            msg['From'] = settings.sender_email
             msg['To'] = to_email  # ✅ Can be ANY email address!
             msg['Subject'] = subject
             
@@ -67,12 +178,13 @@ class NotificationService:
             msg.attach(MIMEText(html_body, 'html', 'utf-8'))
             
             # Connect to Gmail SMTP and send
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
+            with smtplib.SMTP(settings.server, settings.port, timeout=10) as server:
                 server.starttls()
-                server.login(SENDER_EMAIL, SENDER_PASSWORD)
+                server.login(settings.sender_email, settings.sender_password)
                 server.send_message(msg)
             
             logger.info(f"✅ Email sent successfully to {to_email}")
+            sent = True
             return True
             
         except smtplib.SMTPAuthenticationError:
@@ -84,6 +196,9 @@ class NotificationService:
         except Exception as e:
             logger.error(f"❌ Email send failed: {e}")
             return False
+        finally:
+            emails_in_flight.dec()
+            emails_total.labels("sent" if sent else "failed").inc()
     
     def send_booking_email(self, user_email: str, user_name: str, booking_type: str, 
                           booking_details: Dict[str, Any], booking_id: str) -> bool:
@@ -96,6 +211,33 @@ class NotificationService:
         
         return self.send_email(user_email, subject, html_body, text_body)
     
+    @staticmethod
+    def _detail_rows(details: Dict) -> List[Tuple[str, str]]:
+        """(label, formatted value) for each provided booking detail"""
+        rows = []
+        for key, value in details.items():
+            if key in HIDDEN_DETAIL_KEYS:
+                continue
+            if value is None or value == "" or value == 0:
+                continue
+
+            label = key.replace('_', ' ').title()
+
+            if isinstance(value, (int, float)) and any(x in key.lower() for x in ['price', 'fee', 'cost', 'total']):
+                formatted_value = f"₹{value:,.2f}"
+            else:
+                formatted_value = str(value)
+            rows.append((label, formatted_value))
+        return rows
+
+    def _detail_rows_html(self, details: Dict) -> str:
+        return "".join(f"""
+                <div class="info-row">
+                    <span class="label">{label}</span>
+                    <span class="value">{formatted_value}</span>
+                </div>
+""" for label, formatted_value in self._detail_rows(details))
+
     def _generate_email_html(self, user_name: str, booking_type: str, 
                             details: Dict, booking_id: str) -> str:
         """Generate beautiful HTML email"""
@@ -105,22 +247,7 @@ class NotificationService:
 <html>
 <head>
     <meta charset="UTF-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background: #f4f4f4; }}
-        .container {{ max-width: 600px; margin: 20px auto; background: #fff; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
-        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }}
-        .header h1 {{ margin: 0; font-size: 28px; }}
-        .content {{ padding: 30px; }}
-        .booking-id {{ background: #667eea; color: white; padding: 12px 20px; border-radius: 8px; display: inline-block; margin: 15px 0; font-weight: bold; font-size: 16px; }}
-        .booking-info {{ background: #f8f9fa; padding: 20px; margin: 20px 0; border-radius: 8px; }}
-        .booking-info h3 {{ margin: 0 0 15px 0; color: #667eea; border-bottom: 2px solid #667eea; padding-bottom: 10px; }}
-        .info-row {{ padding: 10px 0; border-bottom: 1px solid #e0e0e0; display: flex; justify-content: space-between; }}
-        .info-row:last-child {{ border-bottom: none; }}
-        .label {{ font-weight: 600; color: #667eea; }}
-        .value {{ color: #333; text-align: right; }}
-        .footer {{ text-align: center; padding: 20px; color: #888; font-size: 12px; background: #f8f9fa; }}
-    </style>
-</head>
+{EMAIL_STYLE}</head>
 <body>
     <div class="container">
         <div class="header">
@@ -140,25 +267,7 @@ class NotificationService:
 """
         
         # Add ONLY provided booking details
-        for key, value in details.items():
-            if key in ['booking_id', 'user_id', 'created_at']:
-                continue
-            if value is None or value == "" or value == 0:
-                continue
-            
-            label = key.replace('_', ' ').title()
-            
-            if isinstance(value, (int, float)) and any(x in key.lower() for x in ['price', 'fee', 'cost', 'total']):
-                formatted_value = f"₹{value:,.2f}"
-            else:
-                formatted_value = str(value)
-            
-            html += f"""
-                <div class="info-row">
-                    <span class="label">{label}</span>
-                    <span class="value">{formatted_value}</span>
-                </div>
-"""
+        html += self._detail_rows_html(details)
         
         html += """
             </div>
@@ -195,19 +304,7 @@ BOOKING DETAILS:
 ───────────────────────────────────────────────
 """
         
-        for key, value in details.items():
-            if key in ['booking_id', 'user_id', 'created_at']:
-                continue
-            if value is None or value == "" or value == 0:
-                continue
-            
-            label = key.replace('_', ' ').title()
-            
-            if isinstance(value, (int, float)) and any(x in key.lower() for x in ['price', 'fee', 'cost', 'total']):
-                formatted_value = f"₹{value:,.2f}"
-            else:
-                formatted_value = str(value)
-            
+        for label, formatted_value in self._detail_rows(details):
             text += f"{label}: {formatted_value}\n"
         
         text += """
@@ -223,7 +320,9 @@ This is an automated confirmation.
     
     async def send_booking_notification(self, user_email: Optional[str], 
                                        user_name: str, booking_type: str, 
-                                       booking_details: Dict, booking_id: str) -> Dict[str, bool]:
+                                       booking_details: Dict, booking_id: str,
+                                       immediate: bool = False,
+                                       session_id: Optional[str] = None) -> Dict[str, bool]:
         """
         Send booking notification to ANY email address
         
@@ -232,6 +331,10 @@ This is an automated confirmation.
         - 10minutemail addresses
         - Gmail addresses
         - ANY valid email address
+
+        In digest mode the notification is buffered into the itinerary email
+        for ``session_id`` (``"queued": True`` in the result) unless
+        ``immediate`` is set.
         """
         
         results = {"email_sent": False, "email_address": user_email}
@@ -239,13 +342,248 @@ This is an automated confirmation.
         if not user_email:
             logger.warning("⚠️ No email provided - skipping notification")
             return results
+
+        if self.digest_enabled and not immediate:
+            self._queue(user_email, user_name, [
+                {"booking_type": booking_type, "booking_id": booking_id, "details": booking_details}
+            ], session_id)
+            results["queued"] = True
+            return results
         
         results["email_sent"] = self.send_booking_email(
             user_email, user_name, booking_type, booking_details, booking_id
         )
-        
+
+        return results
+
+    def send_summary_email(self, user_email: str, user_name: str, title: str,
+                           items: List[Dict[str, Any]], totals: Optional[List[Tuple[str, int]]] = None) -> bool:
+        """
+        Send one email covering several bookings (a batch booking or cancellation)
+
+        Each item is {"booking_type", "booking_id", "details"}; ``totals`` are
+        (label, amount) lines shown after the items.
+        """
+        subject = f"{title} - {', '.join(item['booking_id'] for item in items)}"
+        html_body = self._generate_summary_html(user_name, title, items, totals or [])
+        text_body = self._generate_summary_text(user_name, title, items, totals or [])
+        return self.send_email(user_email, subject, html_body, text_body)
+
+    def _generate_summary_html(self, user_name: str, title: str, items: List[Dict[str, Any]],
+                               totals: List[Tuple[str, int]]) -> str:
+        """HTML email with one details box per booking"""
+        sections = "".join(f"""
+            <div class="booking-info">
+                <h3>📋 {item['booking_type']}</h3>
+                <div class="booking-id">Booking ID: {item['booking_id']}</div>
+{self._detail_rows_html(item['details'])}
+            </div>
+""" for item in items)
+        if totals:
+            sections += """
+            <div class="booking-info">
+                <h3>💰 Totals</h3>
+""" + "".join(f"""
+                <div class="info-row">
+                    <span class="label">{label}</span>
+                    <span class="value">₹{amount:,.2f}</span>
+                </div>
+""" for label, amount in totals) + """
+            </div>
+"""
+        return f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+{EMAIL_STYLE}</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🎫 {title}</h1>
+            <p>Trip Planner Agent</p>
+        </div>
+        <div class="content">
+            <p style="font-size: 18px; font-weight: 600; color: #667eea;">Dear {user_name},</p>
+            <p>This covers <strong>{len(items)}</strong> booking(s) on your trip.</p>
+{sections}
+            <p style="margin-top: 20px; font-size: 14px; color: #888; text-align: center;">
+                Thank you for using Trip Planner Agent! ✨
+            </p>
+        </div>
+        <div class="footer">
+            <p>This is an automated confirmation.</p>
+            <p>© 2025 Trip Planner Agent</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+    def _generate_summary_text(self, user_name: str, title: str, items: List[Dict[str, Any]],
+                               totals: List[Tuple[str, int]]) -> str:
+        """Plain text email with one section per booking"""
+        rule = "═" * 47
+        text = f"\n{rule}\n{title.upper()}\n{rule}\n\nDear {user_name},\n\n"
+        text += f"This covers {len(items)} booking(s) on your trip.\n"
+        for item in items:
+            text += f"\n{item['booking_type']} - Booking ID: {item['booking_id']}\n{'─' * 47}\n"
+            for label, formatted_value in self._detail_rows(item['details']):
+                text += f"{label}: {formatted_value}\n"
+        if totals:
+            text += f"\nTOTALS\n{'─' * 47}\n"
+            for label, amount in totals:
+                text += f"{label}: ₹{amount:,.2f}\n"
+        text += f"\nThank you for using Trip Planner Agent!\n\nThis is an automated confirmation.\n© 2025 Trip Planner Agent\n{rule}\n"
+        return text
+
+    async def send_summary_notification(self, user_email: Optional[str], user_name: str, title: str,
+                                        items: List[Dict[str, Any]], immediate: bool = False,
+                                        session_id: Optional[str] = None) -> Dict[str, bool]:
+        """Send one consolidated notification for several bookings (buffered in digest mode)"""
+        results = {"email_sent": False, "email_address": user_email}
+
+        if not user_email:
+            logger.warning("⚠️ No email provided - skipping notification")
+            return results
+
+        if self.digest_enabled and not immediate:
+            self._queue(user_email, user_name, items, session_id)
+            results["queued"] = True
+            return results
+
+        results["email_sent"] = self.send_summary_email(user_email, user_name, title, items)
         return results
 
+    # Digest mode
+    @staticmethod
+    def _digest_key(user_email: str, session_id: Optional[str]) -> Tuple[str, str]:
+        return session_id or "", user_email.strip().lower()
+
+    def _queue(self, user_email: str, user_name: str, items: List[Dict[str, Any]],
+               session_id: Optional[str]) -> None:
+        """Add items to the session's digest for the recipient, starting its send timer on the first one"""
+        key = self._digest_key(user_email, session_id)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = PendingDigest(session_id, user_email, user_name)
+            self._schedule(key, digest, self.settings.digest_delay)
+        digest.user_name = user_name or digest.user_name
+        digest.items.extend(items)
+        emails_digested.inc(len(items))
+        logger.info(f"📬 Queued {len(items)} notification(s) for {user_email} ({len(digest.items)} pending)")
+
+    def _schedule(self, key: Tuple[str, str], digest: PendingDigest, delay: float) -> None:
+        if digest.timer is None and delay != math.inf:
+            digest.timer = asyncio.create_task(self._flush_later(key, delay))
+
+    async def _flush_later(self, key: Tuple[str, str], delay: float) -> None:
+        await asyncio.sleep(delay)
+        digest = self._digests.get(key)
+        if digest is not None:
+            digest.timer = None  # this task; _flush must not cancel it
+            await self._flush(key)
+
+    @staticmethod
+    def _digest_totals(items: List[Dict[str, Any]]) -> List[Tuple[str, int]]:
+        """Booked, refunded and net amounts over a digest's items"""
+        booked = refunded = 0
+        for item in items:
+            details = item['details']
+            amount = next((details[key] for key in AMOUNT_KEYS
+                           if isinstance(details.get(key), (int, float)) and details[key] > 0), 0)
+            if str(details.get('status', '')).upper() == 'CANCELLED':
+                refunded += amount
+            else:
+                booked += amount
+        totals = [("Booked", booked)]
+        if refunded:
+            totals += [("Refunded", refunded), ("Net", booked - refunded)]
+        return totals
+
+    def pending_digests(self, session_id: Optional[str] = None) -> Dict[str, int]:
+        """Buffered notification count per recipient, across sessions or for one"""
+        pending: Dict[str, int] = {}
+        for digest in self._digests.values():
+            if session_id is None or digest.session_id == session_id:
+                pending[digest.user_email] = pending.get(digest.user_email, 0) + len(digest.items)
+        return pending
+
+    async def flush_digest(self, user_email: str, session_id: Optional[str] = None) -> bool:
+        """Send the recipient's buffered notifications for a session now as one itinerary email"""
+        return await self._flush(self._digest_key(user_email, session_id))
+
+    async def flush_session(self, session_id: str) -> int:
+        """Send every digest buffered for a session (the session has ended); returns emails sent"""
+        sent = 0
+        for key in [key for key in self._digests if key[0] == session_id]:
+            sent += await self._flush(key)
+        return sent
+
+    async def _flush(self, key: Tuple[str, str]) -> bool:
+        """
+        Send a digest; its items are only dropped once the email has gone out
+
+        A failed send keeps them queued and retries after DIGEST_RETRY_SECONDS,
+        giving up (with an error naming the bookings) after DIGEST_MAX_ATTEMPTS.
+        """
+        digest = self._digests.get(key)
+        if digest is None:
+            return False
+        sent = False
+        async with digest.sending:
+            if digest.timer is not None:
+                digest.timer.cancel()
+                digest.timer = None
+            items = list(digest.items)
+            if not items:
+                return False  # another flush sent them while this one waited
+            booking_ids = ", ".join(item['booking_id'] for item in items)
+            if not self.email_enabled:
+                logger.warning(f"⚠️ Email not configured - dropping {len(items)} queued notification(s) "
+                               f"for {digest.user_email} ({booking_ids})")
+                del digest.items[:len(items)]
+            else:
+                try:
+                    # SMTP is blocking; keep the event loop free while it runs
+                    sent = await asyncio.to_thread(
+                        self.send_summary_email, digest.user_email, digest.user_name, DIGEST_TITLE,
+                        items, self._digest_totals(items)
+                    )
+                except Exception as e:
+                    logger.error(f"❌ Itinerary email to {digest.user_email} failed: {e}", exc_info=True)
+                if sent:
+                    del digest.items[:len(items)]
+                    digest.failures = 0
+                else:
+                    digest.failures += 1
+                    digest_failures.inc()
+                    if digest.failures >= DIGEST_MAX_ATTEMPTS:
+                        logger.error(f"❌ Gave up on the itinerary email to {digest.user_email} after "
+                                     f"{digest.failures} attempts; not delivered: {booking_ids}")
+                        del digest.items[:len(items)]
+                    else:
+                        logger.warning(f"⚠️ Itinerary email to {digest.user_email} failed (attempt "
+                                       f"{digest.failures}); keeping {len(items)} notification(s) for a retry")
+            if not digest.items:
+                if self._digests.get(key) is digest:
+                    del self._digests[key]
+            else:
+                # Retry a failure; items queued while sending wait for the normal window
+                self._schedule(key, digest, self.settings.digest_delay if sent else DIGEST_RETRY_SECONDS)
+        return sent
+
+    async def flush_all(self) -> int:
+        """Send every buffered digest (end of session / shutdown); returns emails sent"""
+        sent = 0
+        for key in list(self._digests):
+            sent += await self._flush(key)
+        undelivered = sum(len(digest.items) for digest in self._digests.values())
+        if undelivered:
+            logger.error(f"❌ {undelivered} queued notification(s) could not be emailed")
+        return sent
+
+instrument_class(NotificationService, "smtp")
 
 # ✅ Global instance (create once, use everywhere)
 notification_service = NotificationService()
\ No newline at end of file
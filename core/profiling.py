@@ -0,0 +1,242 @@
+"""
+Opt-in sampling profiler for agent tools and DatabaseManager methods
+
+A background thread samples every thread's Python stack (``sys._current_frames``)
+every few milliseconds. Frames of the ``core.tracing.traced`` wrappers, which
+already wrap each agent tool function and each DatabaseManager method, are
+relabelled ``tool:<name>`` / ``db:<method>``. Every sample is then attributed to
+the operation it ran under, and the collapsed stacks show which tool or DB call
+a hot function was working for. Idle samples (the event loop waiting in
+select, threads blocked on a queue) are dropped. So are suspended coroutines,
+which are not on any thread's stack, so the samples measure time actually
+spent on a thread, including blocking SQLite and SMTP calls.
+
+Nothing is sampled and no code changes unless profiling is switched on:
+    TRIP_PROFILE=profiles python main.py        (or: python main.py --profile profiles)
+    TRIP_PROFILE=profiles python server.py
+
+On exit it writes, per process:
+    profiles/profile-<pid>.collapsed   "frame;frame;frame count" lines for flamegraph.pl / speedscope
+    profiles/profile-<pid>.json        per-operation stats: calls and wall time (from core.metrics),
+                                       sampled on-thread time, self time and hottest functions
+
+    python -m core.profiling report profiles/profile-<pid>.json [--top 15]
+"""
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from .metrics import OPERATION_HISTOGRAMS
+from .tracing import traced
+
+DEFAULT_INTERVAL = 0.005
+MAX_DEPTH = 128
+
+# Leaf functions that mean the thread is waiting, not working
+IDLE_LEAVES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("socketserver.py", "serve_forever"),
+    ("thread.py", "_worker"),  # idle executor thread blocked on its work queue
+    ("logging_config.py", "_run"),  # log writer blocked on its queue
+}
+
+
+def _wrapper_codes() -> set:
+    """Code objects of the traced() wrappers (shared by every decorated function)"""
+    async def probe_async():
+        pass
+
+    def probe():
+        pass
+    return {traced("profile")(probe_async).__code__, traced("profile")(probe).__code__}
+
+
+class SamplingProfiler:
+    """Samples all thread stacks on a timer and aggregates them by instrumented operation"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.ticks = 0
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._wrappers = _wrapper_codes()
+        self._labels: Dict[Tuple, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"🔬 Sampling profiler started ({self.interval * 1000:.0f} ms interval)")
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.elapsed += time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.ticks += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    self._sample(frame)
+
+    @property
+    def sample_ms(self) -> float:
+        """
+        Measured time one sample stands for
+
+        The sampler only runs when it gets the GIL, so under load ticks come
+        further apart than ``interval``; weighting by the measured spacing
+        keeps the millisecond figures honest.
+        """
+        elapsed = self.elapsed + (time.perf_counter() - self.started_at if self.running else 0.0)
+        return elapsed / self.ticks * 1000 if self.ticks else self.interval * 1000
+
+    def _label(self, frame) -> str:
+        code = frame.f_code
+        if code in self._wrappers:
+            scope = frame.f_locals
+            return f"{scope.get('kind', 'op')}:{scope.get('span_name', code.co_name)}"
+        key = (code, code.co_firstlineno)
+        label = self._labels.get(key)
+        if label is None:
+            module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+            label = self._labels[key] = f"{module}:{code.co_qualname}"
+        return label
+
+    def _sample(self, frame) -> None:
+        leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+        if leaf in IDLE_LEAVES:
+            return
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(self._label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def operation_stats(self, top: int = 10) -> List[Dict]:
+        """
+        Per instrumented operation: calls and wall time from core.metrics,
+        sampled time on a thread (inclusive and self) and hottest functions
+        """
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        hot: Dict[str, Counter] = defaultdict(Counter)
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            operations = [i for i, label in enumerate(frames) if ":" in label and label.split(":", 1)[0] in
+                          OPERATION_HISTOGRAMS]
+            if not operations:
+                continue
+            for name in {frames[i] for i in operations}:
+                inclusive[name] += count
+            innermost = frames[operations[-1]]
+            own[innermost] += count
+            hot[innermost][frames[-1]] += count
+
+        sample_ms = self.sample_ms
+        rows = []
+        for name in inclusive:
+            kind, operation = name.split(":", 1)
+            histogram = OPERATION_HISTOGRAMS[kind]._children.get((operation,))
+            rows.append({
+                "operation": name,
+                "calls": histogram.count if histogram else 0,
+                "wall_ms": histogram.sum * 1000 if histogram else 0.0,
+                "sampled_ms": inclusive[name] * sample_ms,
+                "self_ms": own[name] * sample_ms,
+                "hottest": [{"function": fn, "samples": n} for fn, n in hot[name].most_common(top)],
+            })
+        return sorted(rows, key=lambda row: row["self_ms"], reverse=True)
+
+    def write(self, directory: str) -> Tuple[str, str]:
+        """Write the collapsed stacks and the per-operation stats; returns both paths"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"profile-{os.getpid()}")
+        with open(f"{base}.collapsed", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(f"{base}.json", "w") as f:
+            json.dump({
+                "pid": os.getpid(), "interval_ms": self.interval * 1000, "sample_ms": round(self.sample_ms, 3),
+                "elapsed_s": round(self.elapsed, 3), "samples": self.samples,
+                "operations": self.operation_stats(),
+            }, f, indent=2)
+        return f"{base}.collapsed", f"{base}.json"
+
+
+_active: Optional[SamplingProfiler] = None
+
+
+def start_profiling(directory: str, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Start the process-wide profiler; results are written to ``directory`` at exit"""
+    global _active
+    if _active is None:
+        _active = SamplingProfiler(interval)
+        _active.start()
+
+        def finish():
+            _active.stop()
+            collapsed, stats = _active.write(directory)
+            logger.info(f"🔬 Profile written: {collapsed} ({_active.samples} samples), {stats}")
+        atexit.register(finish)
+    return _active
+
+
+def start_from_env() -> Optional[SamplingProfiler]:
+    """Start profiling if TRIP_PROFILE names an output directory (TRIP_PROFILE_INTERVAL_MS sets the rate)"""
+    directory = os.getenv("TRIP_PROFILE")
+    if not directory:
+        return None
+    interval = float(os.getenv("TRIP_PROFILE_INTERVAL_MS", DEFAULT_INTERVAL * 1000)) / 1000
+    return start_profiling(directory, interval)
+
+
+def _print_report(path: str, top: int) -> None:
+    with open(path) as f:
+        profile = json.load(f)
+    print(f"{profile['samples']} samples over {profile['elapsed_s']}s "
+          f"({profile['interval_ms']:g} ms interval, {profile['sample_ms']:g} ms measured), pid {profile['pid']}\n")
+    header = f"{'operation':<48} {'calls':>6} {'wall_ms':>10} {'sampled_ms':>11} {'self_ms':>9}  hottest function"
+    print(header)
+    print("-" * (len(header) + 20))
+    for row in profile["operations"][:top]:
+        hottest = row["hottest"][0]["function"] if row["hottest"] else "-"
+        print(f"{row['operation'][:48]:<48} {row['calls']:>6} {row['wall_ms']:>10.1f} "
+              f"{row['sampled_ms']:>11.1f} {row['self_ms']:>9.1f}  {hottest}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trip planner profile tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="per-operation table from a profile-<pid>.json")
+    report.add_argument("path")
+    report.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+    _print_report(args.path, args.top)
+
+
+if __name__ == "__main__":
+    main()
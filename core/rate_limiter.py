@@ -1,57 +1,95 @@
+import asyncio
 import time
 from threading import Lock
 from loguru import logger
 from collections import defaultdict
+from .metrics import limiter_wait_seconds
+from .tracing import tracer
 
 class PerSessionRateLimiter:
     """Rate limiter per session (better for multi-user scenarios)"""
-    
+
     def __init__(self, calls_per_minute: int = 15, calls_per_second: int = 2):
         self.calls_per_minute = calls_per_minute
         self.calls_per_second = calls_per_second
-        
+
         self.minute_interval = 60.0 / calls_per_minute
         self.second_interval = 1.0 / calls_per_second
-        
+
         # Track per session
         self.session_data = defaultdict(lambda: {
             'last_call': 0,
             'call_times': []
         })
         self.lock = Lock()
-    
-    def wait_if_needed(self, session_id: str = "default"):
-        """Wait if necessary to respect rate limits for this session"""
+
+        # Wait accounting (read by load tests and metrics)
+        self.calls = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _reserve(self, session_id: str) -> float:
+        """
+        Book this session's next call slot and return how long to wait for it
+
+        The slot is recorded up front, so the lock is only held for the
+        bookkeeping and never while waiting; other sessions are not held up.
+        """
         with self.lock:
             data = self.session_data[session_id]
             now = time.time()
-            
+
             # Remove calls older than 1 minute
             data['call_times'] = [t for t in data['call_times'] if now - t < 60]
-            
+
+            at = now
             # Check per-minute limit
             if len(data['call_times']) >= self.calls_per_minute:
-                wait_time = 60 - (now - data['call_times'][0])
-                if wait_time > 0:
-                    logger.warning(f"⏳ Session {session_id[:8]}...: waiting {wait_time:.2f}s (minute limit)")
-                    time.sleep(wait_time)
-                    now = time.time()
-                    data['call_times'] = []
-            
+                at = max(at, data['call_times'][-self.calls_per_minute] + 60)
             # Check per-second limit
-            time_since_last = now - data['last_call']
-            if time_since_last < self.second_interval:
-                wait_time = self.second_interval - time_since_last
-                logger.debug(f"⏳ Session {session_id[:8]}...: waiting {wait_time:.2f}s (second limit)")
-                time.sleep(wait_time)
-                now = time.time()
-            
+            at = max(at, data['last_call'] + self.second_interval)
+
             # Record this call
-            data['last_call'] = now
-            data['call_times'].append(now)
+            data['last_call'] = at
+            data['call_times'].append(at)
+
+            wait = at - now
+            limiter_wait_seconds.observe(max(wait, 0.0))
+            self.calls += 1
+            if wait > 0:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def wait_if_needed(self, session_id: str = "default"):
+        """Wait if necessary to respect rate limits for this session"""
+        wait_time = self._reserve(session_id)
+        if wait_time > 0:
+            logger.debug("⏳ Session {}...: waiting {:.2f}s", session_id[:8], wait_time)
+            with tracer.span("rate_limiter.wait", "limiter", wait_s=round(wait_time, 3)):
+                time.sleep(wait_time)
+
+    async def acquire(self, session_id: str = "default") -> float:
+        """Async version of wait_if_needed; returns the seconds waited"""
+        wait_time = self._reserve(session_id)
+        if wait_time > 0:
+            logger.debug("⏳ Session {}...: waiting {:.2f}s", session_id[:8], wait_time)
+            with tracer.span("rate_limiter.wait", "limiter", wait_s=round(wait_time, 3)):
+                await asyncio.sleep(wait_time)
+        return max(wait_time, 0.0)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "waits": self.waits,
+            "total_wait": round(self.total_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+        }
 
 # Global rate limiter with per-session tracking
 gemini_rate_limiter = PerSessionRateLimiter(
     calls_per_minute=15,
     calls_per_second=2
-)
\ No newline at end of file
+)
@@ -0,0 +1,143 @@
+"""
+Pluggable serializers for session state and booking details
+
+Session ``state`` is written with the codec selected by ``TRIP_STATE_CODEC``
+(``json`` - the default, ``orjson`` or ``msgpack``). Binary codecs are stored
+as BLOBs with a one-byte format tag, so ``decode`` can tell every stored
+format apart and rows written before a codec switch keep working:
+
+    str                 -> legacy JSON text
+    b"\\x01" + payload   -> JSON bytes (orjson)
+    b"\\x02" + payload   -> MessagePack
+
+Booking ``details`` and user ``metadata`` always stay JSON *text* because SQL
+reads them with ``json_extract``; ``encode_json_text`` only swaps in orjson as
+the faster encoder when it is installed and selected.
+"""
+import json
+import os
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+TAG_ORJSON = 0x01
+TAG_MSGPACK = 0x02
+
+Encoded = Union[str, bytes]
+
+
+def _json_loads(data: Union[str, bytes, memoryview]) -> Any:
+    """Parse JSON with orjson when available, falling back to the stdlib"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class Serializer:
+    """Base codec: encodes a Python object for a state column"""
+    name = "base"
+
+    def encode(self, obj: Any) -> Encoded:
+        raise NotImplementedError
+
+    def encode_text(self, obj: Any) -> str:
+        """Encode as JSON text (for columns that SQL reads with json_extract)"""
+        return json.dumps(obj)
+
+
+class JsonSerializer(Serializer):
+    """Stdlib JSON stored as TEXT - the original on-disk format"""
+    name = "json"
+
+    def encode(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+
+class OrjsonSerializer(Serializer):
+    """orjson stored as a tagged BLOB"""
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("TRIP_STATE_CODEC=orjson requires the 'orjson' package")
+
+    def encode(self, obj: Any) -> bytes:
+        return bytes((TAG_ORJSON,)) + orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def encode_text(self, obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+class MsgpackSerializer(Serializer):
+    """MessagePack stored as a tagged BLOB"""
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("TRIP_STATE_CODEC=msgpack requires the 'msgpack' package")
+
+    def encode(self, obj: Any) -> bytes:
+        return bytes((TAG_MSGPACK,)) + msgpack.packb(obj, use_bin_type=True)
+
+    def encode_text(self, obj: Any) -> str:
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        return json.dumps(obj)
+
+
+SERIALIZERS = {
+    JsonSerializer.name: JsonSerializer,
+    OrjsonSerializer.name: OrjsonSerializer,
+    MsgpackSerializer.name: MsgpackSerializer,
+}
+
+
+def get_serializer(name: Optional[str] = None) -> Serializer:
+    """Return the serializer called ``name`` (default: ``TRIP_STATE_CODEC`` or json)"""
+    name = (name or os.getenv("TRIP_STATE_CODEC", JsonSerializer.name)).lower()
+    try:
+        return SERIALIZERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown state codec '{name}'. Choose from: {', '.join(SERIALIZERS)}")
+
+
+def decode(raw: Optional[Union[str, bytes, memoryview]]) -> Any:
+    """Decode a stored state/details value, detecting its format; NULL/empty -> {}"""
+    if not raw:
+        return {}
+    if isinstance(raw, str):
+        return _json_loads(raw)
+
+    tag = raw[0]
+    if tag == TAG_ORJSON:
+        return _json_loads(memoryview(raw)[1:])
+    if tag == TAG_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Found a msgpack-encoded row but the 'msgpack' package is not installed")
+        return msgpack.unpackb(memoryview(raw)[1:], raw=False)
+    # Untagged bytes: JSON written by some other client
+    return _json_loads(raw)
+
+
+# Codec used by DatabaseManager; chosen once at import from the environment
+state_serializer = get_serializer()
+
+
+def encode_state(obj: Any) -> Encoded:
+    """Encode session state with the configured codec"""
+    return state_serializer.encode(obj)
+
+
+def encode_json_text(obj: Any) -> str:
+    """Encode booking details / metadata as SQL-readable JSON text"""
+    return state_serializer.encode_text(obj)
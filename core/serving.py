@@ -0,0 +1,234 @@
+"""
+Multi-session serving layer shared by the CLI and the HTTP server
+
+SessionMultiplexer runs agent turns for many sessions concurrently over one
+TripPlannerRunner while guaranteeing that turns for the *same* session never
+overlap, bounding how much work is admitted, timing out stuck turns and
+draining in-flight work on shutdown.
+"""
+import asyncio
+import copy
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Dict, Optional
+from loguru import logger
+from core.db import db_manager, merge_state_changes
+from core.session_locks import SessionLockRegistry, session_locks
+from core.utils import ResponseChunk, TurnMetrics, stream_agent_response
+
+
+# Booking events recorded this turn (trip_tools.booking_events.STATE_KEY)
+BOOKING_EVENTS_KEY = "booking_events"
+
+# State each ADK session was loaded with or last saved as, keyed by session_id,
+# so save_adk_state writes only what the turn changed. Entries go away with the
+# in-memory ADK session (release_adk_session, or idle lock eviction in
+# SessionMultiplexer), so this only holds sessions that are actually loaded.
+_saved_states: Dict[str, Dict[str, Any]] = {}
+
+
+class ServerBusy(Exception):
+    """Raised when the pending-turn queue is full (backpressure)"""
+
+
+class ServerDraining(Exception):
+    """Raised when a turn arrives after shutdown has started"""
+
+
+class SessionForbidden(Exception):
+    """Raised when a turn names a session that belongs to another user"""
+
+
+async def ensure_adk_session(runner, user_id: str, session_id: str):
+    """
+    Load the DB session into the runner's session service if it isn't there yet
+
+    An ADK session whose saved state was dropped is reloaded from the DB,
+    which every turn has been saved to. Raises SessionForbidden when the DB
+    session belongs to another user.
+    """
+    db_session = await db_manager.get_session(session_id)
+    if db_session and db_session.user_id != user_id:
+        raise SessionForbidden(f"Session {session_id} does not belong to user {user_id}")
+
+    session = await runner.session_service.get_session(
+        app_name=runner.app_name, user_id=user_id, session_id=session_id
+    )
+    if session and session_id in _saved_states:
+        return session
+    if session:
+        await runner.session_service.delete_session(
+            app_name=runner.app_name, user_id=user_id, session_id=session_id
+        )
+
+    state = dict(db_session.state) if db_session else {}
+    state['user_id'] = user_id
+    state['session_id'] = session_id  # lets tools tell sessions apart (e.g. email digests)
+    _saved_states[session_id] = copy.deepcopy(state)
+    return await runner.session_service.create_session(
+        app_name=runner.app_name, user_id=user_id, state=state, session_id=session_id
+    )
+
+
+async def release_adk_session(runner, user_id: str, session_id: str) -> None:
+    """Drop the runner's in-memory copy of a session (call save_adk_state first)"""
+    _saved_states.pop(session_id, None)
+    await runner.session_service.delete_session(
+        app_name=runner.app_name, user_id=user_id, session_id=session_id
+    )
+
+
+async def save_adk_state(runner, user_id: str, session_id: str) -> None:
+    """
+    Persist the runner's session state back to the trip planner DB
+
+    The turn's booking events are appended to the ``booking_events`` table
+    first and then dropped from the state, so the state only ever holds
+    events not stored yet. Only the keys this turn changed (against the state
+    loaded by ensure_adk_session or last saved here) are merged into the
+    stored state, with a compare-and-swap write.
+    """
+    session = await runner.session_service.get_session(
+        app_name=runner.app_name, user_id=user_id, session_id=session_id
+    )
+    if not session:
+        return
+    base = _saved_states.get(session_id, {})
+    current = copy.deepcopy(dict(session.state))
+    pending_events = current.get(BOOKING_EVENTS_KEY)
+    if pending_events:
+        # Only events past the last stored one are written, so a retry is harmless
+        await db_manager.append_booking_events(session_id, pending_events)
+        current[BOOKING_EVENTS_KEY] = []
+    try:
+        await db_manager.mutate_session_state(
+            session_id, lambda stored: merge_state_changes(stored, base, current)
+        )
+    except ValueError:
+        logger.warning(f"⚠️ Session {session_id} not in DB, state not persisted")
+        return
+    _saved_states[session_id] = current
+    if pending_events:
+        from google.adk.events import Event, EventActions  # deferred: importing ADK is slow
+        await runner.session_service.append_event(session, Event(
+            author="system", actions=EventActions(state_delta={BOOKING_EVENTS_KEY: []})
+        ))
+
+
+class SessionMultiplexer:
+    """Serializes turns per session and bounds concurrency across sessions"""
+
+    def __init__(self, runner, max_concurrent_turns: int = 32,
+                 max_pending: int = 256, turn_timeout: float = 120.0,
+                 locks: Optional[SessionLockRegistry] = None):
+        self.runner = runner
+        self.turn_timeout = turn_timeout
+        self.max_pending = max_pending
+        self._turn_slots = asyncio.Semaphore(max_concurrent_turns)
+        self._session_locks = locks if locks is not None else session_locks
+        self._pending = 0
+        self._draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._drop_tasks = set()
+        self._session_locks.add_evict_listener(self._session_evicted)
+
+    def _session_evicted(self, session_id: str) -> None:
+        """The session's lock went idle: drop its saved state and in-memory ADK session"""
+        state = _saved_states.pop(session_id, None)
+        if state is None:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(
+                self._drop_adk_session(state.get('user_id'), session_id))
+        except RuntimeError:
+            return  # no loop (sweep from sync code): ensure_adk_session reloads it on next use
+        self._drop_tasks.add(task)
+        task.add_done_callback(self._drop_tasks.discard)
+
+    async def _drop_adk_session(self, user_id: str, session_id: str) -> None:
+        if session_id in _saved_states:
+            return  # a newer turn has reloaded it meanwhile
+        await self.runner.session_service.delete_session(
+            app_name=self.runner.app_name, user_id=user_id, session_id=session_id
+        )
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    @property
+    def pending(self) -> int:
+        """Turns admitted but not yet finished (queued or running)"""
+        return self._pending
+
+    def _admit(self) -> None:
+        if self._draining:
+            raise ServerDraining("Server is shutting down")
+        if self._pending >= self.max_pending:
+            raise ServerBusy(f"Too many pending turns ({self._pending})")
+        self._pending += 1
+        self._idle.clear()
+
+    def _release(self) -> None:
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+
+    async def stream_turn(self, user_id: str, session_id: str, message: str,
+                          metrics: Optional[TurnMetrics] = None) -> AsyncIterator[ResponseChunk]:
+        """
+        Run one turn for ``session_id`` and yield its output chunks.
+
+        Raises ServerBusy/ServerDraining before any work is queued,
+        SessionForbidden if the session belongs to another user, and
+        asyncio.TimeoutError once producing the turn's chunks has taken more
+        than ``turn_timeout``. Time the caller spends between chunks (e.g.
+        writing them to a slow client) does not count, and the timeout
+        only ever interrupts the wait for the next chunk.
+        """
+        self._admit()
+        try:
+            async with self._session_locks.hold(session_id), self._turn_slots:
+                await ensure_adk_session(self.runner, user_id, session_id)
+                stream = stream_agent_response(self.runner, user_id, session_id, message, metrics)
+                loop = asyncio.get_running_loop()
+                remaining = self.turn_timeout
+                try:
+                    while True:
+                        started = loop.time()
+                        try:
+                            async with asyncio.timeout(remaining):
+                                chunk = await anext(stream)
+                        except StopAsyncIteration:
+                            break
+                        remaining -= loop.time() - started
+                        yield chunk
+                finally:
+                    await stream.aclose()
+                    # Keep whatever state the turn produced, even on timeout
+                    await save_adk_state(self.runner, user_id, session_id)
+        finally:
+            self._release()
+
+    async def run_turn(self, user_id: str, session_id: str, message: str) -> Dict:
+        """Run one turn and return the collected response"""
+        metrics = TurnMetrics()
+        chunks = [chunk async for chunk in self.stream_turn(user_id, session_id, message, metrics)]
+        return {
+            "session_id": session_id,
+            "response": "\n".join(chunk.text for chunk in chunks),
+            "chunks": [asdict(chunk) for chunk in chunks],
+            "metrics": asdict(metrics),
+        }
+
+    async def drain(self, timeout: float = 30.0) -> bool:
+        """Stop admitting turns and wait for in-flight ones; False if the wait timed out"""
+        self._draining = True
+        logger.info(f"⏳ Draining {self._pending} in-flight turn(s)...")
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            logger.info("✅ All turns drained")
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Drain timed out with {self._pending} turn(s) still running")
+            return False
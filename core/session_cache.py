@@ -0,0 +1,193 @@
+"""
+In-memory session cache with compressed on-disk snapshots for warm restarts
+
+SessionCache keeps the encoded state of recently used sessions in an LRU.
+``DatabaseManager.get_session`` serves a hit after a cheap primary-key check
+of the row's ``version`` (no state blob read), so the cache stays correct with
+several worker processes writing the same database. Every hit decodes a fresh
+state dict, so callers can mutate what they get without corrupting the cache.
+
+On shutdown ``DatabaseManager.save_session_snapshot`` writes the most
+recently active sessions to one file: a small JSON index followed by
+per-session zlib-compressed state. On startup ``load_session_snapshot``
+memory-maps that file, drops entries whose row has moved on since (newer
+version or last_active, or no longer active), and seeds the cache with the
+rest. An entry is only decompressed the first time its session is requested.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+from loguru import logger
+from .models import Session
+from .serialization import decode
+
+SNAPSHOT_MAGIC = b"TRIPSNAP1\n"
+SNAPSHOT_PATH = os.getenv("TRIP_SNAPSHOT_PATH", "temp_backup/session_snapshot.bin")
+SNAPSHOT_SESSIONS = int(os.getenv("TRIP_SNAPSHOT_SESSIONS", "500"))
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    user_id: str
+    created_at: str
+    last_active: str
+    version: int
+    payload: Union[str, bytes, None]  # encoded state as stored in sessions.state
+    # Compressed payload still sitting in a mapped snapshot: (mmap, offset, length)
+    mapped: Optional[tuple] = None
+
+    def encoded_state(self) -> Union[str, bytes]:
+        if self.mapped is not None:
+            buffer, offset, length = self.mapped
+            self.payload = zlib.decompress(buffer[offset:offset + length])
+            self.mapped = None
+        return self.payload
+
+
+class SessionCache:
+    """LRU of encoded session state, validated against the row version on every hit"""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def get(self, session_id: str, version: Optional[int], last_active: Optional[str] = None) -> Optional[Session]:
+        """
+        Return the cached session if it is still at ``version``
+
+        ``version`` is the row's current version (None if the row is gone or
+        inactive); a stale entry is evicted and None returned.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None or version is None or entry.version != version:
+            if entry is not None:
+                del self._entries[session_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        if last_active:
+            entry.last_active = last_active
+        return Session(
+            session_id,
+            entry.user_id,
+            datetime.fromisoformat(entry.created_at),
+            datetime.fromisoformat(entry.last_active),
+            decode(entry.encoded_state()),
+            entry.version
+        )
+
+    def put_row(self, row) -> None:
+        """Cache a ``sessions`` row as read from the database"""
+        self._put(row['session_id'], _CacheEntry(
+            row['user_id'], row['created_at'], row['last_active'], row['version'], row['state']
+        ))
+
+    def update(self, session_id: str, version: int, last_active: str, payload: Union[str, bytes]) -> None:
+        """Write-through after a successful state update (only if the session is cached)"""
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            entry.version = version
+            entry.last_active = last_active
+            entry.payload = payload
+            entry.mapped = None
+
+    def invalidate(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _put(self, session_id: str, entry: _CacheEntry) -> None:
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def write_snapshot(path: str, rows: List) -> int:
+    """
+    Write ``sessions`` rows to a snapshot file (atomically); returns bytes written
+
+    Layout: MAGIC | u32 index length | JSON index | compressed states. Each
+    index entry records where its compressed state lives in the file.
+    """
+    index, blobs, offset = [], [], 0
+    for row in rows:
+        state = row['state'] or b""
+        blob = zlib.compress(state.encode("utf-8") if isinstance(state, str) else state)
+        index.append({
+            "session_id": row['session_id'], "user_id": row['user_id'],
+            "created_at": row['created_at'], "last_active": row['last_active'],
+            "version": row['version'], "offset": offset, "length": len(blob),
+        })
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # workers may snapshot concurrently
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(SNAPSHOT_MAGIC) + 4 + len(header) + offset
+
+
+def read_snapshot(path: str):
+    """Map a snapshot file; returns (mmap, index entries with absolute offsets) or None"""
+    if not os.path.exists(path) or os.path.getsize(path) <= len(SNAPSHOT_MAGIC) + 4:
+        return None
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        logger.warning(f"⚠️ Ignoring {path}: not a session snapshot")
+        return None
+    start = len(SNAPSHOT_MAGIC)
+    (header_length,) = struct.unpack("<I", buffer[start:start + 4])
+    index = json.loads(buffer[start + 4:start + 4 + header_length])
+    base = start + 4 + header_length
+    for entry in index:
+        entry["offset"] += base
+    return buffer, index
+
+
+def seed_from_snapshot(cache: SessionCache, buffer, index: List[Dict], current: Dict[str, tuple]) -> int:
+    """
+    Add snapshot entries still current in the DB to ``cache``; returns how many
+
+    ``current`` maps session_id -> (version, last_active) for active rows.
+    """
+    loaded = 0
+    # The index is most recent first; insert oldest first so the hottest end up most recently used
+    for entry in reversed(index):
+        row = current.get(entry["session_id"])
+        if row is None or row[0] != entry["version"] or row[1] > entry["last_active"]:
+            continue
+        cache._put(entry["session_id"], _CacheEntry(
+            entry["user_id"], entry["created_at"], entry["last_active"], entry["version"],
+            None, (buffer, entry["offset"], entry["length"])
+        ))
+        loaded += 1
+    return loaded
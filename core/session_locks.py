@@ -0,0 +1,77 @@
+"""
+Per-session async locks for serializing turns within one process
+
+The lock for a session is created on first use and evicted once it has been
+idle (unheld, with nobody waiting) for ``idle_ttl`` seconds, so a long-running
+server does not accumulate one lock per session it has ever seen. Eviction
+listeners let other per-session caches be dropped along with the lock. Locks only
+order work inside a single process; across processes the sessions table's
+version column (compare-and-swap writes) is what prevents lost updates.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from loguru import logger
+
+
+@dataclass(slots=True)
+class _LockEntry:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0  # holders + waiters; never evicted while > 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionLockRegistry:
+    """Hands out one asyncio.Lock per session and evicts idle ones"""
+
+    def __init__(self, idle_ttl: float = 300.0, sweep_every: int = 256):
+        self.idle_ttl = idle_ttl
+        self.sweep_every = sweep_every
+        self._entries: Dict[str, _LockEntry] = {}
+        self._releases = 0
+        self._evict_listeners: List[Callable[[str], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_evict_listener(self, listener: Callable[[str], None]) -> None:
+        """Call ``listener(session_id)`` for every lock evicted from now on"""
+        self._evict_listeners.append(listener)
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the session's lock for the duration of the ``async with`` block"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = self._entries[session_id] = _LockEntry()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            self._releases += 1
+            if self._releases % self.sweep_every == 0:
+                self.evict_idle()
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop locks nobody holds or waits on that have been idle past ``idle_ttl``"""
+        now = time.monotonic() if now is None else now
+        idle = [
+            session_id for session_id, entry in self._entries.items()
+            if entry.users == 0 and now - entry.last_used >= self.idle_ttl
+        ]
+        for session_id in idle:
+            del self._entries[session_id]
+            for listener in self._evict_listeners:
+                listener(session_id)
+        if idle:
+            logger.debug("🧹 Evicted {} idle session lock(s), {} left", len(idle), len(self._entries))
+        return len(idle)
+
+
+# Shared by every SessionMultiplexer in this process
+session_locks = SessionLockRegistry()
@@ -85,6 +85,11 @@ class SessionManager:
         """List all sessions for a user"""
         return await self.db.list_user_sessions(user_id)
 
+    async def list_user_sessions_page(self, user_id: str, limit: int = 20,
+                                      after: Optional[str] = None) -> tuple:
+        """List one page of a user's sessions; returns (sessions, next_cursor)"""
+        return await self.db.list_user_sessions_page(user_id, limit=limit, after=after)
+
     async def update_session_state(self, session_id: str, state: Dict) -> None:
         """Update session state"""
         await self.db.update_session_state(session_id, state)
@@ -0,0 +1,508 @@
+"""
+Lightweight per-turn tracing
+
+Each agent turn becomes a trace: a root ``turn`` span tagged with the
+session, with child spans for the agents that ran, their model calls, every
+tool function, DatabaseManager method, rate-limiter wait and notification
+send. The current span lives in a context variable, so nesting follows the
+async call chain without passing anything around, and every span carries the
+turn's ``session_id``.
+
+Tracing is off unless ``TRIP_TRACE`` is set:
+    TRIP_TRACE=traces/trace.jsonl                       one JSON span per line
+    TRIP_TRACE=otlp:http://localhost:4318/v1/traces     OTLP/JSON over HTTP
+
+When it is off, an instrumented call costs one attribute check.
+
+Instrumentation points:
+    traced(kind)              decorator for sync and async functions
+    instrument_class(cls)     wraps a class's public methods (DB, notifications)
+    instrument_agent(agent)   ADK agent tree: agent runs, model calls and tool functions
+
+CLI:
+    python -m core.tracing summarize traces/trace.jsonl [--session ID]
+    python -m core.tracing collect --port 4318 --out traces/trace.jsonl   (local OTLP collector stand-in)
+"""
+import argparse
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from loguru import logger
+from .metrics import operation_errors, operation_timer
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent: Optional["Span"]
+    session_id: Optional[str]
+    start: float  # epoch seconds
+    started: float  # perf_counter, for the duration
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    duration_ms: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name, "kind": self.kind, "session_id": self.session_id,
+            "start": self.start, "duration_ms": self.duration_ms,
+            "status": self.status, "attributes": self.attributes,
+        }
+
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class OtlpHttpExporter:
+    """Batches spans and POSTs them as OTLP/JSON from a background thread"""
+
+    def __init__(self, endpoint: str, service_name: str = "trip-planner",
+                 batch_size: int = 256, flush_interval: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, args=(flush_interval,), daemon=True)
+        self._thread.start()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) >= self.batch_size:
+                self._wake.set()
+
+    def _run(self, flush_interval: float) -> None:
+        while not self._stopped:
+            self._wake.wait(flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        body = json.dumps(to_otlp(batch, self.service_name)).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as e:
+            logger.warning(f"⚠️ Dropped {len(batch)} span(s): collector unreachable ({e})")
+
+    def shutdown(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Dict[str, Any]], service_name: str) -> Dict[str, Any]:
+    """Convert span dicts to an OTLP/JSON ExportTraceServiceRequest"""
+    otlp_spans = []
+    for span in spans:
+        start_ns = int(span["start"] * 1e9)
+        attributes = {"trip.kind": span["kind"], "trip.session_id": span["session_id"], **span["attributes"]}
+        otlp_spans.append({
+            "traceId": span["trace_id"], "spanId": span["span_id"],
+            "parentSpanId": span["parent_id"] or "", "name": span["name"],
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int((span["duration_ms"] or 0) * 1e6)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None],
+            "status": {"code": 1 if span["status"] == "ok" else 2, "message": span["status"]},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "core.tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+def from_otlp(payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Inverse of to_otlp, used by the collector stand-in"""
+    for resource in payload.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for span in scope.get("spans", []):
+                attributes = {}
+                for attribute in span.get("attributes", []):
+                    (value_type, value), = attribute["value"].items()
+                    attributes[attribute["key"]] = int(value) if value_type == "intValue" else value
+                start_ns, end_ns = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                yield {
+                    "trace_id": span["traceId"], "span_id": span["spanId"],
+                    "parent_id": span.get("parentSpanId") or None, "name": span["name"],
+                    "kind": attributes.pop("trip.kind", "internal"),
+                    "session_id": attributes.pop("trip.session_id", None),
+                    "start": start_ns / 1e9, "duration_ms": (end_ns - start_ns) / 1e6,
+                    "status": span.get("status", {}).get("message", "ok"), "attributes": attributes,
+                }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trip_current_span", default=None)
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter"""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        target = os.getenv("TRIP_TRACE", "").strip()
+        if not target:
+            return cls()
+        if target.startswith("otlp:"):
+            return cls(OtlpHttpExporter(target[len("otlp:"):]))
+        return cls(JsonLinesExporter(target))
+
+    def configure(self, exporter) -> None:
+        """Swap the exporter (None disables tracing)"""
+        if self.exporter is not None:
+            self.exporter.shutdown()
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, kind: str = "internal", session_id: Optional[str] = None,
+                   **attributes) -> Span:
+        """Start a span under the current one (a new trace if there is none) and make it current"""
+        parent = _current_span.get()
+        span = Span(
+            name=name, kind=kind,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+            span_id=uuid.uuid4().hex[:16], parent=parent,
+            session_id=session_id or (parent.session_id if parent else None),
+            start=time.time(), started=time.perf_counter(), attributes=attributes,
+        )
+        _current_span.set(span)
+        return span
+
+    def end_span(self, span: Span, status: str = "ok") -> None:
+        """
+        Finish ``span`` and make its parent current
+
+        Spans still open underneath it (an agent or model call that raised
+        before its after-callback ran) are closed first as ``unfinished``.
+        """
+        current = _current_span.get()
+        while current is not None and current is not span:
+            if current.duration_ms is None:
+                self._finish(current, "unfinished" if status == "ok" else status)
+            current = current.parent
+        if current is None:  # not on this context's chain; just record it
+            self._finish(span, status)
+            return
+        self._finish(span, status)
+        _current_span.set(span.parent)
+
+    def _finish(self, span: Span, status: str) -> None:
+        if span.duration_ms is not None:
+            return
+        span.duration_ms = (time.perf_counter() - span.started) * 1000
+        span.status = status
+        try:
+            self.exporter.export(span.to_dict())
+        except Exception as e:
+            logger.warning(f"⚠️ Span export failed: {e}")
+
+    def span(self, name: str, kind: str = "internal", session_id: Optional[str] = None, **attributes):
+        """Context manager around start_span/end_span (a no-op when disabled)"""
+        return _SpanScope(self, name, kind, session_id, attributes)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+class _SpanScope:
+    __slots__ = ("tracer", "name", "kind", "session_id", "attributes", "span")
+
+    def __init__(self, tracer: Tracer, name: str, kind: str, session_id: Optional[str], attributes: Dict):
+        self.tracer, self.name, self.kind = tracer, name, kind
+        self.session_id, self.attributes, self.span = session_id, attributes, None
+
+    def __enter__(self) -> Optional[Span]:
+        if self.tracer.enabled:
+            self.span = self.tracer.start_span(self.name, self.kind, self.session_id, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is not None:
+            self.tracer.end_span(self.span, "ok" if exc_type is None else f"error: {exc_type.__name__}")
+
+
+def traced(kind: str, name: Optional[str] = None) -> Callable:
+    """
+    Decorator: run the function inside a span and record its latency
+
+    The latency goes to the kind's histogram in core.metrics (tool, db, smtp)
+    and exceptions to trip_operation_errors_total, whether or not tracing is
+    on; with tracing off the span costs only a flag check.
+    """
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+        observe = operation_timer(kind, span_name)
+
+        def failed(e: Exception) -> None:
+            operation_errors.labels(kind, span_name, type(e).__name__).inc()
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    if not tracer.enabled:
+                        return await fn(*args, **kwargs)
+                    with tracer.span(span_name, kind):
+                        return await fn(*args, **kwargs)
+                except Exception as e:
+                    failed(e)
+                    raise
+                finally:
+                    if observe is not None:
+                        observe(time.perf_counter() - started)
+            async_wrapper._traced = True
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                if not tracer.enabled:
+                    return fn(*args, **kwargs)
+                with tracer.span(span_name, kind):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                failed(e)
+                raise
+            finally:
+                if observe is not None:
+                    observe(time.perf_counter() - started)
+        wrapper._traced = True
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls: type, kind: str, exclude: Iterable[str] = ()) -> type:
+    """Wrap every public method defined on ``cls`` with ``traced(kind)``"""
+    for attr, value in list(vars(cls).items()):
+        if (attr.startswith("_") or attr in exclude or not inspect.isfunction(value)
+                or inspect.isasyncgenfunction(value)):
+            continue
+        setattr(cls, attr, traced(kind, f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+def instrument_tools(tools: List) -> List:
+    """Wrap plain tool functions in spans; ADK tool objects pass through unchanged"""
+    return [traced("tool", tool.__name__)(tool)
+            if inspect.isfunction(tool) and not getattr(tool, "_traced", False) else tool
+            for tool in tools]
+
+
+def _end_named(kind: str, name: str) -> None:
+    span = _current_span.get()
+    while span is not None and not (span.kind == kind and span.name == name):
+        span = span.parent
+    if span is not None:
+        tracer.end_span(span)
+
+
+def _before_agent(callback_context):
+    if tracer.enabled:
+        tracer.start_span(callback_context.agent_name, "agent", invocation_id=callback_context.invocation_id)
+    return None
+
+
+def _after_agent(callback_context):
+    if tracer.enabled:
+        _end_named("agent", callback_context.agent_name)
+    return None
+
+
+def _before_model(callback_context, llm_request):
+    if tracer.enabled:
+        tracer.start_span(f"{callback_context.agent_name}.llm", "llm", model=llm_request.model)
+    return None
+
+
+def _after_model(callback_context, llm_response):
+    if tracer.enabled:
+        span = _current_span.get()
+        if span is not None and llm_response.usage_metadata is not None:
+            span.attributes["tokens"] = llm_response.usage_metadata.total_token_count
+        _end_named("llm", f"{callback_context.agent_name}.llm")
+    return None
+
+
+def instrument_agent(agent):
+    """
+    Trace an ADK agent tree: each agent run, each model call and each tool call
+
+    Callbacks are only added where the agent has none of its own.
+    """
+    for attr, callback in (("before_agent_callback", _before_agent), ("after_agent_callback", _after_agent),
+                           ("before_model_callback", _before_model), ("after_model_callback", _after_model)):
+        if hasattr(agent, attr) and getattr(agent, attr) is None:
+            setattr(agent, attr, callback)
+    if hasattr(agent, "tools"):
+        agent.tools = instrument_tools(agent.tools)
+    for sub_agent in agent.sub_agents:
+        instrument_agent(sub_agent)
+    return agent
+
+
+# Global tracer; disabled unless TRIP_TRACE is set
+tracer = Tracer.from_env()
+atexit.register(tracer.shutdown)
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans: List[Dict[str, Any]], session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Latency breakdown of traced turns
+
+    Returns:
+        dict with per-(kind, name) rows: calls, total and self time (time not
+        spent in child spans), mean and max, plus turn count and total turn time
+    """
+    if session_id:
+        spans = [s for s in spans if s["session_id"] == session_id]
+    child_time: Dict[str, float] = defaultdict(float)
+    for span in spans:
+        if span["parent_id"]:
+            child_time[span["parent_id"]] += span["duration_ms"] or 0
+
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for span in spans:
+        duration = span["duration_ms"] or 0
+        row = rows.setdefault((span["kind"], span["name"]), {
+            "kind": span["kind"], "name": span["name"], "calls": 0, "total_ms": 0.0,
+            "self_ms": 0.0, "max_ms": 0.0, "errors": 0,
+        })
+        row["calls"] += 1
+        row["total_ms"] += duration
+        row["self_ms"] += max(0.0, duration - child_time[span["span_id"]])
+        row["max_ms"] = max(row["max_ms"], duration)
+        row["errors"] += span["status"] != "ok"
+
+    turns = [s for s in spans if s["kind"] == "turn"]
+    turn_total = sum(s["duration_ms"] or 0 for s in turns)
+    ordered = sorted(rows.values(), key=lambda r: r["self_ms"], reverse=True)
+    for row in ordered:
+        row["mean_ms"] = row["total_ms"] / row["calls"]
+        row["self_%"] = 100 * row["self_ms"] / turn_total if turn_total else 0.0
+    return {"turns": len(turns), "turn_total_ms": turn_total, "rows": ordered}
+
+
+def _print_summary(summary: Dict[str, Any]) -> None:
+    print(f"{summary['turns']} turn(s), {summary['turn_total_ms']:.1f} ms in total\n")
+    header = f"{'kind':<8} {'name':<44} {'calls':>6} {'self_ms':>10} {'self_%':>7} {'mean_ms':>9} {'max_ms':>9} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in summary["rows"]:
+        print(f"{row['kind']:<8} {row['name'][:44]:<44} {row['calls']:>6} {row['self_ms']:>10.1f} "
+              f"{row['self_%']:>6.1f}% {row['mean_ms']:>9.2f} {row['max_ms']:>9.1f} {row['errors']:>6}")
+
+
+def _collect(port: int, out: str) -> None:
+    exporter = JsonLinesExporter(out)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            for span in from_otlp(payload):
+                exporter.export(span)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    print(f"Collecting OTLP/JSON spans on http://127.0.0.1:{port}/v1/traces into {out}")
+    with ThreadingHTTPServer(("127.0.0.1", port), Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    exporter.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trip planner trace tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summarize", help="latency breakdown of a JSON-lines trace")
+    summary.add_argument("path")
+    summary.add_argument("--session", help="only this session_id")
+    summary.add_argument("--json", action="store_true", help="print the summary as JSON")
+    collect = commands.add_parser("collect", help="local OTLP/JSON collector writing JSON lines")
+    collect.add_argument("--port", type=int, default=4318)
+    collect.add_argument("--out", default="traces/trace.jsonl")
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        _collect(args.port, args.out)
+        return
+    result = summarize(load_spans(args.path), args.session)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_summary(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,23 @@
+import asyncio
+import collections
+import sys
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from google.genai import types
+from typing import AsyncIterator, Dict, Optional
+from google.genai import errors as genai_errors, types
+from loguru import logger
+from core.db import db_manager
+from core.metrics import model_errors, turn_seconds, turns_total
+from core.tracing import tracer
+
+# Tools whose successful responses carry a completed booking payload
+BOOKING_TOOLS = {
+    "book_travel": "travel_details",
+    "book_accommodation": "accommodation_details",
+    "book_sightseeing": "sightseeing_details",
+}
 
 class Colors:
     RESET = "\033[0m"
@@ -12,30 +30,100 @@ class Colors:
     BG_BLUE = "\033[44m"
     BG_RED = "\033[41m"
 
-async def add_user_query_to_history(session_service, app_name, user_id, session_id, query):
-    session = await session_service.get_session(app_name, user_id, session_id)
-    history = session.state.get("interaction_history", [])
-    history.append({
-        "action": "user_query",
-        "query": query,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
-    updated_state = session.state.copy()
-    updated_state["interaction_history"] = history
-    await session_service.update_session_state(app_name, user_id, session_id, updated_state)
-
-async def add_agent_response_to_history(session_service, app_name, user_id, session_id, agent_name, response):
-    session = await session_service.get_session(app_name, user_id, session_id)
-    history = session.state.get("interaction_history", [])
-    history.append({
-        "action": "agent_response",
-        "agent": agent_name,
-        "response": response,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    })
-    updated_state = session.state.copy()
-    updated_state["interaction_history"] = history
-    await session_service.update_session_state(app_name, user_id, session_id, updated_state)
+class _StdinReader:
+    """
+    One daemon thread reading stdin lines for every ``async_input`` call
+
+    Lines go into an ``asyncio.Queue`` on the loop that is reading, so a
+    cancelled prompt leaves its line queued for the next one instead of an
+    abandoned thread swallowing it. Lines that arrive while no loop is
+    running are buffered until the next prompt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = collections.deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def queue(self) -> asyncio.Queue:
+        """The running loop's line queue, starting the reader thread on first use"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                # Lines still queued on a loop that has since finished carry over, in order
+                carried = []
+                while self._queue is not None and not self._queue.empty():
+                    carried.append(self._queue.get_nowait())
+                self._buffer.extendleft(reversed(carried))
+                self._loop, self._queue = loop, asyncio.Queue()
+                while self._buffer:
+                    self._queue.put_nowait(self._buffer.popleft())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stdin-reader", daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self) -> None:
+        while True:
+            try:
+                line = sys.stdin.readline()
+                item = line.rstrip("\n") if line else EOFError()
+            except BaseException as e:
+                item = e
+            self._deliver(item)
+            if isinstance(item, BaseException):
+                return  # stdin is closed; the error stays queued for every later read
+
+    def _deliver(self, item) -> None:
+        with self._lock:
+            try:
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+            except RuntimeError:
+                self._buffer.append(item)  # that loop has closed; keep it for the next one
+
+
+_stdin_reader = _StdinReader()
+
+async def async_input(prompt: str = "") -> str:
+    """
+    Read a line from stdin without blocking the event loop.
+
+    A single background thread reads stdin (see ``_StdinReader``), so
+    background tasks keep running while the user types and cancelling a
+    prompt never loses the next line. Raises EOFError like ``input()`` when
+    stdin is closed.
+    """
+    queue = _stdin_reader.queue()
+    if prompt:
+        print(prompt, end="", flush=True)
+    item = await queue.get()
+    if isinstance(item, BaseException):
+        queue.put_nowait(item)
+        raise item
+    return item
+
+async def add_user_query_to_history(session_id, query):
+    """Append the user's query to the stored interaction history (retried on conflict)"""
+    def append(state):
+        state.setdefault("interaction_history", []).append({
+            "action": "user_query",
+            "query": query,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+    await db_manager.mutate_session_state(session_id, append)
+
+async def add_agent_response_to_history(session_id, agent_name, response):
+    """Append an agent reply to the stored interaction history (retried on conflict)"""
+    def append(state):
+        state.setdefault("interaction_history", []).append({
+            "action": "agent_response",
+            "agent": agent_name,
+            "response": response,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+    await db_manager.mutate_session_state(session_id, append)
 
 def process_agent_response(event):
     if event.content and event.content.parts:
@@ -47,40 +135,125 @@ def process_agent_response(event):
             return event.author or "agent", combined_text.strip()
     return event.author or "agent", None
 
-async def call_agent(runner, user_id, session_id, query):
-    from core.response_formatter import format_booking_response  
-    content = types.Content(role="user", parts=[types.Part(text=query)])
-    full_response = ""
-    agent_name = None
+@dataclass
+class TurnMetrics:
+    """Latency figures for one agent turn (seconds)"""
+    time_to_first_token: Optional[float] = None
+    total_latency: float = 0.0
+    events: int = 0
+    chunks: int = 0
 
+@dataclass
+class ResponseChunk:
+    """A piece of agent output ready to show: plain ``text`` or a formatted ``booking``"""
+    kind: str
+    agent: str
+    text: str
+
+def apply_state_delta(state: Dict, event) -> None:
+    """Fold an event's state_delta into a local copy of the session state"""
+    actions = getattr(event, "actions", None)
+    if actions and actions.state_delta:
+        state.update(actions.state_delta)
+
+def format_completed_bookings(state: Dict, event):
+    """Yield a formatted message for each booking tool that finished in this event"""
+    from core.response_formatter import format_booking_response
+    for response in event.get_function_responses():
+        payload_key = BOOKING_TOOLS.get(response.name)
+        payload = response.response or {}
+        if not payload_key or payload.get("status") != "success":
+            continue
+        domain = payload_key.removesuffix("_details")
+        # Format against this booking only, not whatever else is in trip_plan
+        booking_state = {**state, "trip_plan": {domain: payload.get(payload_key, {})}}
+        yield format_booking_response(booking_state, payload.get("message", ""))
+
+async def stream_agent_response(runner, user_id: str, session_id: str, query: str,
+                                metrics: Optional[TurnMetrics] = None,
+                                state: Optional[Dict] = None) -> AsyncIterator[ResponseChunk]:
+    """
+    Run one agent turn and yield output incrementally as events arrive.
+
+    Text parts are yielded as soon as their event is received; booking tool
+    results are formatted once their payload is complete. The session state is
+    read once up front (unless ``state`` is passed in) and kept current from
+    each event's state_delta, so no extra session lookup is needed afterwards.
+    """
+    metrics = metrics if metrics is not None else TurnMetrics()
+    started = time.perf_counter()
+    turn_span = tracer.start_span("turn", "turn", session_id=session_id, user_id=user_id) if tracer.enabled else None
+    status = "ok"
+
+    if state is None:
+        session = await runner.session_service.get_session(
+            app_name=runner.app_name, user_id=user_id, session_id=session_id
+        )
+        state = dict(session.state) if session else {}
+
+    content = types.Content(role="user", parts=[types.Part(text=query)])
     try:
         async for event in runner.run_async(
             user_id=user_id,
             session_id=session_id,
             new_message=content
         ):
+            metrics.events += 1
+            apply_state_delta(state, event)
             agent_name, partial = process_agent_response(event)
+
+            chunks = [ResponseChunk("booking", agent_name, text)
+                      for text in format_completed_bookings(state, event)]
             if partial:
-                full_response += partial + "\n"
+                chunks.append(ResponseChunk("text", agent_name, partial))
+
+            for chunk in chunks:
+                if metrics.time_to_first_token is None:
+                    metrics.time_to_first_token = time.perf_counter() - started
+                metrics.chunks += 1
+                yield chunk
+    except BaseException as e:
+        status = f"error: {type(e).__name__}"
+        if isinstance(e, genai_errors.APIError):
+            model_errors.labels(str(e.code)).inc()
+        raise
+    finally:
+        metrics.total_latency = time.perf_counter() - started
+        ttft = metrics.time_to_first_token
+        logger.info(
+            f"⏱️ [Session: {session_id[:8]}...] turn done: "
+            f"ttft={'n/a' if ttft is None else f'{ttft:.3f}s'} "
+            f"total={metrics.total_latency:.3f}s events={metrics.events}"
+        )
+        turns_total.labels(
+            "ok" if status == "ok" else
+            "cancelled" if status in ("error: CancelledError", "error: GeneratorExit") else "error"
+        ).inc()
+        turn_seconds.observe(metrics.total_latency)
+        if turn_span is not None:
+            turn_span.attributes["events"] = metrics.events
+            tracer.end_span(turn_span, status)
+
+async def call_agent(runner, user_id, session_id, query) -> Optional[TurnMetrics]:
+    """Print one turn's streamed reply and append it to the stored interaction history"""
+    metrics = TurnMetrics()
+    response_parts = []
+    agent_name = None
+
+    try:
+        async for chunk in stream_agent_response(runner, user_id, session_id, query, metrics):
+            agent_name = chunk.agent
+            response_parts.append(chunk.text)
+            if chunk.kind == "booking":
+                print(f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ FORMATTED AGENT RESPONSE ══════════════════════════════════{Colors.RESET}")
+                print(f"{Colors.CYAN}{Colors.BOLD}{chunk.text}{Colors.RESET}")
+                print(f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╚═════════════════════════════════════════════════════════════{Colors.RESET}")
+            else:
+                print(f"{Colors.CYAN}{chunk.text}{Colors.RESET}", flush=True)
     except Exception as e:
         print(f"{Colors.BG_RED}{Colors.WHITE}ERROR: {e}{Colors.RESET}")
-        return
-
-    if full_response and agent_name:
-        session = await runner.session_service.get_session(runner.app_name, user_id, session_id)
-        state = session.state
-
-        formatted = format_booking_response(state, full_response.strip())
-
-        print(f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╔══ FORMATTED AGENT RESPONSE ══════════════════════════════════{Colors.RESET}")
-        print(f"{Colors.CYAN}{Colors.BOLD}{formatted}{Colors.RESET}")
-        print(f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD}╚═════════════════════════════════════════════════════════════{Colors.RESET}")
-
-        await add_agent_response_to_history(
-            runner.session_service,
-            runner.app_name,
-            user_id,
-            session_id,
-            agent_name,
-            formatted,
-        )
\ No newline at end of file
+        return None
+
+    if response_parts and agent_name:
+        await add_agent_response_to_history(session_id, agent_name, "\n".join(response_parts))
+    return metrics
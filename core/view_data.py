@@ -3,22 +3,23 @@ import json
 from datetime import datetime
 from typing import Dict, Any
 from loguru import logger
+from core.serialization import decode
 
 def format_db_row(row: Dict[str, Any]) -> Dict[str, Any]:
     """Format database row for display"""
     formatted = dict(row)
     
-    # Format JSON fields
+    # Format JSON fields (state may be any codec from core.serialization)
     if 'state' in formatted and formatted['state']:
         try:
-            formatted['state'] = json.loads(formatted['state'])
-        except json.JSONDecodeError:
+            formatted['state'] = decode(formatted['state'])
+        except ValueError:
             formatted['state'] = None
             
     if 'details' in formatted and formatted['details']:
         try:
-            formatted['details'] = json.loads(formatted['details'])
-        except json.JSONDecodeError:
+            formatted['details'] = decode(formatted['details'])
+        except ValueError:
             formatted['details'] = None
     
     return formatted
@@ -1,5 +1,6 @@
 import sqlite3
 import json
+from core.serialization import decode
 
 def find_test_user():
     """Search ALL sessions for Test User"""
@@ -26,7 +27,7 @@ def find_test_user():
         for idx, session in enumerate(sessions, 1):
             if session['state']:
                 try:
-                    state = json.loads(session['state'])
+                    state = decode(session['state'])
                     
                     user_name = state.get('user_name') or ''
                     user_email = state.get('user_email') or ''
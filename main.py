@@ -1,9 +1,19 @@
+from dotenv import load_dotenv
+
+# Read .env before the imports below pick up settings from the environment
+load_dotenv()
+
 import asyncio
+from typing import TYPE_CHECKING
 from loguru import logger
-from agent import trip_planner_supervisor
 from core.session_service import session_manager
 from core.db import db_manager
-from core.trip_tool_context import TripToolContext
+from core.notifications import notification_service
+from core.utils import async_input, stream_agent_response
+from core.serving import ensure_adk_session, release_adk_session, save_adk_state
+
+if TYPE_CHECKING:
+    from agent import TripPlannerRunner
 
 async def display_user_menu():
     """Display main user menu"""
@@ -30,7 +40,7 @@ async def display_session_menu(user_name: str):
 async def handle_user_login():
     """Handle user login/identification"""
     print("\n📧 Enter your email or name:")
-    user_input = input("> ").strip()
+    user_input = (await async_input("> ")).strip()
     
     if not user_input:
         print("❌ Invalid input. Please try again.")
@@ -45,11 +55,11 @@ async def handle_user_login():
         else:
             print(f"\n❌ No account found with email: {user_input}")
             print("Would you like to create a new account? (yes/no)")
-            create = input("> ").strip().lower()
+            create = (await async_input("> ")).strip().lower()
             
             if create in ['yes', 'y']:
                 print("\n📝 What's your name?")
-                name = input("> ").strip()
+                name = (await async_input("> ")).strip()
                 if name:
                     user = await db_manager.create_user(name=name, email=user_input)
                     print(f"\n✅ Account created successfully!")
@@ -59,7 +69,7 @@ async def handle_user_login():
     else:
         # Treat as name for new user
         print("\n📧 Enter your email (optional - press Enter to skip):")
-        email = input("> ").strip()
+        email = (await async_input("> ")).strip()
         email = email if email else None
         
         # Check if email exists
@@ -74,9 +84,14 @@ async def handle_user_login():
         logger.info(f"New user created: {user.user_id}")
         return user
 
+SESSIONS_PAGE_SIZE = 20
+USERS_PAGE_SIZE = 20
+
 async def display_sessions(user_id: str):
-    """Display all sessions for a user"""
-    sessions = await db_manager.list_user_sessions(user_id, active_only=True)
+    """Display the most recently active sessions for a user"""
+    sessions, next_cursor = await db_manager.list_user_sessions_page(
+        user_id, limit=SESSIONS_PAGE_SIZE, active_only=True
+    )
     
     if not sessions:
         print("\n📋 You don't have any active sessions.")
@@ -92,6 +107,9 @@ async def display_sessions(user_id: str):
         print(f"   Created: {session['created_at']}")
         print(f"   Last Active: {session['last_active']}")
     
+    if next_cursor:
+        print(f"\n(Showing your {SESSIONS_PAGE_SIZE} most recently active sessions)")
+    
     print("\n" + "="*60)
     return sessions
 
@@ -101,13 +119,13 @@ async def select_session(user_id: str):
     
     if not sessions:
         print("\nWould you like to start a new session? (yes/no)")
-        choice = input("> ").strip().lower()
+        choice = (await async_input("> ")).strip().lower()
         if choice in ['yes', 'y']:
             return await create_session_interactive(user_id)
         return None
     
     print("\nEnter session number to resume, or 'new' for a new session:")
-    choice = input("> ").strip().lower()
+    choice = (await async_input("> ")).strip().lower()
     
     if choice == 'new':
         return await create_session_interactive(user_id)
@@ -127,7 +145,7 @@ async def create_session_interactive(user_id: str):
     """Create a new session interactively"""
     print("\n✨ Creating new trip planning session...")
     print("\nGive your trip a name (optional - press Enter to skip):")
-    session_name = input("> ").strip()
+    session_name = (await async_input("> ")).strip()
     
     if not session_name:
         from datetime import datetime
@@ -139,6 +157,24 @@ async def create_session_interactive(user_id: str):
     
     return session.session_id
 
+_runner = None
+
+def get_runner() -> "TripPlannerRunner":
+    """Create the ADK runner on first use (one in-memory ADK session per DB session)"""
+    global _runner
+    if _runner is None:
+        # Deferred so the menus come up without loading ADK and building the agents
+        from google.adk.sessions import InMemorySessionService
+        from agent import TripPlannerRunner
+        _runner = TripPlannerRunner(InMemorySessionService())
+    return _runner
+
+async def stream_agent_turn(runner: "TripPlannerRunner", user_id: str, session_id: str, user_input: str) -> None:
+    """Send one message to the agent and print each response part as it arrives"""
+    print("\nAssistant: ", end="", flush=True)
+    async for chunk in stream_agent_response(runner, user_id, session_id, user_input):
+        print(chunk.text, flush=True)
+
 async def run_conversation(user_id: str, session_id: str):
     """Run the conversation loop with the Google ADK agent"""
     print("\n" + "="*60)
@@ -149,15 +185,12 @@ async def run_conversation(user_id: str, session_id: str):
     print("Type 'sessions' to switch sessions")
     print("\n" + "="*60 + "\n")
     
-    # Initialize context with user_id
-    context = TripToolContext(session_id=session_id)
-    await context.initialize()
-    context.set_state_value('user_id', user_id)
-    await context.save_state()
+    runner = get_runner()
+    await ensure_adk_session(runner, user_id, session_id)
     
     while True:
         try:
-            user_input = input("\nYou: ").strip()
+            user_input = (await async_input("\nYou: ")).strip()
             
             if not user_input:
                 continue
@@ -174,79 +207,100 @@ async def run_conversation(user_id: str, session_id: str):
                 print("\n🔄 Returning to session menu...")
                 break
             
-            # Call Google ADK agent
-            print("\nAssistant: ", end="", flush=True)
-            
-            # Google ADK agent execution
-            response = trip_planner_supervisor(user_input, session_id=session_id)
-            
-            # Display response
-            if hasattr(response, 'content'):
-                print(response.content)
-            elif isinstance(response, dict):
-                print(response.get('response', str(response)))
-            else:
-                print(str(response))
+            # Stream the Google ADK agent's reply as events arrive
+            await stream_agent_turn(runner, user_id, session_id, user_input)
             
             # Save session state after each interaction
-            await context.save_state()
+            await save_adk_state(runner, user_id, session_id)
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
+            await save_adk_state(runner, user_id, session_id)
             print("\n\n⚠️  Session interrupted. Your progress has been saved.")
             break
         except Exception as e:
             logger.error(f"Error in conversation: {str(e)}")
             print(f"\n❌ Error: {str(e)}")
             print("Please try again or type 'exit' to quit.\n")
+    
+    # Every turn was saved above; reload from the DB the next time this session is opened
+    await release_adk_session(runner, user_id, session_id)
+
+    # Digest mode: the session's buffered notifications go out as one itinerary email
+    await notification_service.flush_session(session_id)
 
 async def display_booking_status(session_id: str):
     """Display current booking status"""
     try:
-        bookings = await db_manager.get_session_bookings(session_id)
-        
-        if not bookings:
-            print("\n📋 No bookings found for this session.")
-            return
-        
-        print("\n" + "="*60)
-        print("📋 YOUR BOOKINGS")
-        print("="*60)
+        found = False
         
-        for booking in bookings:
+        async for booking in db_manager.iter_session_bookings(session_id):
+            if not found:
+                print("\n" + "="*60)
+                print("📋 YOUR BOOKINGS")
+                print("="*60)
+                found = True
+            
             print(f"\n🎫 {booking.booking_type.upper()}")
             print(f"   ID: {booking.booking_id[:8]}...")
             print(f"   Status: {booking.status}")
             print(f"   Details: {booking.details}")
             print(f"   Created: {booking.created_at}")
         
+        if not found:
+            print("\n📋 No bookings found for this session.")
+            return
+        
         print("\n" + "="*60)
         
     except Exception as e:
         logger.error(f"Failed to display bookings: {str(e)}")
         print(f"\n❌ Error retrieving bookings: {str(e)}")
 
-async def main():
-    """Main application entry point"""
-    logger.info("Trip Planner Agent started")
+async def display_all_users():
+    """Page through every active user (debug view)"""
+    print("\n" + "="*60)
+    print("👥 ALL USERS (DEBUG)")
+    print("="*60)
+    
+    after = None
+    while True:
+        users, after = await db_manager.list_users_page(limit=USERS_PAGE_SIZE, after=after)
+        for user in users:
+            print(f"\n• {user.name}")
+            print(f"  Email: {user.email or 'N/A'}")
+            print(f"  ID: {user.user_id[:8]}...")
+            print(f"  Created: {user.created_at}")
+        
+        if not after:
+            break
+        
+        more = (await async_input("\nPress Enter for more users, or 'q' to stop: ")).strip().lower()
+        if more == 'q':
+            break
     
+    print("\n" + "="*60)
+    await async_input("\nPress Enter to continue...")
+
+async def main_menu():
+    """Top-level menu loop"""
     while True:
         try:
             await display_user_menu()
-            choice = input("\nSelect option: ").strip()
+            choice = (await async_input("\nSelect option: ")).strip()
             
             if choice == '1':
                 # New user
                 print("\n📝 CREATE NEW ACCOUNT")
                 print("="*60)
                 print("\nEnter your name:")
-                name = input("> ").strip()
+                name = (await async_input("> ")).strip()
                 
                 if not name:
                     print("❌ Name is required")
                     continue
                 
                 print("\nEnter your email (optional - press Enter to skip):")
-                email = input("> ").strip()
+                email = (await async_input("> ")).strip()
                 email = email if email else None
                 
                 if email:
@@ -273,7 +327,7 @@ async def main():
                 # Session management loop
                 while True:
                     await display_session_menu(user.name)
-                    session_choice = input("\nSelect option: ").strip()
+                    session_choice = (await async_input("\nSelect option: ")).strip()
                     
                     if session_choice == '1':
                         # New session
@@ -289,7 +343,7 @@ async def main():
                     elif session_choice == '3':
                         # View sessions
                         await display_sessions(user.user_id)
-                        input("\nPress Enter to continue...")
+                        await async_input("\nPress Enter to continue...")
                         
                     elif session_choice == '4':
                         # Logout
@@ -300,18 +354,8 @@ async def main():
                         print("❌ Invalid option")
                 
             elif choice == '3':
-                # Debug - List all users
-                users = await db_manager.list_users()
-                print("\n" + "="*60)
-                print("👥 ALL USERS (DEBUG)")
-                print("="*60)
-                for user in users:
-                    print(f"\n• {user.name}")
-                    print(f"  Email: {user.email or 'N/A'}")
-                    print(f"  ID: {user.user_id[:8]}...")
-                    print(f"  Created: {user.created_at}")
-                print("\n" + "="*60)
-                input("\nPress Enter to continue...")
+                # Debug - List all users, one page at a time
+                await display_all_users()
                 
             elif choice == '4':
                 # Exit
@@ -330,5 +374,30 @@ async def main():
             print(f"\n❌ Error: {str(e)}")
             print("Please try again.\n")
 
+async def main():
+    """Main application entry point"""
+    logger.info("Trip Planner Agent started")
+    # Serve recently active sessions from memory straight after a restart
+    await db_manager.load_session_snapshot()
+    try:
+        await main_menu()
+    finally:
+        await notification_service.flush_all()
+        await db_manager.save_session_snapshot()
+
 if __name__ == "__main__":
+    import argparse
+    import os
+    from core.logging_config import configure_logging
+    from core.profiling import start_from_env
+
+    parser = argparse.ArgumentParser(description="Trip planner interactive console")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="sample tool and DB hot spots; write flamegraph stacks to DIR on exit")
+    args = parser.parse_args()
+    if args.profile:
+        os.environ["TRIP_PROFILE"] = args.profile
+
+    configure_logging()
+    start_from_env()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+HTTP front-end serving many concurrent trip planning sessions
+
+A small stdlib (asyncio) HTTP/1.1 server in front of SessionMultiplexer:
+
+    GET  /healthz                         -> {"status": "ok", "pending": N}
+    GET  /metrics                         -> Prometheus text exposition (core/metrics.py)
+    POST /sessions/<session_id>/messages  -> {"user_id": "...", "message": "...", "stream": false}
+
+With ``"stream": true`` the reply is chunked NDJSON: one line per response
+chunk as it is produced, then a final ``{"done": true, "metrics": {...}}``.
+A session owned by another user returns 403, overload 503 with Retry-After,
+a stuck turn 504, and SIGINT/SIGTERM stop accepting connections, drain
+in-flight turns and send any buffered itinerary emails (TRIP_EMAIL_DIGEST)
+before exiting.
+
+With ``--workers N`` (N > 1) the parent starts N worker processes that each
+bind the port with SO_REUSEPORT, so the kernel spreads connections across
+them; they share the SQLite database and elect one maintenance leader.
+Each worker has its own metrics, so scrape them through ``--metrics-file``
+with ``{pid}`` in the path rather than through /metrics.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--max-concurrent 32] [--workers 1]
+        [--metrics-file metrics/trip-{pid}.prom] [--metrics-interval 15]
+"""
+from dotenv import load_dotenv
+
+# Read .env before the imports below pick up settings from the environment
+load_dotenv()
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import re
+import signal
+from dataclasses import asdict
+from loguru import logger
+from core.db import db_manager
+from core.logging_config import configure_logging
+from core.maintenance import MaintenanceScheduler
+from core.metrics import CONTENT_TYPE, dump_periodically, registry
+from core.notifications import notification_service
+from core.profiling import start_from_env
+from core.serving import SessionForbidden, SessionMultiplexer, ServerBusy, ServerDraining
+from core.utils import TurnMetrics
+
+MAX_BODY_BYTES = 64 * 1024
+HEADER_TIMEOUT = 10.0
+MESSAGE_ROUTE = re.compile(r"^/sessions/([\w\-]+)/messages$")
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """Parse one HTTP/1.1 request; returns (method, path, body bytes)"""
+    request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Body exceeds {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], body
+
+
+def write_head(writer: asyncio.StreamWriter, status: int, headers: dict) -> None:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in {**headers, "Connection": "close"}.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: dict, headers: dict = None) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    write_head(writer, status, {"Content-Type": "application/json",
+                                "Content-Length": str(len(body)), **(headers or {})})
+    writer.write(body)
+    await writer.drain()
+
+
+async def send_chunk(writer: asyncio.StreamWriter, payload: dict) -> None:
+    data = (json.dumps(payload) + "\n").encode("utf-8")
+    writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+    await writer.drain()
+
+
+class TripPlannerHTTPServer:
+    """Routes HTTP requests onto a SessionMultiplexer"""
+
+    def __init__(self, multiplexer: SessionMultiplexer):
+        self.multiplexer = multiplexer
+        registry.gauge("trip_pending_turns", "Turns admitted but not finished").set_function(
+            lambda: multiplexer.pending)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await read_request(reader)
+            if request:
+                await self.route(writer, *request)
+        except HttpError as e:
+            await send_json(writer, e.status, {"error": str(e)}, e.headers)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"❌ Request failed: {e}", exc_info=True)
+            try:
+                await send_json(writer, 500, {"error": "Internal server error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def route(self, writer, method: str, path: str, body: bytes) -> None:
+        if path == "/healthz":
+            status = "draining" if self.multiplexer.draining else "ok"
+            await send_json(writer, 200, {"status": status, "pending": self.multiplexer.pending})
+            return
+        if path == "/metrics":
+            body = registry.render().encode("utf-8")
+            write_head(writer, 200, {"Content-Type": CONTENT_TYPE, "Content-Length": str(len(body))})
+            writer.write(body)
+            await writer.drain()
+            return
+
+        match = MESSAGE_ROUTE.match(path)
+        if not match:
+            raise HttpError(404, f"No route for {path}")
+        if method != "POST":
+            raise HttpError(405, "Use POST")
+
+        try:
+            payload = json.loads(body or b"{}")
+            user_id = payload["user_id"]
+            message = payload["message"]
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, "Body must be JSON with 'user_id' and 'message'")
+
+        await self.handle_message(writer, user_id, match.group(1), message, bool(payload.get("stream")))
+
+    async def handle_message(self, writer, user_id: str, session_id: str, message: str, stream: bool) -> None:
+        metrics = TurnMetrics()
+        turn = self.multiplexer.stream_turn(user_id, session_id, message, metrics)
+        try:
+            # Admission, backpressure and the first chunk all happen before headers go out
+            first = await turn.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except ServerBusy as e:
+            raise HttpError(503, str(e), {"Retry-After": "1"})
+        except ServerDraining as e:
+            raise HttpError(503, str(e), {"Retry-After": "5"})
+        except SessionForbidden as e:
+            raise HttpError(403, str(e))
+        except asyncio.TimeoutError:
+            raise HttpError(504, "Turn timed out")
+
+        chunks = [first] if first else []
+        try:
+            if stream:
+                await self.stream_chunks(writer, turn, chunks, metrics)
+                return
+            try:
+                chunks += [chunk async for chunk in turn]
+            except asyncio.TimeoutError:
+                raise HttpError(504, "Turn timed out")
+            await send_json(writer, 200, {
+                "session_id": session_id,
+                "response": "\n".join(chunk.text for chunk in chunks),
+                "chunks": [asdict(chunk) for chunk in chunks],
+                "metrics": asdict(metrics),
+            })
+        finally:
+            await turn.aclose()
+
+    async def stream_chunks(self, writer, turn, chunks, metrics: TurnMetrics) -> None:
+        """Send the turn's chunks as chunked NDJSON while it is still running"""
+        write_head(writer, 200, {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"})
+        try:
+            for chunk in chunks:
+                await send_chunk(writer, asdict(chunk))
+            async for chunk in turn:
+                await send_chunk(writer, asdict(chunk))
+            await send_chunk(writer, {"done": True, "metrics": asdict(metrics)})
+        except asyncio.TimeoutError:
+            await send_chunk(writer, {"done": True, "error": "Turn timed out"})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int, multiplexer: SessionMultiplexer,
+                drain_timeout: float = 30.0, reuse_port: bool = False,
+                metrics_file: str = None, metrics_interval: float = 15.0) -> None:
+    """Serve until SIGINT/SIGTERM, then stop accepting and drain in-flight turns"""
+    http = TripPlannerHTTPServer(multiplexer)
+    server = await asyncio.start_server(http.handle_connection, host, port, reuse_port=reuse_port or None)
+    logger.info(f"🌐 Trip planner server listening on http://{host}:{port}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await db_manager.load_session_snapshot()
+    maintenance = asyncio.create_task(MaintenanceScheduler(db_manager).run_forever())
+    background = [maintenance]
+    if metrics_file:
+        background.append(asyncio.create_task(dump_periodically(metrics_file, metrics_interval)))
+    async with server:
+        await stop.wait()
+        logger.info("🛑 Shutdown requested - no longer accepting connections")
+        server.close()
+        await multiplexer.drain(drain_timeout)
+    await notification_service.flush_all()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await db_manager.save_session_snapshot()
+
+
+def build_multiplexer(args) -> SessionMultiplexer:
+    from google.adk.sessions import InMemorySessionService
+    from agent import TripPlannerRunner
+    return SessionMultiplexer(
+        TripPlannerRunner(InMemorySessionService()),
+        max_concurrent_turns=args.max_concurrent,
+        max_pending=args.max_pending,
+        turn_timeout=args.turn_timeout,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Trip planner HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrent", type=int, default=32, help="turns running at once")
+    parser.add_argument("--max-pending", type=int, default=256, help="queued + running turns before 503")
+    parser.add_argument("--turn-timeout", type=float, default=120.0, help="seconds before a turn returns 504")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for turns on shutdown")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes sharing the port")
+    parser.add_argument("--metrics-file", help="also write metrics to this file ({pid} = worker pid)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0, help="seconds between metrics file writes")
+    return parser.parse_args(argv)
+
+
+def run_worker(args, reuse_port: bool = False) -> None:
+    """Entry point of one serving process"""
+    configure_logging()
+    start_from_env()
+    asyncio.run(serve(args.host, args.port, build_multiplexer(args), args.drain_timeout, reuse_port,
+                      args.metrics_file, args.metrics_interval))
+
+
+def run_workers(args) -> None:
+    """Start ``args.workers`` processes on the same port and forward shutdown signals to them"""
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=run_worker, args=(args, True), name=f"trip-worker-{i}")
+               for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    logger.info(f"🚀 Started {len(workers)} workers on port {args.port}")
+
+    def forward(signum, frame):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()  # SIGTERM -> each worker drains on its own
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for worker in workers:
+        worker.join()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_worker(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ from trip_tools.accom_tools import (
 )
 from trip_tools.common import list_active_bookings, view_cancelled_bookings  # ✅ ADD THIS
 from trip_tools.convo_tools import search_and_store
+from tools.llm_interface import resolve_model
 
 accommodation_agent = Agent(
     name="accommodation_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Handles accommodation bookings and cancellations.",
     instruction="""
 You are responsible for booking and managing accommodation from natural language user input.
@@ -36,6 +37,7 @@ VIEW BOOKINGS:
 - When user asks "What did I cancel?", call 'view_cancelled_bookings'
 
 IMPORTANT:
+- If the user asks for the confirmation email right away, pass email_now=True to 'book_accommodation' or the cancel tool; otherwise pass email_now=False
 - Price/budget is OPTIONAL
 - DO NOT ask user for price if they haven't provided it
     """,
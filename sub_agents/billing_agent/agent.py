@@ -3,9 +3,10 @@ Billing Agent - Handles bill calculation and cost queries
 """
 from google.adk.agents import Agent
 from trip_tools.billing_tools import calculate_trip_bill, get_trip_total
+from tools.llm_interface import resolve_model
 
 billing_agent = Agent(
-    model="gemini-2.0-flash-exp",
+    model=resolve_model("gemini-2.0-flash-exp"),
     name="billing_agent",
     description="Calculates bills and costs for trip bookings",
     instruction="""
@@ -1,9 +1,10 @@
 from google.adk.agents import Agent
 from trip_tools.conflict_tools import parse_and_check_conflicts
+from tools.llm_interface import resolve_model
 
 conflict_checker_agent = Agent(
     name="conflict_checker_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Checks the trip plan for timing and budget conflicts.",
     instruction="""
         You are responsible for validating the trip plan to make sure everything fits well in terms of timing and budget.
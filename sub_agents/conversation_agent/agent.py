@@ -1,10 +1,11 @@
 from google.adk.agents import Agent
 from trip_tools.convo_tools import search_and_store
 from trip_tools.ui_tools import identify_user, list_user_sessions, get_current_user_info
+from tools.llm_interface import resolve_model
 
 convo_agent = Agent(
     name="conversation_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Handles user identification and general travel-related questions.",
     instruction="""
         You are a friendly travel assistant responsible for:
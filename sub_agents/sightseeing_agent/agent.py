@@ -8,10 +8,11 @@ from trip_tools.sightseeing_tools import (
 )
 from trip_tools.common import list_active_bookings, view_cancelled_bookings  # ✅ NEW
 from trip_tools.convo_tools import search_and_store
+from tools.llm_interface import resolve_model
 
 sightseeing_agent = Agent(
     name="sightseeing_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Handles sightseeing planning, booking, and cancellations for users.",
     instruction="""
 You are responsible for planning and managing sightseeing from user input.
@@ -33,6 +34,7 @@ VIEW BOOKINGS:
 - When user asks "What did I cancel?" or "Show cancelled bookings", call 'view_cancelled_bookings'
 
 IMPORTANT:
+- If the user asks for the confirmation email right away, pass email_now=True to 'book_sightseeing' or the cancel tool; otherwise pass email_now=False
 - Entry fee/budget is OPTIONAL - the system will try to extract it from previous search results
 - DO NOT ask user for entry fee if they haven't provided it
 - Use 'search_and_store' only for general queries like "top places to visit in Jaipur"
@@ -7,10 +7,11 @@ from trip_tools.travel_tools import (
 )
 from trip_tools.common import list_active_bookings, view_cancelled_bookings  # ✅ NEW
 from trip_tools.convo_tools import search_and_store
+from tools.llm_interface import resolve_model
 
 travel_agent = Agent(
     name="travel_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Handles travel bookings and cancellations based on user input.",
     instruction="""
 You are responsible for booking and managing travel from natural language user input.
@@ -32,6 +33,7 @@ VIEW BOOKINGS:
 - When user asks "What did I cancel?" or "Show cancelled bookings", call 'view_cancelled_bookings'
 
 IMPORTANT: 
+- If the user asks for the confirmation email right away, pass email_now=True to 'book_travel' or the cancel tool; otherwise pass email_now=False
 - Price is OPTIONAL - the system will try to extract it from previous search results
 - DO NOT ask user for price if they haven't provided it
 - Use 'search_and_store' only for general travel queries like "best trains from Delhi to Mumbai"
@@ -1,5 +1,6 @@
 import sqlite3
 import json
+from core.serialization import decode
 
 def find_test_user():
     """Search ALL sessions for Test User"""
@@ -30,7 +31,7 @@ def find_test_user():
         for idx, session in enumerate(sessions, 1):
             if session['state']:
                 try:
-                    state = json.loads(session['state'])
+                    state = decode(session['state'])
                     
                     # Safe retrieval with None handling
                     user_name = state.get('user_name') or ''
@@ -133,7 +134,7 @@ def find_test_user():
                 
                 if latest['state']:
                     try:
-                        state = json.loads(latest['state'])
+                        state = decode(latest['state'])
                         print("\n📋 STATE CONTENTS:")
                         print(json.dumps(state, indent=2))
                         
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+import pytest
+from core.notifications import notification_service
+from trip_tools import batch_tools
+from trip_tools.batch_tools import book_itinerary, cancel_trip
+from trip_tools.travel_tools import book_travel
+
+
+@pytest.fixture
+def emails(monkeypatch):
+    sent = []
+
+    async def fake_summary(**kwargs):
+        sent.append((kwargs["title"], [item["booking_id"] for item in kwargs["items"]]))
+        return {"email_sent": True, "email_address": kwargs["user_email"]}
+
+    async def single_email(**kwargs):
+        raise AssertionError("batch tools send one summary email, not one per booking")
+    monkeypatch.setattr(notification_service, "send_summary_notification", fake_summary)
+    monkeypatch.setattr(notification_service, "send_booking_notification", single_email)
+    return sent
+
+
+def _context():
+    return SimpleNamespace(state={
+        "user_email": "traveler@example.com",
+        "travel_from": "Delhi", "travel_to": "Jaipur", "travel_date": "2025-12-01",
+        "travel_mode": "train", "travel_price": 750,
+        "accommodation_location": "Jaipur", "accommodation_check_in": "2025-12-01",
+        "accommodation_check_out": "2025-12-03", "accommodation_budget": 2000,
+        "sightseeing_location": "Amber Fort", "sightseeing_date": "2025-12-02", "sightseeing_budget": 500,
+    })
+
+
+@pytest.mark.asyncio
+async def test_itinerary_booked_and_cancelled_with_one_email_each(emails):
+    context = _context()
+    booked = await book_itinerary(context)
+
+    assert booked["status"] == "success" and booked["total_amount"] == 750 + 4000 + 500
+    assert set(context.state["trip_plan"]) == {"travel", "accommodation", "sightseeing"}
+    assert len(emails) == 1 and emails[0][0] == "Itinerary Confirmed" and len(emails[0][1]) == 3
+
+    retry = await book_travel(context)  # answered from the dedup index, no email
+    assert retry["deduplicated"] and retry["travel_details"] == booked["bookings"]["travel"]
+    assert (await book_itinerary(context))["already_booked"].keys() == booked["bookings"].keys()
+    assert len(emails) == 1
+
+    cancelled = await cancel_trip(context)
+    assert cancelled["total_refund"] == booked["total_amount"]
+    assert context.state["trip_plan"] == {} and len(context.state["cancelled_bookings"]) == 3
+    assert context.state["booking_totals"]["refunded"] == booked["total_amount"]
+    assert emails[1] == ("Trip Cancelled", emails[0][1])
+    assert (await cancel_trip(context))["status"] == "not_found"
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_booked_when_one_item_fails(emails, monkeypatch):
+    def broken(state):
+        raise RuntimeError("pricing unavailable")
+    label, check, request, _ = batch_tools.BOOKERS["sightseeing"]
+    monkeypatch.setitem(batch_tools.BOOKERS, "sightseeing", (label, check, request, broken))
+
+    context = _context()
+    result = await book_itinerary(context)
+    assert result["status"] == "error"
+    assert "trip_plan" not in context.state and "booking_events" not in context.state and emails == []
@@ -0,0 +1,111 @@
+import copy
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+import pytest
+from core.db import DatabaseManager
+from core.notifications import notification_service
+from trip_tools.accom_tools import book_accommodation
+from trip_tools.billing_tools import get_trip_total
+from trip_tools.booking_events import project, rebuild
+from trip_tools.sightseeing_tools import book_sightseeing
+from trip_tools.travel_tools import book_travel, cancel_travel_booking
+
+
+@pytest.fixture(autouse=True)
+def no_email(monkeypatch):
+    async def fake_send(**kwargs):
+        return {"email_sent": True}
+    monkeypatch.setattr(notification_service, "send_booking_notification", fake_send)
+
+
+async def _book_and_cancel(state):
+    """Book travel twice (the second replaces the first), add a hotel, cancel the travel"""
+    context = SimpleNamespace(state=state)
+    await book_travel(context)
+    state["travel_date"] = "2025-12-02"
+    await book_travel(context)
+    await book_accommodation(context)
+    await cancel_travel_booking(context)
+    return state
+
+
+def _state():
+    return {
+        "user_email": "traveler@example.com",
+        "travel_from": "Delhi", "travel_to": "Jaipur", "travel_date": "2025-12-01",
+        "travel_mode": "train", "travel_price": 750,
+        "accommodation_location": "Jaipur", "accommodation_check_in": "2025-12-01",
+        "accommodation_check_out": "2025-12-03", "accommodation_budget": 2000,
+    }
+
+
+@pytest.mark.asyncio
+async def test_projections_follow_the_log_and_can_be_rebuilt():
+    state = await _book_and_cancel(_state())
+
+    events = state["booking_events"]
+    assert [e["event_type"] for e in events] == ["booked", "modified", "booked", "cancelled", "refunded"]
+    assert events[1]["previous_booking_id"] == events[0]["booking_id"]
+    assert list(state["trip_plan"]) == ["accommodation"]
+    assert state["cancelled_bookings"][0]["refund"] == 750
+    assert state["booking_totals"] == {"active": {"accommodation": 4000}, "total": 4000, "refunded": 750}
+    assert get_trip_total(SimpleNamespace(state=state))["total_amount"] == 4000
+
+    incremental = {key: copy.deepcopy(state[key]) for key in ("trip_plan", "cancelled_bookings", "booking_totals")}
+    assert project(events) == incremental
+    state["trip_plan"] = {"travel": {"ticket_id": "stale"}}
+    state["cancelled_bookings"] = []
+    rebuild(state)
+    assert {key: state[key] for key in incremental} == incremental
+
+
+@pytest.mark.asyncio
+async def test_events_are_appended_once_and_project_into_bookings(tmp_path):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    user = await db.create_user(name="Logger", email="logger@example.com")
+    session = await db.create_session(user.user_id)
+    state = await _book_and_cancel(_state())
+    events = state["booking_events"]
+
+    assert await db.append_booking_events(session.session_id, events[:2]) == 2
+    assert await db.append_booking_events(session.session_id, events) == 3
+    assert await db.append_booking_events(session.session_id, events) == 0
+
+    statuses = {b.booking_id: b.status for b in await db.get_session_bookings(session.session_id)}
+    assert statuses == {events[0]["booking_id"]: "cancelled", events[1]["booking_id"]: "cancelled",
+                        events[2]["booking_id"]: "confirmed"}
+    assert await db.get_session_bill(session.session_id) == 4000
+
+    last_week = await db.get_booking_events("cancelled", since=datetime.now(UTC) - timedelta(days=7))
+    assert [e.booking_id for e in last_week] == [events[1]["booking_id"]]
+    assert await db.get_booking_events("cancelled", until=datetime.now(UTC) - timedelta(days=7)) == []
+
+    assert await db.rebuild_session_bookings(session.session_id) == 5
+    assert {b.booking_id: b.status for b in await db.get_session_bookings(session.session_id)} == statuses
+
+    state.update(sightseeing_location="Amber Fort", sightseeing_date="2025-12-02", sightseeing_budget=500)
+    await book_sightseeing(SimpleNamespace(state=state))
+    assert await db.append_booking_events(session.session_id, state["booking_events"]) == 1
+    assert await db.get_session_bill(session.session_id) == state["booking_totals"]["total"] == 4500
+
+
+@pytest.mark.asyncio
+async def test_stale_writers_do_not_drop_each_others_events(tmp_path):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    user = await db.create_user(name="Workers", email="workers@example.com")
+    session = await db.create_session(user.user_id)
+    # Two workers start from the same copy of the session and each book something
+    first, second = _state(), _state()
+    await book_travel(SimpleNamespace(state=first))
+    await book_accommodation(SimpleNamespace(state=second))
+    assert first["booking_events"][0]["seq"] == second["booking_events"][0]["seq"] == 0
+
+    assert await db.append_booking_events(session.session_id, first["booking_events"]) == 1
+    assert await db.append_booking_events(session.session_id, second["booking_events"]) == 1
+    assert await db.append_booking_events(session.session_id, second["booking_events"]) == 0  # re-sent
+
+    log = await db.get_session_event_log(session.session_id)
+    assert [(e["seq"], e["booking_type"]) for e in log] == [(0, "travel"), (1, "accommodation")]
+    assert {b.booking_type for b in await db.get_session_bookings(session.session_id)} == {
+        "travel", "accommodation"}
+    assert await db.get_session_bill(session.session_id) == 750 + 4000
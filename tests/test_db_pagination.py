@@ -0,0 +1,69 @@
+import pytest
+from datetime import datetime, UTC
+from core.db import DatabaseManager
+from core.models import Booking
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+
+
+@pytest.mark.asyncio
+async def test_users_keyset_pages_cover_all_rows(db):
+    """Pages should return every user exactly once, newest first"""
+    created = [await db.create_user(name=f"User {i}", email=f"user{i}@example.com") for i in range(7)]
+
+    seen = []
+    after = None
+    while True:
+        users, after = await db.list_users_page(limit=3, after=after)
+        assert len(users) <= 3
+        seen.extend(u.user_id for u in users)
+        if not after:
+            break
+
+    assert sorted(seen) == sorted(u.user_id for u in created)
+    assert len(seen) == len(set(seen))
+
+    streamed = [u.user_id async for u in db.iter_users(page_size=2)]
+    assert streamed == seen
+
+
+@pytest.mark.asyncio
+async def test_session_and_booking_pages(db):
+    """Session and booking iterators should match the list-based APIs"""
+    user = await db.create_user(name="Pager", email="pager@example.com")
+    sessions = [await db.create_session(user.user_id, session_name=f"Trip {i}") for i in range(5)]
+
+    first_page, cursor = await db.list_user_sessions_page(user.user_id, limit=2)
+    assert len(first_page) == 2 and cursor is not None
+
+    streamed = [s['session_id'] async for s in db.iter_user_sessions(user.user_id, page_size=2)]
+    listed = [s['session_id'] for s in await db.list_user_sessions(user.user_id)]
+    assert streamed == listed
+
+    session_id = sessions[0].session_id
+    for i in range(4):
+        await db.save_booking(Booking(
+            booking_id=f"TKT-{i}",
+            user_id=user.user_id,
+            session_id=session_id,
+            booking_type='travel',
+            details={"price": 100 * i},
+            created_at=datetime.now(UTC),
+            status='confirmed'
+        ))
+
+    by_session = [b.booking_id async for b in db.iter_session_bookings(session_id, page_size=3)]
+    by_user = [b.booking_id async for b in db.iter_user_bookings(user.user_id, page_size=1)]
+    assert by_session == [b.booking_id for b in await db.get_session_bookings(session_id)]
+    assert sorted(by_user) == sorted(by_session)
+
+
+@pytest.mark.asyncio
+async def test_invalid_page_arguments(db):
+    with pytest.raises(ValueError):
+        await db.list_users_page(limit=0)
+    with pytest.raises(ValueError):
+        await db.list_users_page(limit=5, after="not-a-cursor")
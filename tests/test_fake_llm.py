@@ -0,0 +1,57 @@
+import pytest
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import errors, types
+from tools.fake_llm import DEFAULT_SCRIPT, FakeLlm, FakeModelConfig, ScriptedTurn, fake_backend
+from trip_tools.travel_tools import book_travel, parse_travel_details
+
+SCRIPT = (
+    ScriptedTurn(r"train", (
+        ("parse_travel_details", {"user_input": "{message}"}),
+        ("book_travel", {}),
+    ), "Booked."),
+)
+
+
+@pytest.fixture
+def runner():
+    fake_backend.configure(FakeModelConfig(latency_ms=0), SCRIPT)
+    agent = Agent(name="travel_agent", model=FakeLlm(model="gemini-2.0-flash"),
+                  tools=[parse_travel_details, book_travel])
+    yield Runner(app_name="trip_planner", agent=agent, session_service=InMemorySessionService())
+    fake_backend.configure(FakeModelConfig(), DEFAULT_SCRIPT)
+
+
+async def _turn(runner, message):
+    session = await runner.session_service.create_session(app_name="trip_planner", user_id="u1")
+    events = [event async for event in runner.run_async(
+        user_id="u1", session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=message)]))]
+    session = await runner.session_service.get_session(
+        app_name="trip_planner", user_id="u1", session_id=session.id)
+    return events, session.state
+
+
+@pytest.mark.asyncio
+async def test_scripted_turn_runs_tools_in_order(runner):
+    message = "Book a train from Delhi to Jaipur on December 5"
+    events, state = await _turn(runner, message)
+
+    calls = [call.name for event in events for call in event.get_function_calls()]
+    assert calls == ["parse_travel_details", "book_travel"]
+    assert state["trip_plan"]["travel"]["to"] == "Jaipur"
+    assert events[-1].content.parts[0].text.startswith("[travel_agent] Booked.")
+    assert fake_backend.stats.calls == 3
+
+    _, again = await _turn(runner, message)  # same message, same outcome
+    assert again["trip_plan"]["travel"]["from"] == state["trip_plan"]["travel"]["from"]
+
+
+@pytest.mark.asyncio
+async def test_injected_rate_limit_errors(runner):
+    fake_backend.configure(FakeModelConfig(latency_ms=0, rate_429=1.0))
+    with pytest.raises(errors.ClientError) as exc:
+        await _turn(runner, "Book a train from Delhi to Jaipur")
+    assert exc.value.code == 429
+    assert fake_backend.stats.errors == {429: 1}
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+import pytest
+from core.notifications import notification_service
+from trip_tools.accom_tools import book_accommodation
+from trip_tools.idempotency import booking_key
+from trip_tools.travel_tools import book_travel, cancel_travel_booking
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    emails = []
+
+    async def fake_send(**kwargs):
+        emails.append(kwargs["booking_id"])
+        return {"email_sent": True, "email_address": kwargs["user_email"]}
+    monkeypatch.setattr(notification_service, "send_booking_notification", fake_send)
+    monkeypatch.setattr(notification_service, "send_email", lambda *args, **kwargs: True)
+    return emails
+
+
+def _context():
+    return SimpleNamespace(state={
+        "user_email": "traveler@example.com", "user_name": "Traveler",
+        "travel_from": "Delhi", "travel_to": "Jaipur", "travel_date": "2025-12-01",
+        "travel_mode": "train", "travel_price": 750,
+        "accommodation_location": "Jaipur", "accommodation_check_in": "2025-12-01",
+        "accommodation_check_out": "2025-12-03", "accommodation_budget": 2000,
+    })
+
+
+def test_key_ignores_case_whitespace_and_empty_fields():
+    assert booking_key("travel", {"from": "Delhi ", "to": "jaipur", "transport_name": None}) == \
+        booking_key("travel", {"from": "delhi", "to": "Jaipur"})
+    assert booking_key("travel", {"from": "Delhi"}) != booking_key("accommodation", {"from": "Delhi"})
+
+
+@pytest.mark.asyncio
+async def test_retried_bookings_return_the_original(sent):
+    context = _context()
+    first = await book_travel(context)
+    retry = await book_travel(context)
+    hotel = await book_accommodation(context)
+    hotel_retry = await book_accommodation(context)
+
+    assert retry["deduplicated"] and retry["travel_details"] == first["travel_details"]
+    assert hotel_retry["accommodation_details"]["booking_id"] == hotel["accommodation_details"]["booking_id"]
+    assert sent == [first["travel_details"]["ticket_id"], hotel["accommodation_details"]["booking_id"]]
+
+    context.state["travel_date"] = "2025-12-02"  # a different trip is a new booking
+    changed = await book_travel(context)
+    assert "deduplicated" not in changed and len(sent) == 3
+
+
+@pytest.mark.asyncio
+async def test_booking_again_after_cancelling_is_not_a_retry(sent):
+    context = _context()
+    first = await book_travel(context)
+    await cancel_travel_booking(context)
+    again = await book_travel(context)
+
+    assert "deduplicated" not in again
+    assert again["travel_details"]["ticket_id"] != first["travel_details"]["ticket_id"]
@@ -0,0 +1,39 @@
+import re
+import pytest
+from core.knowledge_base import DestinationKnowledgeBase
+from tools import search_tool
+
+
+@pytest.fixture
+def kb(tmp_path):
+    return DestinationKnowledgeBase(db_path=str(tmp_path / "kb.db"))
+
+
+def test_ranked_lookup_prefers_the_asked_for_entry(kb):
+    hits = kb.search("train fare from Delhi to Jaipur")
+    assert hits[0].kind == "route" and "train" in hits[0].title
+    assert all(hit.kind == "route" for hit in hits)
+
+    sights = kb.search("things to do in Jaipur")
+    assert {hit.kind for hit in sights} <= {"overview", "attraction"}
+
+    assert kb.search("Taj Mahal entry fee")[0].title == "Taj Mahal"
+    assert kb.search("weather in Reykjavik") == []
+
+
+def test_answer_prices_are_readable_by_booking_tools(kb):
+    answer = kb.answer("Delhi to Agra by train")
+    assert re.search(r'₹\s*(\d+)', answer).group(1) == "690"
+
+
+@pytest.mark.asyncio
+async def test_search_tool_skips_the_model_on_a_hit(monkeypatch, kb):
+    monkeypatch.setattr(search_tool, "knowledge_base", kb)
+
+    async def no_model(*args, **kwargs):
+        raise AssertionError("model should not be called")
+
+    monkeypatch.setattr(search_tool, "query_llm", no_model)
+    result = await search_tool.perform_search(None, "hotels in Goa")
+    assert result["source"] == "knowledge_base"
+    assert "₹1500" in result["output"]
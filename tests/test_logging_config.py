@@ -0,0 +1,52 @@
+import json
+import sys
+import pytest
+from loguru import logger
+from core.logging_config import LoggingSettings, configure_logging
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    yield tmp_path / "trip.log"
+    logger.remove()
+    logger.add(sys.stderr)
+
+
+def _lines(path):
+    logger.remove()  # stops the background writer, flushing it
+    return path.read_text().splitlines()
+
+
+def test_module_levels_and_json_lines(log_file):
+    configure_logging(LoggingSettings(level="WARNING", module_levels={__name__: "DEBUG"}, json=True),
+                      sink=str(log_file))
+    logger.debug("Saved booking {}", "HTL-1")
+    logger.patch(lambda record: record.update(name="core.db")).info("dropped by the default level")
+
+    lines = [json.loads(line) for line in _lines(log_file)]
+    assert [line["message"] for line in lines] == ["Saved booking HTL-1"]
+    assert lines[0]["level"] == "DEBUG" and lines[0]["module"] == __name__
+
+
+def test_disabled_levels_skip_formatting(log_file):
+    configure_logging(LoggingSettings(level="INFO"), sink=str(log_file))
+
+    class Expensive:
+        def __format__(self, spec):
+            raise AssertionError("formatted a disabled message")
+
+    logger.debug("Details: {}", Expensive())
+    logger.info("kept")
+    assert [line.rsplit(" - ", 1)[1] for line in _lines(log_file)] == ["kept"]
+
+
+def test_sampling_keeps_a_fraction_but_never_warnings(log_file):
+    configure_logging(LoggingSettings(level="DEBUG", sample_rates={"DEBUG": 0.1, "WARNING": 0.0}),
+                      sink=str(log_file))
+    for i in range(1000):
+        logger.debug("tick {}", i)
+    logger.warning("always kept")
+
+    lines = _lines(log_file)
+    assert 30 < len(lines) - 1 < 200
+    assert lines[-1].endswith("always kept")
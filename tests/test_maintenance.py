@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+import pytest
+from core import db as db_module
+from core.db import DatabaseManager
+from core.maintenance import MaintenanceScheduler, expire_and_archive, vacuum_if_fragmented
+from core.models import Booking
+
+
+@pytest.mark.asyncio
+async def test_single_leader_runs_maintenance_and_failover(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    worker_a = MaintenanceScheduler(DatabaseManager(db_path=path), lease_ttl=0.2, holder="a")
+    worker_b = MaintenanceScheduler(DatabaseManager(db_path=path), lease_ttl=0.2, holder="b")
+
+    results_a = await worker_a.run_once()
+    assert set(results_a) == {"archive", "wal_checkpoint", "optimize", "vacuum"}
+    assert await worker_b.run_once() == {}
+    assert await worker_a.run_once()  # the leader renews its own lease
+
+    await asyncio.sleep(0.25)  # leader "dies" and its lease lapses
+    assert await worker_b.run_once()
+    assert worker_b.is_leader
+    assert await worker_a.run_once() == {}
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+@pytest.mark.asyncio
+async def test_locked_database_is_retried(tmp_path, monkeypatch):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    monkeypatch.setattr(db_module, "LOCK_RETRY_BASE_DELAY", 0.001)
+    failures = iter([sqlite3.OperationalError("database is locked")] * 2)
+    real_connection = db._get_connection
+
+    def flaky_connection():
+        error = next(failures, None)
+        if error:
+            raise error
+        return real_connection()
+
+    monkeypatch.setattr(db, "_get_connection", flaky_connection)
+    user = await db.create_user(name="Retry", email="retry@example.com")
+    assert (await db.get_user(user.user_id)).name == "Retry"
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_expired_archived_and_space_reclaimed(tmp_path):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    user = await db.create_user(name="Archive", email="archive@example.com")
+    big_state = {"interaction_history": [{"response": "x" * 2000} for _ in range(50)]}
+    idle = [await db.create_session(user.user_id, initial_state=big_state) for _ in range(5)]
+    fresh = await db.create_session(user.user_id)
+    for i, session in enumerate(idle):
+        status = "confirmed" if i == 0 else "completed"  # an upcoming trip keeps its session live
+        await db.save_booking(Booking(f"PNR-{i}", user.user_id, session.session_id, "travel",
+                                      {"price": 100}, session.created_at, status))
+    await db.save_booking(Booking("PNR-X", user.user_id, fresh.session_id, "travel",
+                                  {"price": 50}, fresh.created_at, "cancelled"))
+    with db._get_connection() as conn:
+        conn.execute("UPDATE sessions SET last_active = '2000-01-01T00:00:00+00:00' WHERE session_id != ?",
+                     (fresh.session_id,))
+        # CURRENT_TIMESTAMP format, as written by the column default
+        conn.execute("UPDATE sessions SET last_active = '2000-01-01 00:00:00' WHERE session_id = ?",
+                     (idle[1].session_id,))
+
+    archived = await expire_and_archive(ttl_seconds=3600, cancelled_retention=0, batch_size=2)(db)
+    assert archived == {"expired_sessions": 5, "archived_sessions": 4, "archived_bookings": 5}
+    assert await db.get_session(fresh.session_id)
+    assert await db.get_session(idle[1].session_id) is None
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sessions_archive").fetchone()[0] == 4
+        assert [tuple(row) for row in conn.execute("SELECT booking_id, status FROM bookings")] == [
+            ("PNR-0", "confirmed")]
+        assert conn.execute("SELECT is_active FROM sessions WHERE session_id = ?",
+                            (idle[0].session_id,)).fetchone()[0] == 0
+
+    report = await vacuum_if_fragmented(min_free_ratio=0.0)(db)
+    assert report["reclaimed_bytes"] > 0
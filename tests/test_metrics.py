@@ -0,0 +1,46 @@
+import pytest
+from core.metrics import MetricsRegistry, write_metrics
+from core.tracing import traced
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    registry.counter("turns_total", "Turns", ("status",)).labels("ok").inc(2)
+    registry.gauge("cache_entries", "Entries").set_function(lambda: 7)
+    latency = registry.histogram("op_seconds", "Latency", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.labels("get").observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE turns_total counter" in lines
+    assert 'turns_total{status="ok"} 2' in lines
+    assert "cache_entries 7" in lines
+    assert 'op_seconds_bucket{op="get",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{op="get",le="1"} 2' in lines
+    assert 'op_seconds_bucket{op="get",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{op="get"} 3' in lines
+
+
+def test_registry_rejects_conflicting_types():
+    registry = MetricsRegistry()
+    assert registry.counter("x_total", "X") is registry.counter("x_total", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x_total", "X")
+
+
+@pytest.mark.asyncio
+async def test_traced_calls_record_latency_and_errors(tmp_path):
+    @traced("tool", "metrics_probe")
+    async def probe(fail: bool):
+        if fail:
+            raise KeyError("missing")
+        return "ok"
+
+    await probe(False)
+    with pytest.raises(KeyError):
+        await probe(True)
+
+    text = open(write_metrics(str(tmp_path / "trip-{pid}.prom"))).read()
+    assert 'trip_tool_duration_seconds_count{operation="metrics_probe"} 2' in text
+    assert 'trip_operation_errors_total{error="KeyError",kind="tool",operation="metrics_probe"} 1' not in text
+    assert 'trip_operation_errors_total{kind="tool",operation="metrics_probe",error="KeyError"} 1' in text
@@ -0,0 +1,77 @@
+import sqlite3
+import pytest
+from core.db import DatabaseManager
+from core.migrations import MigrationRunner, LATEST_VERSION
+
+LEGACY_SCHEMA = """
+    CREATE TABLE users (user_id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT UNIQUE, phone TEXT,
+                        created_at TIMESTAMP, last_login TIMESTAMP, is_active BOOLEAN DEFAULT 1, metadata JSON);
+    CREATE TABLE sessions (session_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, session_name TEXT,
+                           created_at TIMESTAMP, last_active TIMESTAMP, state JSON, is_active BOOLEAN DEFAULT 1);
+    CREATE TABLE bookings (booking_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+                           booking_type TEXT NOT NULL, details JSON NOT NULL, created_at TIMESTAMP,
+                           updated_at TIMESTAMP, status TEXT DEFAULT 'confirmed');
+"""
+
+
+def _legacy_db(path, bookings):
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        conn.execute("INSERT INTO users VALUES ('u1', 'Legacy', 'legacy@example.com', NULL, "
+                     "'2025-01-01T00:00:00', NULL, 1, '{}')")
+        conn.execute("INSERT INTO sessions VALUES ('s1', 'u1', 'Old trip', '2025-01-01T00:00:00', "
+                     "'2025-01-01T00:00:00', '{\"user_name\": \"Legacy\"}', 1)")
+        conn.executemany(
+            "INSERT INTO bookings VALUES (?, 'u1', 's1', 'travel', ?, ?, ?, 'confirmed')",
+            [(f"PNR-{i}", f'{{"price": {100 + i}}}', f"2025-01-01T00:00:{i:02d}", "2025-01-01") for i in range(bookings)]
+        )
+
+
+@pytest.mark.asyncio
+async def test_legacy_database_is_migrated_and_backfilled_in_batches(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    _legacy_db(path, bookings=7)
+
+    batches = []
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.set_trace_callback(lambda sql: batches.append(sql) if sql.startswith("UPDATE bookings") else None)
+        return conn
+
+    assert MigrationRunner(connect, batch_size=3).run() == LATEST_VERSION
+    assert len([sql for sql in batches if "amount IS NULL" in sql]) == 3  # 3 + 3 + 1 rows
+
+    db = DatabaseManager(db_path=path)
+    session = await db.get_session("s1")
+    assert session.version == 0 and session.state == {"user_name": "Legacy"}
+    assert await db.get_session_bill("s1") == sum(100 + i for i in range(7))
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM bookings WHERE amount IS NULL").fetchone()[0] == 0
+
+
+def test_current_schema_skips_ddl(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    assert MigrationRunner(lambda: sqlite3.connect(path)).run() == LATEST_VERSION
+
+    statements = []
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    assert MigrationRunner(connect).run() == LATEST_VERSION
+    assert len(statements) == 1 and statements[0].lstrip().startswith("SELECT")
+
+
+def test_sightseeing_amounts_backfilled_from_budget(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    _legacy_db(path, bookings=0)
+    with sqlite3.connect(path) as conn:
+        conn.execute("""INSERT INTO bookings VALUES ('SIGHT-1', 'u1', 's1', 'sightseeing',
+                        '{"budget": 500, "entry_fee": 50}', '2025-01-01', '2025-01-01', 'confirmed')""")
+
+    assert MigrationRunner(lambda: sqlite3.connect(path)).run() == LATEST_VERSION
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT amount FROM bookings WHERE booking_id = 'SIGHT-1'").fetchone()[0] == 500
@@ -0,0 +1,58 @@
+import dataclasses
+import json
+import pytest
+from core.models import Booking, Session
+
+STATE = {"user_name": "Traveler", "trip_plan": {"travel": {"price": 750}}}
+DETAILS = {"from": "Delhi", "to": "Jaipur", "price": 750}
+
+
+def _session_row(state=STATE):
+    return {"session_id": "s-1", "user_id": "u-1", "created_at": "2025-01-01T10:00:00",
+            "last_active": "2025-01-01T11:00:00", "state": json.dumps(state), "version": 3}
+
+
+def _booking_row():
+    return {"booking_id": "b-1", "user_id": "u-1", "session_id": "s-1", "booking_type": "travel",
+            "details": json.dumps(DETAILS), "created_at": "2025-01-01T10:00:00", "status": "confirmed"}
+
+
+def test_lazy_state_is_decoded_once_on_first_access():
+    session = Session.from_row(_session_row(), lazy=True)
+    assert session._raw_state is not None
+
+    state = session.state
+    assert state == STATE and session._raw_state is None
+    assert session.state is state  # cached in the slot, not decoded again
+
+    booking = Booking.from_row(_booking_row(), lazy=True)
+    assert booking.details == DETAILS and booking._raw_details is None
+    assert booking.details is booking.details
+
+
+def test_assignment_before_access_wins():
+    session = Session.from_row(_session_row(), lazy=True)
+    session.state = {"replaced": True}
+    assert session.state == {"replaced": True}
+
+    booking = Booking.from_row(_booking_row(), lazy=True)
+    booking.details = {}
+    assert booking.details == {}
+
+
+def test_lazy_models_behave_like_eager_ones():
+    lazy, eager = Session.from_row(_session_row(), lazy=True), Session.from_row(_session_row())
+    assert lazy == eager
+    assert dataclasses.asdict(Session.from_row(_session_row(), lazy=True)) == dataclasses.asdict(eager)
+    assert dataclasses.asdict(eager)["state"] == STATE
+
+    assert Booking.from_row(_booking_row(), lazy=True) == Booking.from_row(_booking_row())
+    assert Session.from_row(_session_row({"other": 1}), lazy=True) != eager
+
+
+def test_missing_attributes_raise_attribute_error():
+    session = Session.from_row(_session_row(), lazy=True)
+    with pytest.raises(AttributeError):
+        session.no_such_field
+    assert not hasattr(Booking.from_row(_booking_row(), lazy=True), "no_such_field")
+    assert getattr(session, "no_such_field", None) is None
@@ -0,0 +1,110 @@
+import asyncio
+import math
+from types import SimpleNamespace
+import pytest
+from core import notifications
+from core.notifications import SmtpSettings, notification_service, parse_digest_window
+from trip_tools.travel_tools import book_travel, cancel_travel_booking
+
+
+@pytest.fixture
+def digest(monkeypatch):
+    """Put the service in digest mode with a recorded ``send_email``; returns the sent emails (settings are set per test)"""
+    sent = []
+
+    def fake_send(to_email, subject, html_body, text_body=""):
+        sent.append((to_email, subject, text_body))
+        return True
+
+    monkeypatch.setattr(notification_service, "send_email", fake_send)
+    saved = notification_service._settings
+    yield sent
+    notification_service._settings = saved
+    notification_service._digests.clear()
+
+
+def _digest_mode(window, max_age=3600.0):
+    notification_service._settings = SmtpSettings("smtp.test", 587, "bot@example.com", "secret",
+                                                  digest_window=window, digest_max_age=max_age)
+
+
+def _context(session_id="session-a"):
+    return SimpleNamespace(state={
+        "session_id": session_id, "user_email": "traveler@example.com", "user_name": "Asha",
+        "travel_from": "Delhi", "travel_to": "Jaipur", "travel_date": "2025-12-01",
+        "travel_mode": "train", "travel_price": 750,
+    })
+
+
+def test_parse_digest_window():
+    assert parse_digest_window(None) is None and parse_digest_window("0") is None
+    assert parse_digest_window("session") == math.inf and parse_digest_window("90") == 90
+    with pytest.raises(ValueError):
+        parse_digest_window("-5")
+
+
+@pytest.mark.asyncio
+async def test_session_digest_sends_one_itinerary_email(digest):
+    _digest_mode(math.inf)
+    context = _context()
+    booked = await book_travel(context)
+    cancelled = await cancel_travel_booking(context)
+    await book_travel(_context("session-b"))  # same traveler, another session: its own digest
+
+    assert "itinerary email" in booked["message"] and "itinerary email" in cancelled["message"]
+    assert digest == [] and notification_service.pending_digests("session-a") == {"traveler@example.com": 2}
+
+    assert await notification_service.flush_session("session-a") == 1
+    (to_email, subject, text), = digest
+    assert to_email == "traveler@example.com" and subject.startswith("Your Trip Itinerary")
+    assert "Booked: ₹750.00" in text and "Refunded: ₹750.00" in text and "Net: ₹0.00" in text
+    assert notification_service.pending_digests() == {"traveler@example.com": 1}
+
+
+@pytest.mark.asyncio
+async def test_session_digest_is_sent_at_its_max_age(digest):
+    _digest_mode(math.inf, max_age=0.05)
+    await book_travel(_context())
+    assert digest == []
+    await asyncio.sleep(0.2)
+    assert len(digest) == 1 and notification_service.pending_digests() == {}
+
+
+@pytest.mark.asyncio
+async def test_email_now_overrides_digest_and_timed_flush(digest):
+    _digest_mode(0.05)
+    context = _context()
+    booked = await book_travel(context, email_now=True)
+    assert "itinerary email" not in booked["message"] and len(digest) == 1
+    assert notification_service.pending_digests() == {}
+
+    await cancel_travel_booking(context)
+    assert len(digest) == 1
+    await asyncio.sleep(0.2)
+    assert len(digest) == 2 and digest[1][1].startswith("Your Trip Itinerary")
+
+
+@pytest.mark.asyncio
+async def test_failed_digest_is_kept_and_retried(digest, monkeypatch):
+    _digest_mode(math.inf)
+    monkeypatch.setattr(notifications, "DIGEST_RETRY_SECONDS", 0.05)
+    outcomes = iter([RuntimeError("SMTP down"), False, True])
+
+    def flaky_send(to_email, subject, html_body, text_body=""):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome:
+            digest.append(subject)
+        return outcome
+    monkeypatch.setattr(notification_service, "send_email", flaky_send)
+
+    await notification_service.send_booking_notification(
+        "traveler@example.com", "Asha", "Travel", {"price": 750}, "T-1"
+    )
+    assert await notification_service.flush_all() == 0
+    assert notification_service.pending_digests() == {"traveler@example.com": 1}
+
+    await asyncio.sleep(0.3)  # second attempt fails too, the third goes out
+    assert digest == ["Your Trip Itinerary - T-1"]
+    assert notification_service.pending_digests() == {}
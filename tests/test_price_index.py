@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+import pytest
+from trip_tools.price_index import extract_price_candidates, index_search_result, lookup_price
+from trip_tools.travel_tools import book_travel
+from trip_tools.accom_tools import book_accommodation
+
+RESULT = (
+    "Hotels in Jaipur: typically ₹1,500 to ₹6,000 per night.\n"
+    "Amber Fort (Jaipur): Hilltop fort. Entry fee: ₹200.\n"
+    "Delhi to Jaipur by flight (IndiGo): typically ₹3500, about 1h.\n"
+    "Delhi to Jaipur by train (Shatabdi Express): typically ₹750, about 4h 30m.\n"
+)
+
+
+def test_candidates_carry_kind_entity_and_unit():
+    candidates = extract_price_candidates(RESULT)
+    assert [(c["kind"], c["entity"]) for c in candidates] == [
+        ("accommodation", "jaipur"), ("sightseeing", "amber fort"),
+        ("travel", "delhi>jaipur"), ("travel", "delhi>jaipur"),
+    ]
+    assert candidates[0]["min"] == 1500 and candidates[0]["max"] == 6000
+    assert candidates[0]["unit"] == "night"
+
+
+def test_lookup_is_by_entity_and_survives_later_searches():
+    state = {}
+    index_search_result(state, RESULT)
+    index_search_result(state, "Hotels in Goa: typically ₹2000 per night.")
+
+    assert lookup_price(state, "travel", "Jaipur", "Delhi", "train")["min"] == 750
+    assert lookup_price(state, "sightseeing", "Jaipur")["min"] == 200
+    assert lookup_price(state, "accommodation", "Jaipur")["min"] == 1500
+    assert lookup_price(state, "accommodation", "Goa")["min"] == 2000
+    assert lookup_price({}, "travel", "Delhi", "Agra") is None
+
+
+@pytest.mark.asyncio
+async def test_booking_tools_use_the_indexed_price():
+    context = SimpleNamespace(state={
+        "travel_from": "Delhi", "travel_to": "Jaipur", "travel_date": "2025-12-01", "travel_mode": "train",
+        "accommodation_location": "Jaipur", "accommodation_nights": 2,
+    })
+    index_search_result(context.state, RESULT)
+
+    travel = await book_travel(context)
+    assert travel["travel_details"]["price"] == 750
+    await book_accommodation(context)
+    assert context.state["trip_plan"]["accommodation"]["total_price"] == 3000
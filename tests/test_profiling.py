@@ -0,0 +1,31 @@
+import time
+from core.profiling import SamplingProfiler
+from core.tracing import traced
+
+
+def _spin(seconds: float) -> int:
+    deadline, n = time.perf_counter() + seconds, 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+@traced("db", "profiling_probe")
+def _probe():
+    return _spin(0.2)
+
+
+def test_samples_are_attributed_to_the_instrumented_operation(tmp_path):
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start()
+    _probe()
+    profiler.stop()
+
+    stats = {row["operation"]: row for row in profiler.operation_stats()}
+    probe = stats["db:profiling_probe"]
+    assert probe["calls"] >= 1 and 100 < probe["self_ms"] < 400
+    assert probe["hottest"][0]["function"].endswith(":_spin")
+
+    collapsed, _ = profiler.write(str(tmp_path))
+    stack, count = open(collapsed).readline().rsplit(" ", 1)
+    assert ";db:profiling_probe;" in stack and int(count) > 0
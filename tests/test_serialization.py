@@ -0,0 +1,57 @@
+import json
+import pytest
+from core import serialization
+from core.db import DatabaseManager
+from core.serialization import get_serializer, decode, SERIALIZERS
+
+STATE = {
+    "user_name": "Traveler",
+    "trip_plan": {"travel": {"from": "Delhi", "to": "Jaipur", "price": 750}},
+    "interaction_history": [{"action": "user_query", "query": "₹500 per night?"}],
+}
+
+
+def _available_codecs():
+    names = []
+    for name in SERIALIZERS:
+        try:
+            get_serializer(name)
+            names.append(name)
+        except RuntimeError:
+            pass
+    return names
+
+
+@pytest.mark.parametrize("name", _available_codecs())
+def test_codec_roundtrip(name):
+    codec = get_serializer(name)
+    assert decode(codec.encode(STATE)) == STATE
+    assert json.loads(codec.encode_text(STATE)) == STATE
+
+
+def test_decode_legacy_and_empty_values():
+    assert decode(json.dumps(STATE)) == STATE
+    assert decode(json.dumps(STATE).encode("utf-8")) == STATE
+    assert decode(None) == {}
+    assert decode("") == {}
+
+
+def test_unknown_codec_rejected():
+    with pytest.raises(ValueError):
+        get_serializer("yaml")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", _available_codecs())
+async def test_rows_readable_after_codec_switch(tmp_path, monkeypatch, name):
+    """Rows written with one codec must stay readable after switching to another"""
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    user = await db.create_user(name="Codec", email="codec@example.com")
+
+    legacy = await db.create_session(user.user_id, initial_state=STATE)
+
+    monkeypatch.setattr(serialization, "state_serializer", get_serializer(name))
+    current = await db.create_session(user.user_id, initial_state=STATE)
+
+    assert (await db.get_session(legacy.session_id)).state == STATE
+    assert (await db.get_session(current.session_id)).state == STATE
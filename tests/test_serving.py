@@ -0,0 +1,216 @@
+import asyncio
+import pytest
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from core import serving
+from core.db import DatabaseManager
+from core.serving import SessionForbidden, SessionMultiplexer, ServerBusy, ServerDraining
+from core.session_locks import SessionLockRegistry
+from trip_tools.booking_events import rebuild, record_booking
+
+
+class FakeSessionService:
+    async def get_session(self, *, app_name, user_id, session_id):
+        return type("S", (), {"state": {}})()
+
+    async def create_session(self, *, app_name, user_id, state, session_id):
+        return type("S", (), {"state": state})()
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        pass
+
+
+class SlowRunner:
+    """Runner stand-in that records overlapping turns per session"""
+    app_name = "trip_planner"
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.session_service = FakeSessionService()
+        self.active = {}
+        self.max_overlap = 0
+        self.max_concurrent = 0
+
+    async def run_async(self, user_id, session_id, new_message):
+        self.active[session_id] = self.active.get(session_id, 0) + 1
+        self.max_overlap = max(self.max_overlap, self.active[session_id])
+        self.max_concurrent = max(self.max_concurrent, sum(self.active.values()))
+        try:
+            await asyncio.sleep(self.delay)
+            yield Event(author="agent", content=types.Content(
+                role="model", parts=[types.Part(text=new_message.parts[0].text)]))
+        finally:
+            self.active[session_id] -= 1
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(serving, "db_manager", DatabaseManager(db_path=str(tmp_path / "trip_planner.db")))
+
+
+@pytest.mark.asyncio
+async def test_turns_for_one_session_never_overlap():
+    runner = SlowRunner()
+    mux = SessionMultiplexer(runner, max_concurrent_turns=8)
+
+    results = await asyncio.gather(
+        *(mux.run_turn("u1", "session-a", f"msg {i}") for i in range(4)),
+        *(mux.run_turn("u2", "session-b", f"msg {i}") for i in range(4)),
+    )
+
+    assert runner.max_overlap == 1
+    assert runner.max_concurrent == 2
+    assert [r["response"] for r in results[:4]] == [f"msg {i}" for i in range(4)]
+    assert mux.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_backpressure_timeout_and_drain():
+    runner = SlowRunner(delay=0.05)
+    mux = SessionMultiplexer(runner, max_pending=1, turn_timeout=1.0)
+
+    first = asyncio.create_task(mux.run_turn("u1", "session-a", "hello"))
+    await asyncio.sleep(0)
+    with pytest.raises(ServerBusy):
+        await mux.run_turn("u2", "session-b", "rejected")
+
+    assert await mux.drain(timeout=1.0)
+    assert (await first)["response"] == "hello"
+    with pytest.raises(ServerDraining):
+        await mux.run_turn("u1", "session-a", "too late")
+
+    slow = SessionMultiplexer(SlowRunner(delay=0.5), turn_timeout=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        await slow.run_turn("u1", "session-a", "stuck")
+    assert slow.pending == 0
+
+
+class ChattyRunner(SlowRunner):
+    """Runner stand-in that answers with several quick events"""
+
+    async def run_async(self, user_id, session_id, new_message):
+        for word in new_message.parts[0].text.split():
+            await asyncio.sleep(0)
+            yield Event(author="agent", content=types.Content(role="model", parts=[types.Part(text=word)]))
+
+
+@pytest.mark.asyncio
+async def test_timeout_counts_only_time_spent_producing_chunks():
+    mux = SessionMultiplexer(ChattyRunner(), turn_timeout=0.05)
+    received = []
+    async for chunk in mux.stream_turn("u1", "session-a", "one two three"):
+        received.append(chunk.text)
+        await asyncio.sleep(0.04)  # a slow client, e.g. writer.drain()
+    assert received == ["one", "two", "three"] and mux.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_sessions_of_other_users_are_refused():
+    owner = await serving.db_manager.create_user(name="Owner")
+    session = await serving.db_manager.create_session(owner.user_id)
+    mux = SessionMultiplexer(SlowRunner())
+
+    with pytest.raises(SessionForbidden):
+        await mux.run_turn("someone-else", session.session_id, "show me their trip")
+    assert (await mux.run_turn(owner.user_id, session.session_id, "hello"))["response"] == "hello"
+    assert mux.pending == 0
+
+
+class DictSessionService:
+    """ADK session service stand-in that hands out its stored sessions"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    async def get_session(self, *, app_name, user_id, session_id):
+        return self.sessions.get(session_id)
+
+    async def create_session(self, *, app_name, user_id, state, session_id):
+        self.sessions[session_id] = type("S", (), {"state": state})()
+        return self.sessions[session_id]
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        self.sessions.pop(session_id, None)
+
+
+@pytest.mark.asyncio
+async def test_save_merges_only_what_the_turn_changed():
+    db = serving.db_manager
+    user = await db.create_user(name="Merger")
+    session = await db.create_session(user.user_id, initial_state={
+        "user_name": "Merger", "interaction_history": ["first"]})
+    runner = type("R", (), {"app_name": "trip_planner", "session_service": DictSessionService()})()
+    adk_state = (await serving.ensure_adk_session(runner, user.user_id, session.session_id)).state
+
+    def other_writer(state):  # e.g. another worker, while the turn runs
+        state["interaction_history"].append("other")
+        state["user_name"] = "Renamed elsewhere"
+    await db.mutate_session_state(session.session_id, other_writer)
+
+    adk_state["interaction_history"].append("mine")
+    adk_state["trip_plan"] = {"travel": {"price": 750}}
+    await serving.save_adk_state(runner, user.user_id, session.session_id)
+
+    stored = (await db.get_session(session.session_id)).state
+    assert stored["interaction_history"] == ["first", "other", "mine"]
+    assert stored["user_name"] == "Renamed elsewhere"
+    assert stored["trip_plan"] == {"travel": {"price": 750}}
+
+    await serving.save_adk_state(runner, user.user_id, session.session_id)  # nothing new this time
+    assert (await db.get_session(session.session_id)).state == stored
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_dropped_with_their_lock():
+    db = serving.db_manager
+    user = await db.create_user(name="Idle")
+    session = await db.create_session(user.user_id, initial_state={"user_name": "Idle"})
+    runner = SlowRunner(delay=0)
+    runner.session_service = DictSessionService()
+    locks = SessionLockRegistry(idle_ttl=0.0)
+    mux = SessionMultiplexer(runner, locks=locks)
+
+    await mux.run_turn(user.user_id, session.session_id, "hello")
+    assert session.session_id in serving._saved_states and session.session_id in runner.session_service.sessions
+
+    assert locks.evict_idle() == 1
+    await asyncio.sleep(0)
+    assert session.session_id not in serving._saved_states
+    assert session.session_id not in runner.session_service.sessions
+
+    await db.mutate_session_state(session.session_id, lambda state: {**state, "user_name": "Renamed"})
+    await mux.run_turn(user.user_id, session.session_id, "again")  # reloaded from the DB
+    assert runner.session_service.sessions[session.session_id].state["user_name"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_booking_events_leave_the_state_once_stored():
+    db = serving.db_manager
+    user = await db.create_user(name="Booker")
+    session = await db.create_session(user.user_id)
+    runner = type("R", (), {"app_name": "trip_planner", "session_service": InMemorySessionService()})()
+    await serving.ensure_adk_session(runner, user.user_id, session.session_id)
+
+    for price in (750, 900):  # two turns, each booking travel through a state delta as a tool would
+        adk_session = await runner.session_service.get_session(
+            app_name="trip_planner", user_id=user.user_id, session_id=session.session_id)
+        state = dict(adk_session.state)
+        record_booking(state, "travel", {"ticket_id": f"T-{price}", "price": price})
+        await runner.session_service.append_event(adk_session, Event(author="travel_agent", actions=EventActions(
+            state_delta={key: state[key] for key in ("booking_events", "booking_event_seq", "trip_plan")})))
+        await serving.save_adk_state(runner, user.user_id, session.session_id)
+
+    adk_state = (await runner.session_service.get_session(
+        app_name="trip_planner", user_id=user.user_id, session_id=session.session_id)).state
+    stored = (await db.get_session(session.session_id)).state
+    assert adk_state["booking_events"] == stored["booking_events"] == []
+    assert stored["booking_event_seq"] == 2 and stored["trip_plan"]["travel"]["ticket_id"] == "T-900"
+    log = await db.get_session_event_log(session.session_id)
+    assert [(e["seq"], e["event_type"], e["booking_id"]) for e in log] == [(0, "booked", "T-750"),
+                                                                          (1, "modified", "T-900")]
+    assert await db.get_session_bill(session.session_id) == 900
+
+    rebuilt = {"trip_plan": {}}
+    rebuild(rebuilt, log)
+    assert rebuilt["trip_plan"] == stored["trip_plan"] and rebuilt["booking_totals"]["total"] == 900
@@ -0,0 +1,39 @@
+import pytest
+from core.db import DatabaseManager
+
+STATE = {"user_name": "Warm", "interaction_history": [{"action": "user_query", "query": "Jaipur?"}]}
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_isolated_and_revalidated(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    db = DatabaseManager(db_path=path)
+    other_worker = DatabaseManager(db_path=path)
+    user = await db.create_user(name="Warm", email="warm@example.com")
+    session_id = (await db.create_session(user.user_id, initial_state=STATE)).session_id
+
+    first = await db.get_session(session_id)
+    first.state["interaction_history"].append("local edit, never written")
+    assert (await db.get_session(session_id)).state == STATE
+    assert db.session_cache.hits == 1
+
+    await other_worker.update_session_state(session_id, {**STATE, "user_name": "Changed"})
+    assert (await db.get_session(session_id)).state["user_name"] == "Changed"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_prewarms_cache_and_skips_stale_sessions(tmp_path):
+    path = str(tmp_path / "trip_planner.db")
+    snapshot = str(tmp_path / "sessions.snap")
+    db = DatabaseManager(db_path=path)
+    user = await db.create_user(name="Warm", email="warm@example.com")
+    ids = [(await db.create_session(user.user_id, initial_state={**STATE, "n": i})).session_id for i in range(4)]
+
+    assert (await db.save_session_snapshot(snapshot, limit=3))["sessions"] == 3
+    await db.update_session_state(ids[-1], {"changed": True})  # newest one moves on after the snapshot
+
+    restarted = DatabaseManager(db_path=path)
+    assert await restarted.load_session_snapshot(snapshot) == {"loaded": 2, "stale": 1}
+    assert (await restarted.get_session(ids[1])).state == {**STATE, "n": 1}
+    assert (await restarted.get_session(ids[-1])).state == {"changed": True}
+    assert restarted.session_cache.stats()["hits"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from adk_db_check import ADKDatabaseBridge
+from core.db import DatabaseManager, SessionVersionConflict
+from core.serialization import encode_state
+from core.session_locks import SessionLockRegistry
+
+
+@pytest_asyncio.fixture
+async def db_and_session(tmp_path):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    user = await db.create_user(name="Concurrent", email="concurrent@example.com")
+    session = await db.create_session(user.user_id, initial_state={"interaction_history": []})
+    return db, session.session_id
+
+
+@pytest.mark.asyncio
+async def test_stale_version_write_is_rejected(db_and_session):
+    db, session_id = db_and_session
+    first = await db.get_session(session_id)
+    second = await db.get_session(session_id)
+
+    first.state["user_name"] = "First"
+    await db.update_session(first)
+    assert first.version == second.version + 1
+
+    second.state["user_name"] = "Second"
+    with pytest.raises(SessionVersionConflict):
+        await db.update_session(second)
+    assert (await db.get_session(session_id)).state["user_name"] == "First"
+
+
+@pytest.mark.asyncio
+async def test_mutate_retries_instead_of_losing_updates(db_and_session):
+    db, session_id = db_and_session
+    calls = []
+
+    def append_mine(state):
+        if not calls:
+            # Another worker process commits between our read and our write
+            with db._get_connection() as conn:
+                conn.execute(
+                    "UPDATE sessions SET state = ?, version = version + 1 WHERE session_id = ?",
+                    (encode_state({"interaction_history": ["other"]}), session_id)
+                )
+        calls.append(state)
+        state["interaction_history"].append("mine")
+
+    session = await db.mutate_session_state(session_id, append_mine)
+
+    assert len(calls) == 2
+    assert session.state["interaction_history"] == ["other", "mine"]
+    assert (await db.get_session(session_id)).version == 2
+
+
+@pytest.mark.asyncio
+async def test_mutate_refreshes_last_active(db_and_session):
+    db, session_id = db_and_session
+    with db._get_connection() as conn:
+        conn.execute("UPDATE sessions SET last_active = '2025-01-01T00:00:00+00:00' WHERE session_id = ?",
+                     (session_id,))
+    db.session_cache.invalidate(session_id)
+    before = (await db.get_session(session_id)).last_active
+
+    session = await db.mutate_session_state(session_id, lambda state: {**state, "user_name": "Asha"})
+
+    stored = await db.get_session(session_id)
+    assert stored.version == session.version == 1
+    assert stored.last_active > before and stored.last_active == session.last_active
+
+
+@pytest.mark.asyncio
+async def test_bridge_sync_keeps_concurrent_changes(db_and_session):
+    db, session_id = db_and_session
+    bridge = ADKDatabaseBridge()
+    bridge.db = db
+    await db.mutate_session_state(session_id, lambda state: {**state, "user_email": "concurrent@example.com",
+                                                             "travel_to": "Jaipur", "travel_date": "2025-12-01"})
+
+    base = await bridge.load_session_state(session_id)
+    state = {**base, "travel_to": "Udaipur"}
+    del state["travel_date"]
+    # Another turn changes the same session before this one is synced
+    await db.mutate_session_state(session_id, lambda stored: {**stored, "user_name": "Other"})
+
+    assert await bridge.sync_session_from_adk("trip_planner", "u", session_id, state, base)
+    stored = (await db.get_session(session_id)).state
+    assert stored["user_name"] == "Other" and stored["travel_to"] == "Udaipur"
+    assert "travel_date" not in stored
+
+
+@pytest.mark.asyncio
+async def test_lock_registry_serializes_and_evicts_idle_locks():
+    locks = SessionLockRegistry(idle_ttl=0.0)
+    order = []
+
+    async def turn(name):
+        async with locks.hold("session-a"):
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-end")
+
+    await asyncio.gather(turn("a"), turn("b"))
+    assert order == ["a-start", "a-end", "b-start", "b-end"]
+
+    async with locks.hold("session-b"):
+        assert locks.evict_idle() == 1  # session-a is idle, session-b is held
+        assert len(locks) == 1
+    assert locks.evict_idle() == 1
+    assert len(locks) == 0
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+from core import utils
+from core.db import DatabaseManager
+from core.utils import TurnMetrics, call_agent, stream_agent_response
+
+
+class FakeSessionService:
+    def __init__(self, state):
+        self.state = state
+        self.lookups = 0
+
+    async def get_session(self, *, app_name, user_id, session_id):
+        self.lookups += 1
+        return type("S", (), {"state": dict(self.state)})()
+
+
+class FakeRunner:
+    app_name = "trip_planner"
+
+    def __init__(self, events, state=None):
+        self.events = events
+        self.session_service = FakeSessionService(state or {})
+
+    async def run_async(self, user_id, session_id, new_message):
+        for event in self.events:
+            yield event
+
+
+def _text_event(author, text):
+    return Event(author=author, content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _booking_event(travel):
+    response = types.Part(function_response=types.FunctionResponse(
+        name="book_travel",
+        response={"status": "success", "message": "Travel booked", "travel_details": travel},
+    ))
+    return Event(
+        author="travel_agent",
+        content=types.Content(role="user", parts=[response]),
+        actions=EventActions(state_delta={"trip_plan": {"travel": travel}}),
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_text_and_formatted_booking_incrementally():
+    travel = {"from": "Delhi", "to": "Jaipur", "date": "2025-12-28", "mode": "train",
+              "price": 750, "ticket_id": "PNR-ABC123"}
+    runner = FakeRunner([
+        _text_event("trip_supervisor", "Let me book that."),
+        _booking_event(travel),
+        _text_event("travel_agent", "All done!"),
+    ])
+    metrics = TurnMetrics()
+
+    chunks = [c async for c in stream_agent_response(runner, "u1", "session-1", "book it", metrics)]
+
+    assert [c.kind for c in chunks] == ["text", "booking", "text"]
+    assert "Train booked from Delhi to Jaipur" in chunks[1].text
+    assert "PNR-ABC123" in chunks[1].text
+    assert runner.session_service.lookups == 1
+    assert metrics.events == 3 and metrics.chunks == 3
+    assert metrics.time_to_first_token is not None
+    assert metrics.total_latency >= metrics.time_to_first_token
+
+
+@pytest.mark.asyncio
+async def test_cancelled_prompt_does_not_swallow_the_next_line(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setattr(utils.sys, "stdin", os.fdopen(read_fd))
+    monkeypatch.setattr(utils, "_stdin_reader", utils._StdinReader())
+
+    abandoned = asyncio.create_task(utils.async_input())
+    await asyncio.sleep(0.01)
+    abandoned.cancel()
+    os.write(write_fd, b"first\nsecond\n")
+    assert await utils.async_input() == "first"
+    assert await utils.async_input() == "second"
+
+    os.close(write_fd)
+    for _ in range(2):
+        with pytest.raises(EOFError):
+            await utils.async_input()
+
+
+@pytest.mark.asyncio
+async def test_call_agent_records_the_reply_in_history(tmp_path, monkeypatch, capsys):
+    db = DatabaseManager(db_path=str(tmp_path / "trip_planner.db"))
+    monkeypatch.setattr(utils, "db_manager", db)
+    user = await db.create_user(name="Streamer", email="streamer@example.com")
+    session = await db.create_session(user.user_id, initial_state={"interaction_history": []})
+    runner = FakeRunner([_text_event("trip_supervisor", "Hello"), _text_event("trip_supervisor", "there")])
+
+    await utils.add_user_query_to_history(session.session_id, "hi")
+    metrics = await call_agent(runner, user.user_id, session.session_id, "hi")
+
+    assert metrics is not None and "Hello" in capsys.readouterr().out
+    history = (await db.get_session(session.session_id)).state["interaction_history"]
+    assert [entry["action"] for entry in history] == ["user_query", "agent_response"]
+    assert history[1]["response"] == "Hello\nthere" and history[1]["agent"] == "trip_supervisor"
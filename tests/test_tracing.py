@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from core.tracing import JsonLinesExporter, load_spans, summarize, traced, tracer
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer.configure(JsonLinesExporter(str(path)))
+    yield path
+    tracer.configure(None)
+
+
+@traced("db")
+async def _query():
+    await asyncio.sleep(0.01)
+    return "row"
+
+
+@traced("tool")
+async def _tool():
+    return await _query()
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_under_the_turn(trace_file):
+    with tracer.span("turn", "turn", session_id="s1"):
+        assert await _tool() == "row"
+    spans = {s["name"]: s for s in load_spans(str(trace_file))}
+
+    turn, tool, query = spans["turn"], spans["_tool"], spans["_query"]
+    assert tool["parent_id"] == turn["span_id"] and query["parent_id"] == tool["span_id"]
+    assert {s["trace_id"] for s in spans.values()} == {turn["trace_id"]}
+    assert {s["session_id"] for s in spans.values()} == {"s1"}
+
+    rows = {r["name"]: r for r in summarize(list(spans.values()))["rows"]}
+    assert rows["_query"]["self_ms"] >= 10
+    assert rows["_tool"]["self_ms"] < rows["_query"]["self_ms"]
+
+
+def test_ending_the_turn_closes_open_children(trace_file):
+    turn = tracer.start_span("turn", "turn", session_id="s1")
+    tracer.start_span("travel_agent", "agent")  # its after-callback never ran
+    tracer.end_span(turn, "error: ClientError")
+
+    spans = {s["name"]: s for s in load_spans(str(trace_file))}
+    assert spans["travel_agent"]["status"] == "error: ClientError"
+    assert tracer.current() is None
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracer_records_nothing(tmp_path):
+    assert not tracer.enabled
+    assert await _tool() == "row"
+    assert tracer.current() is None
@@ -1,3 +1,8 @@
-from google.adk.tools import google_search
+def __getattr__(name):
+    # google.adk.tools is heavy; only import it when google_search is actually used
+    if name == "google_search":
+        from google.adk.tools import google_search
+        return google_search
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = ["google_search"]
\ No newline at end of file
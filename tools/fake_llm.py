@@ -0,0 +1,219 @@
+"""
+Offline, deterministic stand-in for Gemini
+
+Selected with ``TRIP_MODEL_BACKEND=fake`` (see ``tools.llm_interface``).
+Every agent then gets a ``FakeLlm`` instead of a Gemini model name and
+``query_llm`` answers from the same backend, so the whole orchestration
+layer (supervisor, transfers, tools, state, DB) runs without network access
+or ``GOOGLE_API_KEY``.
+
+Replies are scripted: the user message picks a ``ScriptedTurn`` by regex and
+each model call in that turn emits its next step (a tool call, usually
+starting with ``transfer_to_agent``). A turn ends with a text reply once its
+steps run out, or when the step's tool isn't available to the agent being
+asked. The same message always produces the same tool sequence and text.
+
+Latency and failures are drawn from a seeded RNG: fixed, uniform or
+lognormal latency, plus 429 / 503 errors raised as the same
+``google.genai.errors`` exceptions the real client raises.
+
+Environment (all optional):
+    TRIP_FAKE_LLM_LATENCY_MS       mean latency per model call (default 50)
+    TRIP_FAKE_LLM_JITTER_MS        uniform half-width / lognormal standard deviation (default 0)
+    TRIP_FAKE_LLM_DISTRIBUTION     fixed | uniform | lognormal (default fixed)
+    TRIP_FAKE_LLM_RATE_429         fraction of calls failing with 429 (default 0)
+    TRIP_FAKE_LLM_RATE_503         fraction of calls failing with 503 (default 0)
+    TRIP_FAKE_LLM_SEED             RNG seed (default 0)
+"""
+import asyncio
+import math
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional, Sequence, Tuple
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+
+AGENT_NAME_RE = re.compile(r'Your internal name is "([^"]+)"')
+# Prompts ADK adds itself; they are not what the user said
+SYNTHETIC_USER_TEXT = ("Continue processing previous requests", "Handle the requests")
+
+
+@dataclass
+class FakeModelConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    distribution: str = "fixed"
+    rate_429: float = 0.0
+    rate_503: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeModelConfig":
+        return cls(
+            latency_ms=float(os.getenv("TRIP_FAKE_LLM_LATENCY_MS", "50")),
+            jitter_ms=float(os.getenv("TRIP_FAKE_LLM_JITTER_MS", "0")),
+            distribution=os.getenv("TRIP_FAKE_LLM_DISTRIBUTION", "fixed"),
+            rate_429=float(os.getenv("TRIP_FAKE_LLM_RATE_429", "0")),
+            rate_503=float(os.getenv("TRIP_FAKE_LLM_RATE_503", "0")),
+            seed=int(os.getenv("TRIP_FAKE_LLM_SEED", "0")),
+        )
+
+
+@dataclass(frozen=True)
+class ScriptedTurn:
+    pattern: str
+    # (tool name, args); "{message}" in a string arg is replaced by the user message
+    steps: Sequence[Tuple[str, Dict]] = ()
+    reply: str = "Done. Anything else for your trip?"
+
+
+DEFAULT_SCRIPT: Tuple[ScriptedTurn, ...] = (
+    ScriptedTurn(r"@", (("identify_user", {"user_input": "{message}"}),),
+                 "Thanks! What name should I put on the bookings?"),
+    ScriptedTurn(r"\b(?:my name is|i am|i'm|name:)\b", (("identify_user", {"user_input": "{message}"}),),
+                 "Welcome! Where would you like to go?"),
+    ScriptedTurn(r"\bcancel\b.*\btrip\b", (("cancel_trip", {}),), "Your trip is cancelled."),
+    ScriptedTurn(r"\b(?:train|flight|bus|cab|ferry)\b", (
+        ("transfer_to_agent", {"agent_name": "travel_agent"}),
+        ("parse_travel_details", {"user_input": "{message}"}),
+        ("check_travel_state", {}),
+        ("book_travel", {}),
+    ), "Your travel is booked."),
+    ScriptedTurn(r"\b(?:hotel|stay|accommodation|room)\b", (
+        ("transfer_to_agent", {"agent_name": "accommodation_agent"}),
+        ("parse_accommodation_details", {"user_input": "{message}"}),
+        ("book_accommodation", {}),
+    ), "Your stay is booked."),
+    ScriptedTurn(r"\b(?:sightseeing|tour|visit)\b", (
+        ("transfer_to_agent", {"agent_name": "sightseeing_agent"}),
+        ("parse_sightseeing_details", {"user_input": "{message}"}),
+        ("book_sightseeing", {}),
+    ), "Your sightseeing is booked."),
+    ScriptedTurn(r"\b(?:bill|total|cost)\b", (
+        ("transfer_to_agent", {"agent_name": "billing_agent"}),
+        ("calculate_trip_bill", {}),
+    ), "Here is your bill."),
+    # Anything else is a general question
+    ScriptedTurn(r".", (
+        ("transfer_to_agent", {"agent_name": "conversation_agent"}),
+        ("search_and_store", {"query": "{message}"}),
+    ), "Here is what I found."),
+)
+
+
+@dataclass
+class FakeModelStats:
+    calls: int = 0
+    tool_calls: int = 0
+    text_replies: int = 0
+    errors: Dict[int, int] = field(default_factory=dict)
+    latency_total: float = 0.0
+
+
+class FakeBackend:
+    """Shared script, RNG and counters for every FakeLlm and for query_llm"""
+
+    def __init__(self, config: Optional[FakeModelConfig] = None,
+                 script: Sequence[ScriptedTurn] = DEFAULT_SCRIPT):
+        self.configure(config or FakeModelConfig.from_env(), script)
+
+    def configure(self, config: FakeModelConfig, script: Optional[Sequence[ScriptedTurn]] = None) -> None:
+        """Swap config (and optionally script) and reset the RNG and counters"""
+        self.config = config
+        if script is not None:
+            self.script = [(re.compile(turn.pattern, re.IGNORECASE), turn) for turn in script]
+        self.rng = random.Random(config.seed)
+        self.stats = FakeModelStats()
+
+    def _latency(self) -> float:
+        cfg = self.config
+        if cfg.distribution == "uniform":
+            ms = self.rng.uniform(cfg.latency_ms - cfg.jitter_ms, cfg.latency_ms + cfg.jitter_ms)
+        elif cfg.distribution == "lognormal" and cfg.latency_ms > 0:
+            # Parameterised so the mean is latency_ms and jitter_ms is the standard deviation
+            sigma2 = math.log(1 + (cfg.jitter_ms / cfg.latency_ms) ** 2)
+            ms = self.rng.lognormvariate(math.log(cfg.latency_ms) - sigma2 / 2, math.sqrt(sigma2))
+        else:
+            ms = cfg.latency_ms
+        return max(0.0, ms) / 1000
+
+    async def simulate_call(self) -> None:
+        """Sleep for one call's latency, then maybe fail like the real API"""
+        self.stats.calls += 1
+        latency = self._latency()
+        self.stats.latency_total += latency
+        await asyncio.sleep(latency)
+
+        roll = self.rng.random()
+        if roll < self.config.rate_429:
+            self.stats.errors[429] = self.stats.errors.get(429, 0) + 1
+            raise errors.ClientError(429, {"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Resource has been exhausted (fake)"}})
+        if roll < self.config.rate_429 + self.config.rate_503:
+            self.stats.errors[503] = self.stats.errors.get(503, 0) + 1
+            raise errors.ServerError(503, {"error": {
+                "code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded (fake)"}})
+
+    def turn_for(self, message: str) -> ScriptedTurn:
+        return next((turn for pattern, turn in self.script if pattern.search(message)), ScriptedTurn(""))
+
+    def next_step(self, llm_request: LlmRequest) -> types.Content:
+        """The scripted model reply for this point of the turn"""
+        message, steps_taken, last_result = _turn_progress(llm_request.contents)
+        turn = self.turn_for(message)
+        if steps_taken < len(turn.steps):
+            name, args = turn.steps[steps_taken]
+            if name in llm_request.tools_dict:
+                self.stats.tool_calls += 1
+                args = {k: v.replace("{message}", message) if isinstance(v, str) else v for k, v in args.items()}
+                return types.Content(role="model", parts=[
+                    types.Part(function_call=types.FunctionCall(name=name, args=args))
+                ])
+
+        self.stats.text_replies += 1
+        agent = AGENT_NAME_RE.search(str(llm_request.config.system_instruction or ""))
+        detail = f" ({last_result})" if last_result else ""
+        text = f"[{agent.group(1) if agent else 'model'}] {turn.reply}{detail}"
+        return types.Content(role="model", parts=[types.Part(text=text)])
+
+    async def generate_text(self, prompt: str) -> str:
+        await self.simulate_call()
+        self.stats.text_replies += 1
+        return f"Simulated answer for: {prompt[:120]}"
+
+
+def _turn_progress(contents: List[types.Content]) -> Tuple[str, int, Optional[str]]:
+    """(latest real user message, tool calls made since it, last tool result message)"""
+    message, steps, last_result = "", 0, None
+    for content in contents:
+        parts = content.parts or []
+        # Other agents' events arrive as user text starting with "For context:"
+        relayed = bool(parts and parts[0].text and parts[0].text.startswith("For context:"))
+        for part in parts:
+            if part.function_call or (relayed and part.text and "called tool `" in part.text):
+                steps += 1
+            elif (content.role == "user" and not relayed and part.text
+                  and not part.text.startswith(SYNTHETIC_USER_TEXT)):
+                message, steps, last_result = part.text, 0, None
+            elif part.function_response:
+                response = part.function_response.response or {}
+                last_result = str(response.get("message") or response.get("result") or "")[:200] or None
+    return message, steps, last_result
+
+
+class FakeLlm(BaseLlm):
+    """BaseLlm answering from the shared FakeBackend; ``model`` keeps the Gemini name tools check for"""
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await fake_backend.simulate_call()
+        yield LlmResponse(content=fake_backend.next_step(llm_request))
+
+
+# Global backend shared by every FakeLlm instance
+fake_backend = FakeBackend()
@@ -1,22 +1,44 @@
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
 
-load_dotenv()
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 MODEL_NAME = os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash")
 
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY not set in environment variables.")
+def use_fake_backend() -> bool:
+    """``TRIP_MODEL_BACKEND=fake`` swaps Gemini for the offline scripted model (tools/fake_llm.py)"""
+    return os.getenv("TRIP_MODEL_BACKEND", "gemini").lower() == "fake"
+
+def resolve_model(name: str):
+    """Model for an agent: the Gemini model name, or a FakeLlm standing in for it"""
+    if use_fake_backend():
+        from tools.fake_llm import FakeLlm
+        return FakeLlm(model=name)
+    return name
+
+_model = None
+
+def get_model():
+    """Configure genai and build the model on first use (not at import)"""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
 
-genai.configure(api_key=GOOGLE_API_KEY)
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not set in environment variables.")
 
-model = genai.GenerativeModel(MODEL_NAME)
+        genai.configure(api_key=api_key)
+        _model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", MODEL_NAME))
+    return _model
 
 async def query_llm(prompt: str, context: str = "") -> str:
     try:
-        response = await model.generate_content_async([context, prompt] if context else prompt)
+        if use_fake_backend():
+            from tools.fake_llm import fake_backend
+            return await fake_backend.generate_text(prompt)
+        response = await get_model().generate_content_async([context, prompt] if context else prompt)
         return response.text.strip()
     except Exception as e:
+        from core.metrics import model_errors
+        model_errors.labels(str(getattr(e, "code", None) or type(e).__name__)).inc()
         return f"LLM Error: {str(e)}"
\ No newline at end of file
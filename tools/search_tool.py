@@ -1,17 +1,23 @@
 from google.adk.agents import Agent
 from google.adk.tools import google_search
 from google.adk.tools.tool_context import ToolContext
-from tools.llm_interface import query_llm  
+from core.knowledge_base import knowledge_base
+from tools.llm_interface import query_llm, resolve_model  
 
 search_agent = Agent(
     name="search_agent",
-    model="gemini-2.0-flash",
+    model=resolve_model("gemini-2.0-flash"),
     description="Search agent using google_search tool for real-time info",
     instruction="Use the 'google_search' tool only to find real-time info about hotels, travel, or sightseeing.",
     tools=[google_search]
 )
 
 async def perform_search(tool_context: ToolContext, query: str):
+    # Common destination questions are answered locally without a model call
+    answer = knowledge_base.answer(query)
+    if answer:
+        return {"output": answer, "source": "knowledge_base"}
+
     try:
         result = await search_agent.run(input=query, tool_context=tool_context)
         return {"output": result}
@@ -32,6 +32,12 @@ from .sightseeing_tools import (
     cancel_sightseeing_booking
 )
 
+# Batch tools
+from .batch_tools import (
+    book_itinerary,
+    cancel_trip
+)
+
 # Conversation tools
 from .convo_tools import search_and_store
 
@@ -82,6 +88,10 @@ __all__ = [
     'book_sightseeing',
     'cancel_sightseeing_booking',
     
+    # Batch
+    'book_itinerary',
+    'cancel_trip',
+    
     # Conflict checking
     'check_conflicts',           # ✅ MAIN FUNCTION
     'check_trip_conflicts',
@@ -9,6 +9,9 @@ from loguru import logger
 
 # ✅ IMPORT NOTIFICATION SERVICE
 from core.notifications import notification_service
+from .booking_events import record_booking, record_cancellation
+from .idempotency import find_duplicate, remember_booking
+from .price_index import lookup_price
 
 
 def parse_accommodation_details(tool_context: ToolContext, user_input: str) -> dict:
@@ -186,16 +189,24 @@ def check_accommodation_state(tool_context: ToolContext) -> dict:
         }
 
 
-async def book_accommodation(tool_context: ToolContext) -> dict:
-    """Book accommodation with email notification and improved cost calculation."""
-    trip_plan = tool_context.state.get("trip_plan", {})
+def accommodation_request(state) -> dict:
+    """The state fields an accommodation booking is made from (its idempotency key)"""
+    return {
+        "location": state.get("accommodation_location", "your selected location"),
+        "check_in": state.get("accommodation_check_in"), "check_out": state.get("accommodation_check_out"),
+        "budget": state.get("accommodation_budget", 0), "total_price": state.get("accommodation_total_price"),
+        "nights": state.get("accommodation_nights"),
+    }
+
 
-    check_in = tool_context.state.get("accommodation_check_in")
-    check_out = tool_context.state.get("accommodation_check_out")
-    location = tool_context.state.get("accommodation_location", "your selected location")
-    price_per_night = tool_context.state.get("accommodation_budget", 0)
-    total_price = tool_context.state.get("accommodation_total_price")
-    nights_from_user = tool_context.state.get("accommodation_nights")
+def prepare_accommodation_booking(state) -> dict:
+    """Work out nights and cost and assign a booking ID from the state, without recording it"""
+    check_in = state.get("accommodation_check_in")
+    check_out = state.get("accommodation_check_out")
+    location = state.get("accommodation_location", "your selected location")
+    price_per_night = state.get("accommodation_budget", 0)
+    total_price = state.get("accommodation_total_price")
+    nights_from_user = state.get("accommodation_nights")
 
     # ✅ IMPROVED: Calculate nights accurately
     if check_in and check_out:
@@ -221,11 +232,13 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
             total_price = price_per_night * nights
             logger.info(f"✅ Calculated total: ₹{price_per_night} × {nights} nights = ₹{total_price}")
         else:
-            # Try to extract from conversation
-            conversation_result = tool_context.state.get("conversation_result", "")
-            price_match = re.search(r'₹\s*(\d+)', conversation_result)
-            if price_match:
-                price_per_night = int(price_match.group(1))
+            # Fall back to the prices indexed from the last searches
+            candidate = lookup_price(state, "accommodation", state.get("accommodation_location"))
+            if candidate and candidate["unit"] == "total":
+                total_price = candidate["min"]
+                price_per_night = total_price // nights
+            elif candidate:
+                price_per_night = candidate["min"]
                 total_price = price_per_night * nights
             else:
                 price_per_night = 0
@@ -241,7 +254,7 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
     date_code = check_in.replace("-", "") if check_in else datetime.now().strftime("%Y%m%d")
     booking_id = f"HTL-{location_code}-{date_code}-{str(uuid.uuid4())[:8].upper()}"
 
-    accommodation = {
+    return {
         "location": location,
         "check_in": check_in,
         "check_out": check_out,
@@ -251,8 +264,27 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
         "booking_id": booking_id
     }
 
-    trip_plan["accommodation"] = accommodation
-    tool_context.state.update({"trip_plan": trip_plan})
+
+async def book_accommodation(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Book accommodation with email notification and improved cost calculation.
+
+    Args:
+        email_now: Send this confirmation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
+    # A retried call for the same stay gets the original booking back
+    dedup_key, duplicate = find_duplicate(tool_context.state, "accommodation",
+                                          accommodation_request(tool_context.state))
+    if duplicate:
+        return duplicate
+
+    accommodation = prepare_accommodation_booking(tool_context.state)
+    location, check_in, check_out = accommodation["location"], accommodation["check_in"], accommodation["check_out"]
+    nights, price_per_night = accommodation["nights"], accommodation["budget"]
+    total_price, booking_id = accommodation["total_price"], accommodation["booking_id"]
+
+    record_booking(tool_context.state, "accommodation", accommodation)
     
     # ✅ SEND EMAIL NOTIFICATION
     user_email = tool_context.state.get("user_email")
@@ -269,12 +301,16 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
                 user_name=user_name,
                 booking_type="Accommodation",
                 booking_details=accommodation,
-                booking_id=booking_id
+                booking_id=booking_id,
+                immediate=email_now,
+                session_id=tool_context.state.get("session_id")
             )
             
             if results["email_sent"]:
                 notification_msg = f"\n\n📧 **Confirmation email sent to {user_email}**"
                 logger.info(f"✅ Accommodation email sent to {user_email}")
+            elif results.get("queued"):
+                notification_msg = f"\n\n📬 **Confirmation will be included in your itinerary email to {user_email}**"
             else:
                 notification_msg = f"\n\n⚠️ **Email notification failed**"
                 logger.warning(f"❌ Accommodation email failed for {user_email}")
@@ -292,7 +328,7 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
     else:
         price_info = "💰 Price to be confirmed"
 
-    return {
+    result = {
         "action": "book_accommodation",
         "status": "success",
         "message": (
@@ -306,11 +342,19 @@ async def book_accommodation(tool_context: ToolContext) -> dict:
         ),
         "accommodation_details": accommodation
     }
+    remember_booking(tool_context.state, dedup_key, result)
+    return result
 
 
 # ✅ NEW: CANCEL ACCOMMODATION BOOKING
-async def cancel_accommodation_booking(tool_context: ToolContext) -> dict:
-    """Cancel accommodation booking with email notification"""
+async def cancel_accommodation_booking(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Cancel accommodation booking with email notification
+
+    Args:
+        email_now: Send this cancellation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
     try:
         trip_plan = tool_context.state.get("trip_plan", {})
         
@@ -325,18 +369,7 @@ async def cancel_accommodation_booking(tool_context: ToolContext) -> dict:
         booking_id = accommodation.get('booking_id', 'N/A')
         total_price = accommodation.get('total_price', 0)
         
-        # Store in cancelled history
-        cancelled_bookings = tool_context.state.get("cancelled_bookings", [])
-        cancelled_bookings.append({
-            "type": "accommodation",
-            "booking_id": booking_id,
-            "details": accommodation,
-            "cancelled_at": datetime.now().isoformat()
-        })
-        tool_context.state["cancelled_bookings"] = cancelled_bookings
-        
-        del trip_plan['accommodation']
-        tool_context.state["trip_plan"] = trip_plan
+        record_cancellation(tool_context.state, "accommodation", accommodation)
         
         user_email = tool_context.state.get("user_email")
         user_name = tool_context.state.get("user_name", "Guest")
@@ -358,11 +391,15 @@ async def cancel_accommodation_booking(tool_context: ToolContext) -> dict:
                     user_name=user_name,
                     booking_type="ACCOMMODATION - CANCELLED",
                     booking_details=cancellation_details,
-                    booking_id=booking_id
+                    booking_id=booking_id,
+                    immediate=email_now,
+                    session_id=tool_context.state.get("session_id")
                 )
                 
                 if results["email_sent"]:
                     notification_msg = f"\n\n📧 **Cancellation confirmation sent to {user_email}**"
+                elif results.get("queued"):
+                    notification_msg = f"\n\n📬 **Cancellation will be included in your itinerary email to {user_email}**"
                 else:
                     notification_msg = f"\n\n⚠️ **Email notification failed**"
                     
@@ -0,0 +1,207 @@
+"""
+Batch booking tools: book a whole itinerary or cancel a whole trip in one call
+
+Booking or cancelling item by item costs one tool call, one set of state
+writes and one SMTP session per item. ``book_itinerary`` and ``cancel_trip``
+handle every item in a single call:
+
+- all bookings are prepared first, and nothing is recorded unless every one
+  succeeds; the booking events are then recorded together, so the turn ends
+  with one state update and one ``booking_events`` append transaction
+- one consolidated email covers all items
+"""
+from google.adk.tools.tool_context import ToolContext
+from loguru import logger
+
+from core.notifications import notification_service
+from .accom_tools import accommodation_request, check_accommodation_state, prepare_accommodation_booking
+from .booking_events import billed_amount, record_booking, record_cancellation
+from .idempotency import BOOKING_IDS, find_duplicate, remember_booking
+from .sightseeing_tools import check_sightseeing_state, prepare_sightseeing_booking, sightseeing_request
+from .travel_tools import check_travel_state, prepare_travel_booking, travel_request
+
+# booking type -> (label, readiness check, idempotency key params, booking preparation)
+BOOKERS = {
+    "travel": ("Travel", check_travel_state, travel_request, prepare_travel_booking),
+    "accommodation": ("Accommodation", check_accommodation_state, accommodation_request,
+                      prepare_accommodation_booking),
+    "sightseeing": ("Sightseeing", check_sightseeing_state, sightseeing_request, prepare_sightseeing_booking),
+}
+
+
+def _summary_item(booking_type: str, details: dict, **extra) -> dict:
+    _, id_key = BOOKING_IDS[booking_type]
+    return {
+        "booking_type": BOOKERS[booking_type][0],
+        "booking_id": details.get(id_key, "N/A"),
+        "details": {**details, **extra},
+    }
+
+
+async def _notify(tool_context: ToolContext, title: str, items: list, default_name: str,
+                  immediate: bool = False) -> str:
+    """Send the consolidated email; returns the line for the tool's message"""
+    user_email = tool_context.state.get("user_email")
+    if not user_email:
+        logger.warning("ℹ️ No user_email in state - skipping email notification")
+        return "\n\n⚠️ **No email address provided**"
+    try:
+        results = await notification_service.send_summary_notification(
+            user_email=user_email,
+            user_name=tool_context.state.get("user_name", default_name),
+            title=title,
+            items=items,
+            immediate=immediate,
+            session_id=tool_context.state.get("session_id")
+        )
+        if results["email_sent"]:
+            return f"\n\n📧 **One confirmation email for all {len(items)} booking(s) sent to {user_email}**"
+        if results.get("queued"):
+            return f"\n\n📬 **All {len(items)} booking(s) will be included in your itinerary email to {user_email}**"
+        return "\n\n⚠️ **Email notification failed**"
+    except Exception as e:
+        logger.error(f"❌ {title} notification error: {e}", exc_info=True)
+        return "\n\n⚠️ **Could not send email notification**"
+
+
+async def book_itinerary(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Book travel, accommodation and sightseeing together, for every one whose
+    details are complete, with one consolidated confirmation email.
+
+    Args:
+        email_now: Send this confirmation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
+    state = tool_context.state
+    planned, already_booked, not_booked = [], {}, {}
+    try:
+        for booking_type, (label, check, request, prepare) in BOOKERS.items():
+            readiness = check(tool_context)
+            if readiness["status"] != "ready_to_book":
+                not_booked[booking_type] = readiness["missing_fields"]
+                continue
+            dedup_key, duplicate = find_duplicate(state, booking_type, request(state))
+            if duplicate:
+                already_booked[booking_type] = duplicate[f"{booking_type}_details"]
+                continue
+            planned.append((booking_type, dedup_key, prepare(state)))
+    except Exception as e:
+        logger.error(f"❌ Itinerary booking failed, nothing booked: {e}", exc_info=True)
+        return {
+            "action": "book_itinerary",
+            "status": "error",
+            "message": f"Failed to book the itinerary (nothing was booked): {str(e)}"
+        }
+
+    if not planned and not already_booked:
+        missing = "; ".join(f"{BOOKERS[t][0]}: {', '.join(fields)}" for t, fields in not_booked.items())
+        return {
+            "action": "book_itinerary",
+            "status": "missing_data",
+            "message": f"Nothing is ready to book. Missing details - {missing}",
+            "missing_fields": not_booked
+        }
+
+    for booking_type, _, details in planned:
+        record_booking(state, booking_type, details)
+
+    notification_msg = ""
+    if planned:
+        notification_msg = await _notify(
+            tool_context, "Itinerary Confirmed",
+            [_summary_item(booking_type, details) for booking_type, _, details in planned], "Traveler",
+            immediate=email_now
+        )
+
+    lines = ["✅ **ITINERARY BOOKED**\n"]
+    for booking_type, _, details in planned:
+        item = _summary_item(booking_type, details)
+        amount = billed_amount(booking_type, details)
+        price_info = f" - ₹{amount}" if amount > 0 else " - price to be confirmed"
+        lines.append(f"🎫 {item['booking_type']}: `{item['booking_id']}`{price_info}")
+    for booking_type, details in already_booked.items():
+        lines.append(f"♻️ {BOOKERS[booking_type][0]}: already booked as `{_summary_item(booking_type, details)['booking_id']}`")
+    for booking_type, fields in not_booked.items():
+        lines.append(f"⏸️ {BOOKERS[booking_type][0]}: not booked (missing {', '.join(fields)})")
+    total = sum(billed_amount(booking_type, details) for booking_type, _, details in planned)
+    if total > 0:
+        lines.append(f"\n💰 **Total for new bookings:** ₹{total}")
+
+    bookings = {booking_type: details for booking_type, _, details in planned}
+    # A retried single-item booking call gets the booking made here
+    for booking_type, dedup_key, details in planned:
+        remember_booking(state, dedup_key, {
+            "action": f"book_{booking_type}",
+            "status": "success",
+            "message": f"✅ {BOOKERS[booking_type][0]} booking confirmed: `{_summary_item(booking_type, details)['booking_id']}`",
+            f"{booking_type}_details": details
+        })
+
+    logger.info(f"✅ Itinerary booked: {', '.join(bookings) or 'nothing new'}")
+    return {
+        "action": "book_itinerary",
+        "status": "success",
+        "message": "\n".join(lines) + notification_msg,
+        "bookings": bookings,
+        "already_booked": already_booked,
+        "not_booked": not_booked,
+        "total_amount": total
+    }
+
+
+async def cancel_trip(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Cancel every active booking of the trip with one consolidated cancellation email
+
+    Args:
+        email_now: Send this cancellation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
+    try:
+        trip_plan = tool_context.state.get("trip_plan") or {}
+        active = [(booking_type, trip_plan[booking_type]) for booking_type in BOOKERS
+                  if isinstance(trip_plan.get(booking_type), dict)]
+
+        if not active:
+            return {
+                "action": "cancel_trip",
+                "status": "not_found",
+                "message": "❌ No active bookings found to cancel."
+            }
+
+        for booking_type, details in active:
+            record_cancellation(tool_context.state, booking_type, details)
+
+        notification_msg = await _notify(
+            tool_context, "Trip Cancelled",
+            [_summary_item(booking_type, details, status="CANCELLED",
+                           cancellation_reason="User requested cancellation")
+             for booking_type, details in active],
+            "Traveler", immediate=email_now
+        )
+
+        lines = ["✅ **TRIP CANCELLED**\n"]
+        for booking_type, details in active:
+            lines.append(f"❌ {BOOKERS[booking_type][0]}: `{_summary_item(booking_type, details)['booking_id']}`")
+        refund = sum(billed_amount(booking_type, details) for booking_type, details in active)
+        if refund > 0:
+            lines.append(f"\n💰 **Total Refund:** ₹{refund} (processed within 5-7 business days)")
+
+        logger.info(f"✅ Trip cancelled: {len(active)} booking(s), refund ₹{refund}")
+
+        return {
+            "action": "cancel_trip",
+            "status": "success",
+            "message": "\n".join(lines) + notification_msg + "\n\n💡 You can make a new booking anytime!",
+            "cancelled_bookings": dict(active),
+            "total_refund": refund
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Cancel trip failed: {str(e)}", exc_info=True)
+        return {
+            "action": "cancel_trip",
+            "status": "error",
+            "message": f"Failed to cancel the trip: {str(e)}"
+        }
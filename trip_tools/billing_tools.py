@@ -230,6 +230,18 @@ def calculate_trip_bill(tool_context: ToolContext) -> dict:
 def get_trip_total(tool_context: ToolContext) -> dict:
     """Quick function to get just the total amount"""
     try:
+        # Materialized from the booking event log (see booking_events)
+        totals = tool_context.state.get("booking_totals")
+        if totals is not None:
+            total = totals["total"]
+            logger.info(f"💵 Total from booking totals: ₹{total}")
+            return {
+                "action": "get_total",
+                "status": "success",
+                "message": f"**Total trip cost: ₹{total}**",
+                "total_amount": total
+            }
+
         trip_plan = tool_context.state.get("trip_plan", {})
         
         total = 0
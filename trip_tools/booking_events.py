@@ -0,0 +1,174 @@
+"""
+Append-only booking event log with materialized projections
+
+Every booking change is recorded as an event: booked, modified (a booking
+replaced by a new one of the same type), cancelled and refunded. The
+``booking_events`` table is the log and the source of truth. These state keys
+are projections of it:
+
+    trip_plan[<type>]       the active booking of each type
+    cancelled_bookings      cancelled bookings, oldest first
+    booking_totals          active amount per type, their total, and refunds
+
+Each event updates the projections incrementally when it is recorded, so a
+tool never rebuilds them. ``rebuild(state, events)`` replays a log from
+scratch, for example after a state was edited by hand.
+
+New events wait in ``state["booking_events"]`` until the end of the turn, when
+``core.serving.save_adk_state`` appends them to the table and empties the
+list, so the session state never carries the whole history.
+``state["booking_event_seq"]`` numbers events across those flushes; an event
+whose number another worker's copy of the session already used is renumbered
+when it is appended. The table
+keeps the ``bookings`` rows in step and answers history queries
+(``db_manager.get_booking_events``).
+"""
+import copy
+from datetime import datetime, UTC
+from typing import Any, Dict, Iterable, List, Optional
+from .idempotency import BOOKING_IDS
+
+STATE_KEY = "booking_events"
+# Sequence number of the session's next event
+SEQ_KEY = "booking_event_seq"
+EVENT_TYPES = ("booked", "modified", "cancelled", "refunded")
+BOOKING_TYPES = tuple(BOOKING_IDS)
+
+# Field each booking type is billed (and refunded) by, as in billing_tools
+BILLED_FIELDS = {
+    "travel": "price",
+    "accommodation": "total_price",
+    "sightseeing": "budget",
+}
+
+
+def billed_amount(booking_type: str, details: Dict[str, Any]) -> int:
+    """Amount a booking is billed for; 0 when it has no price yet"""
+    try:
+        return int(float(details.get(BILLED_FIELDS[booking_type]) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _booking_id(booking_type: str, details: Dict[str, Any]) -> Optional[str]:
+    _, id_key = BOOKING_IDS[booking_type]
+    return details.get(id_key)
+
+
+def _initial_totals(trip_plan: Dict) -> Dict[str, Any]:
+    """Totals to start from: bookings made before the log existed still count"""
+    active = {booking_type: billed_amount(booking_type, trip_plan[booking_type]) for booking_type in BOOKING_TYPES
+              if isinstance(trip_plan.get(booking_type), dict)}
+    return {"active": active, "total": sum(active.values()), "refunded": 0}
+
+
+def apply_event(state: Dict, event: Dict) -> None:
+    """Update the projections in ``state`` for one event"""
+    booking_type = event["booking_type"]
+    trip_plan = state.get("trip_plan") or {}
+    totals = state.get("booking_totals") or _initial_totals(trip_plan)
+
+    if event["event_type"] in ("booked", "modified"):
+        trip_plan[booking_type] = copy.deepcopy(event["details"])
+        totals["active"][booking_type] = event["amount"]
+    elif event["event_type"] == "cancelled":
+        current = trip_plan.get(booking_type)
+        if isinstance(current, dict) and (_booking_id(booking_type, current) or "N/A") == event["booking_id"]:
+            del trip_plan[booking_type]
+            totals["active"].pop(booking_type, None)
+        cancelled = state.get("cancelled_bookings") or []
+        cancelled.append({
+            "type": booking_type,
+            "booking_id": event["booking_id"],
+            "details": copy.deepcopy(event["details"]),
+            "cancelled_at": event["at"],
+        })
+        state["cancelled_bookings"] = cancelled
+    elif event["event_type"] == "refunded":
+        totals["refunded"] += event["amount"]
+        for cancelled in reversed(state.get("cancelled_bookings") or []):
+            if cancelled["booking_id"] == event["booking_id"]:
+                cancelled["refund"] = event["amount"]
+                break
+
+    totals["total"] = sum(totals["active"].values())
+    state["trip_plan"] = trip_plan
+    state["booking_totals"] = totals
+
+
+def record_event(state: Dict, event_type: str, booking_type: str, details: Dict[str, Any],
+                 amount: Optional[int] = None, **extra: Any) -> Dict:
+    """
+    Append an event to the session's log and apply it to the projections
+
+    Returns:
+        The recorded event
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown booking event type: {event_type}")
+    if booking_type not in BILLED_FIELDS:
+        raise ValueError(f"Unknown booking type: {booking_type}")
+
+    events = state.get(STATE_KEY) or []
+    seq = state.get(SEQ_KEY, events[-1]["seq"] + 1 if events else 0)
+    event = {
+        "seq": seq,
+        "event_type": event_type,
+        "booking_type": booking_type,
+        "booking_id": _booking_id(booking_type, details) or "N/A",
+        "amount": billed_amount(booking_type, details) if amount is None else amount,
+        "details": copy.deepcopy(details),
+        "at": datetime.now(UTC).isoformat(),
+        **extra,
+    }
+    events.append(event)
+    state[STATE_KEY] = events
+    state[SEQ_KEY] = seq + 1
+    apply_event(state, event)
+    return event
+
+
+def record_booking(state: Dict, booking_type: str, details: Dict[str, Any]) -> Dict:
+    """Record a new booking: ``booked``, or ``modified`` when it replaces the active one of its type"""
+    current = (state.get("trip_plan") or {}).get(booking_type)
+    previous_id = _booking_id(booking_type, current) if isinstance(current, dict) else None
+    if previous_id:
+        return record_event(state, "modified", booking_type, details, previous_booking_id=previous_id)
+    return record_event(state, "booked", booking_type, details)
+
+
+def record_cancellation(state: Dict, booking_type: str, details: Dict[str, Any]) -> List[Dict]:
+    """Record a cancellation, followed by its refund when the booking had been paid for"""
+    events = [record_event(state, "cancelled", booking_type, details)]
+    if events[0]["amount"] > 0:
+        events.append(record_event(state, "refunded", booking_type, details))
+    return events
+
+
+def project(events: Iterable[Dict]) -> Dict[str, Any]:
+    """Projections built from an event log alone"""
+    projected: Dict[str, Any] = {"trip_plan": {}, "cancelled_bookings": [], "booking_totals": _initial_totals({})}
+    for event in events:
+        apply_event(projected, event)
+    return projected
+
+
+def rebuild(state: Dict, events: Optional[Iterable[Dict]] = None) -> None:
+    """
+    Recompute the projections in ``state`` by replaying a full event log
+
+    ``events`` is the session's log, e.g. ``db_manager.get_session_event_log``;
+    it defaults to the events still held in the state, which is the whole
+    log only until the first flush to the ``booking_events`` table.
+    With no events the state is left as it is. Entries of ``trip_plan`` that
+    are not bookings are kept.
+    """
+    events = list((state.get(STATE_KEY) or []) if events is None else events)
+    if not events:
+        return
+    projected = project(events)
+    trip_plan = {key: value for key, value in (state.get("trip_plan") or {}).items() if key not in BOOKING_TYPES}
+    trip_plan.update(projected["trip_plan"])
+    state["trip_plan"] = trip_plan
+    state["cancelled_bookings"] = projected["cancelled_bookings"]
+    state["booking_totals"] = projected["booking_totals"]
@@ -1,5 +1,6 @@
 from google.adk.tools.tool_context import ToolContext
 from tools.search_tool import perform_search
+from .price_index import index_search_result
 
 async def search_and_store(query: str, tool_context: ToolContext) -> dict:
     if not query or query.strip() == "":
@@ -12,6 +13,8 @@ async def search_and_store(query: str, tool_context: ToolContext) -> dict:
     result = await perform_search(tool_context, query)
 
     tool_context.state["conversation_result"] = result["output"]
+    # Parse prices once here so booking tools can look them up by route / place
+    index_search_result(tool_context.state, str(result["output"]))
 
     return {
         "action": "search_and_store",
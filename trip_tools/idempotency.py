@@ -0,0 +1,91 @@
+"""
+Idempotent booking tools
+
+Models retry: the same ``book_*`` call can arrive two or three times for one
+request. Without a guard each retry generates a new ticket ID, sends another
+confirmation email and replaces the booking (and its cost) in the trip plan.
+
+Each booking tool derives an idempotency key from its normalized inputs
+(the state fields it books from). Before doing any work it looks the key up
+in ``state["booking_dedup"]``. Because that index lives in the session state,
+keys are scoped to the session. A hit returns the stored result unchanged,
+with no price lookup, new ID or email. An entry only counts while its booking
+is still the one in ``trip_plan`` and is younger than ``DEDUP_WINDOW_SECONDS``,
+so cancelling and booking again, or booking the same thing later on purpose,
+still goes through.
+"""
+import copy
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from core.metrics import registry
+
+STATE_KEY = "booking_dedup"
+DEDUP_WINDOW_SECONDS = 600
+MAX_ENTRIES = 20
+
+# trip_plan section and the result field holding the booking's ID, per booking type
+BOOKING_IDS = {
+    "travel": ("travel_details", "ticket_id"),
+    "accommodation": ("accommodation_details", "booking_id"),
+    "sightseeing": ("sightseeing_details", "booking_id"),
+}
+
+dedup_hits = registry.counter("trip_booking_dedup_hits_total", "Repeated booking calls answered from the dedup index",
+                              ("booking_type",))
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def booking_key(booking_type: str, params: Dict[str, Any]) -> str:
+    """Stable key for a booking request: its type plus normalized, non-empty parameters"""
+    normalized = {name: _normalize(value) for name, value in params.items() if value not in (None, "", 0)}
+    payload = json.dumps([booking_type, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def _booking_id(booking_type: str, result: Dict) -> Optional[str]:
+    details_key, id_key = BOOKING_IDS[booking_type]
+    return (result.get(details_key) or {}).get(id_key)
+
+
+def find_duplicate(state: Dict, booking_type: str, params: Dict[str, Any]) -> Tuple[str, Optional[Dict]]:
+    """
+    Look up a booking request
+
+    Returns:
+        (key, stored result or None). The result is a copy marked
+        ``"deduplicated": True``.
+    """
+    key = booking_key(booking_type, params)
+    entry = (state.get(STATE_KEY) or {}).get(key)
+    if entry is None or time.time() - entry["at"] > DEDUP_WINDOW_SECONDS:
+        return key, None
+
+    current = (state.get("trip_plan") or {}).get(booking_type)
+    booking_id = _booking_id(booking_type, entry["result"])
+    _, id_key = BOOKING_IDS[booking_type]
+    if not isinstance(current, dict) or current.get(id_key) != booking_id:
+        return key, None  # cancelled or replaced since
+
+    dedup_hits.labels(booking_type).inc()
+    logger.info("♻️ Repeated {} booking request answered with {}", booking_type, booking_id)
+    return key, {**copy.deepcopy(entry["result"]), "deduplicated": True}
+
+
+def remember_booking(state: Dict, key: str, result: Dict) -> None:
+    """Store a booking tool's result under its key (keeping the newest MAX_ENTRIES)"""
+    index = dict(state.get(STATE_KEY) or {})
+    index[key] = {"at": time.time(), "result": result}
+    if len(index) > MAX_ENTRIES:
+        for old in sorted(index, key=lambda k: index[k]["at"])[:len(index) - MAX_ENTRIES]:
+            del index[old]
+    state[STATE_KEY] = index
@@ -0,0 +1,166 @@
+"""
+Structured price candidates extracted from search results
+
+``search_and_store`` parses each result once into price candidates (what the
+price is for, min/max, unit) and keeps them in ``state["price_index"]``,
+indexed by booking type and entity. The booking tools then look up the price
+for the route / hotel location / attraction being booked instead of taking
+whichever ``₹`` number comes first in ``conversation_result``.
+
+Each search's candidates replace earlier ones for the same entity and keep
+the rest, so searching hotels after trains doesn't lose the train fares.
+"""
+import re
+from typing import Dict, List, Optional
+from loguru import logger
+
+STATE_KEY = "price_index"
+MAX_CANDIDATES = 200
+
+PRICE_RE = re.compile(r"(?:₹|rs\.?|inr)\s*([\d,]+)(?:\s*(?:-|–|to)\s*(?:₹|rs\.?|inr)?\s*([\d,]+))?", re.IGNORECASE)
+MODE_RE = re.compile(r"\b(train|flight|bus|car|cab|plane|metro|tram|ferry)s?\b", re.IGNORECASE)
+PLACE = r"[A-Z][A-Za-z]+(?:\s[A-Z][A-Za-z]+)?"
+ROUTE_RE = re.compile(rf"\b({PLACE})\s+(?:to|-|–|→)\s+({PLACE})")
+LOCATION_RE = re.compile(rf"\b(?:in|at|near)\s+({PLACE})")
+# "Amber Fort (₹500)" -- the name right before a parenthesised price
+NAME_BEFORE_PRICE_RE = re.compile(r"([A-Z][\w'’]*(?:\s+(?:of\s+|the\s+)?[A-Z][\w'’]*)*)\s*\(\s*$")
+# "Amber Fort (Jaipur): ..." / "Amber Fort: ..." / "Amber Fort - ..." at the start of a line
+LEADING_NAME_RE = re.compile(r"^[\s\-*•\d.)]*\**([A-Z][^:(\-–*]*?)\**\s*(?:\(([^)₹]+)\))?\s*(?::|-|–)")
+
+ACCOMMODATION_WORDS = re.compile(r"\b(hotel|hotels|stay|resort|hostel|room|rooms|accommodation|per night|/\s*night)\b", re.IGNORECASE)
+SIGHTSEEING_WORDS = re.compile(r"\b(entry|entrance|admission|fee|fort|palace|temple|museum|tomb|tour|cruise|ghat|beach|sightseeing)\b", re.IGNORECASE)
+
+
+def _amount(text: str) -> int:
+    return int(text.replace(",", ""))
+
+
+def _unit(context: str) -> Optional[str]:
+    if re.search(r"per\s+night|/\s*night|a\s+night", context, re.IGNORECASE):
+        return "night"
+    if re.search(r"per\s+(?:person|head|adult)|\bpp\b", context, re.IGNORECASE):
+        return "person"
+    if re.search(r"\btotal\b", context, re.IGNORECASE):
+        return "total"
+    return None
+
+
+def _key(*parts: Optional[str]) -> str:
+    return ">".join(p.strip().lower() for p in parts if p)
+
+
+def extract_price_candidates(text: str) -> List[Dict]:
+    """
+    Parse every price in a free-text search result
+
+    Returns:
+        list of dicts with kind ('travel' / 'accommodation' / 'sightseeing' / None),
+        entity (index key), location, mode, min, max, unit and the context snippet
+    """
+    candidates = []
+    for line in (text or "").splitlines():
+        leading = LEADING_NAME_RE.match(line)
+        start = 0
+        for match in PRICE_RE.finditer(line):
+            segment = line[start:match.end()]
+            start = match.end()
+            low = _amount(match.group(1))
+            high = _amount(match.group(2)) if match.group(2) else low
+            candidate = {
+                "kind": None, "entity": None, "location": None, "mode": None,
+                "min": min(low, high), "max": max(low, high),
+                "unit": _unit(line[match.start():match.end() + 20]) or _unit(segment),
+                "context": line.strip()[:160],
+            }
+
+            route = ROUTE_RE.search(line)
+            mode = MODE_RE.search(segment) or MODE_RE.search(line)
+            location = LOCATION_RE.search(line)
+            named = NAME_BEFORE_PRICE_RE.search(line[:match.start()])
+            if route and mode:
+                candidate.update(kind="travel", entity=_key(route.group(1), route.group(2)),
+                                 mode=mode.group(1).lower().replace("plane", "flight"))
+            elif ACCOMMODATION_WORDS.search(segment) or candidate["unit"] == "night":
+                place = (leading and leading.group(2)) or (location and location.group(1))
+                name = leading.group(1) if leading else None
+                candidate.update(kind="accommodation", entity=_key(place or name), location=place)
+            elif named or leading or SIGHTSEEING_WORDS.search(segment):
+                name = named.group(1) if named else (leading.group(1) if leading else None)
+                place = (leading and leading.group(2)) or (location and location.group(1))
+                candidate.update(kind="sightseeing", entity=_key(name or place), location=place)
+            candidates.append(candidate)
+    return candidates
+
+
+def build_price_index(candidates: List[Dict], previous: Optional[Dict] = None) -> Dict:
+    """
+    Index candidates by kind and entity, keeping earlier entries for entities not seen again
+
+    The result is JSON-safe so it can live in session state:
+    {"candidates": [...], "by_entity": {kind: {entity: [positions]}}}
+    """
+    seen = {(c["kind"], c["entity"]) for c in candidates}
+    kept = [c for c in (previous or {}).get("candidates", []) if (c["kind"], c["entity"]) not in seen]
+    merged = (candidates + kept)[:MAX_CANDIDATES]
+
+    by_entity: Dict[str, Dict[str, List[int]]] = {}
+    for position, candidate in enumerate(merged):
+        kind = candidate["kind"] or "unclassified"
+        entities = by_entity.setdefault(kind, {})
+        keys = {candidate["entity"] or ""}
+        if candidate.get("location"):
+            keys.add(candidate["location"].lower())  # attractions are findable by city too
+        for key in keys:
+            entities.setdefault(key, []).append(position)
+    return {"candidates": merged, "by_entity": by_entity}
+
+
+def index_search_result(state, text: str) -> Dict:
+    """Parse a search result into ``state[STATE_KEY]``; returns the new index"""
+    candidates = extract_price_candidates(text)
+    index = build_price_index(candidates, state.get(STATE_KEY))
+    state[STATE_KEY] = index
+    logger.debug("💰 Indexed {} price candidate(s) from search result", len(candidates))
+    return index
+
+
+def lookup_price(state, kind: str, entity: Optional[str] = None,
+                 destination: Optional[str] = None, mode: Optional[str] = None) -> Optional[Dict]:
+    """
+    Best price candidate for a booking, or None
+
+    Args:
+        state: session state holding the index (built from conversation_result if absent)
+        kind: 'travel', 'accommodation' or 'sightseeing'
+        entity: origin for travel; location or attraction name otherwise
+        destination: travel destination (the route is matched in either direction)
+        mode: preferred travel mode
+
+    The entity's own candidates win; otherwise the first candidate of ``kind``
+    (then one we could not classify) is used, so a result that only quotes a
+    single price still works. Ties are broken by position in the search result.
+    """
+    index = state.get(STATE_KEY)
+    if index is None:
+        if not state.get("conversation_result"):
+            return None
+        index = index_search_result(state, state.get("conversation_result", ""))
+
+    candidates = index["candidates"]
+    entities = index["by_entity"].get(kind, {})
+    if kind == "travel" and entity and destination:
+        keys = [_key(entity, destination), _key(destination, entity)]
+    else:
+        keys = [_key(entity)] if entity else []
+
+    positions = next((entities[k] for k in keys if k in entities), None)
+    if positions is None:
+        positions = [p for ps in entities.values() for p in ps] or \
+            [p for ps in index["by_entity"].get("unclassified", {}).values() for p in ps]
+    if not positions:
+        return None
+
+    matches = [candidates[p] for p in sorted(set(positions))]
+    if mode:
+        matches = [c for c in matches if c.get("mode") == mode.lower()] or matches
+    return matches[0]
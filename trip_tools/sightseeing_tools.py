@@ -9,6 +9,9 @@ from loguru import logger
 
 # ✅ IMPORT NOTIFICATION SERVICE
 from core.notifications import notification_service
+from .booking_events import record_booking, record_cancellation
+from .idempotency import find_duplicate, remember_booking
+from .price_index import lookup_price
 
 
 def parse_sightseeing_details(tool_context: ToolContext, user_input: str) -> dict:
@@ -162,33 +165,55 @@ def plan_sightseeing(tool_context: ToolContext) -> dict:
         }
 
 
-async def book_sightseeing(tool_context: ToolContext) -> dict:
-    """Book sightseeing with email notification and optional pricing."""
-    trip_plan = tool_context.state.get("trip_plan", {})
+def sightseeing_request(state) -> dict:
+    """The state fields a sightseeing booking is made from (its idempotency key)"""
+    return {
+        "location": state.get("sightseeing_location", "your selected location"),
+        "date": state.get("sightseeing_date"), "budget": state.get("sightseeing_budget", 0),
+    }
+
 
-    location = tool_context.state.get("sightseeing_location", "your selected location")
-    date = tool_context.state.get("sightseeing_date")
-    budget = tool_context.state.get("sightseeing_budget", 0)
+def prepare_sightseeing_booking(state) -> dict:
+    """Price a sightseeing booking and assign its ID from the state, without recording it"""
+    location = state.get("sightseeing_location", "your selected location")
+    date = state.get("sightseeing_date")
+    budget = state.get("sightseeing_budget", 0)
 
     if budget == 0:
-        conversation_result = tool_context.state.get("conversation_result", "")
-        price_match = re.search(r'₹\s*(\d+)', conversation_result)
-        if price_match:
-            budget = int(price_match.group(1))
+        candidate = lookup_price(state, "sightseeing", state.get("sightseeing_location"))
+        if candidate:
+            budget = candidate["min"]
 
     location_code = location[:3].upper() if location else "SSG"
     date_code = date.replace("-", "") if date else datetime.now().strftime("%Y%m%d")
     booking_id = f"SSG-{location_code}-{date_code}-{str(uuid.uuid4())[:8].upper()}"
 
-    sightseeing = {
+    return {
         "location": location,
         "date": date,
         "budget": budget,
         "booking_id": booking_id
     }
 
-    trip_plan["sightseeing"] = sightseeing
-    tool_context.state.update({"trip_plan": trip_plan})
+
+async def book_sightseeing(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Book sightseeing with email notification and optional pricing.
+
+    Args:
+        email_now: Send this confirmation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
+    # A retried call for the same outing gets the original booking back
+    dedup_key, duplicate = find_duplicate(tool_context.state, "sightseeing", sightseeing_request(tool_context.state))
+    if duplicate:
+        return duplicate
+
+    sightseeing = prepare_sightseeing_booking(tool_context.state)
+    location, date = sightseeing["location"], sightseeing["date"]
+    budget, booking_id = sightseeing["budget"], sightseeing["booking_id"]
+
+    record_booking(tool_context.state, "sightseeing", sightseeing)
     
     user_email = tool_context.state.get("user_email")
     user_name = tool_context.state.get("user_name", "Traveler")
@@ -204,12 +229,16 @@ async def book_sightseeing(tool_context: ToolContext) -> dict:
                 user_name=user_name,
                 booking_type="Sightseeing",
                 booking_details=sightseeing,
-                booking_id=booking_id
+                booking_id=booking_id,
+                immediate=email_now,
+                session_id=tool_context.state.get("session_id")
             )
             
             if results["email_sent"]:
                 notification_msg = f"\n\n📧 **Confirmation email sent to {user_email}**"
                 logger.info(f"✅ Sightseeing email sent to {user_email}")
+            elif results.get("queued"):
+                notification_msg = f"\n\n📬 **Confirmation will be included in your itinerary email to {user_email}**"
             else:
                 notification_msg = f"\n\n⚠️ **Email notification failed**"
                 logger.warning(f"❌ Sightseeing email failed for {user_email}")
@@ -226,7 +255,7 @@ async def book_sightseeing(tool_context: ToolContext) -> dict:
     else:
         price_info = "💰 Price to be confirmed"
 
-    return {
+    result = {
         "action": "book_sightseeing",
         "status": "success",
         "message": (
@@ -239,11 +268,19 @@ async def book_sightseeing(tool_context: ToolContext) -> dict:
         ),
         "sightseeing_details": sightseeing
     }
+    remember_booking(tool_context.state, dedup_key, result)
+    return result
 
 
 # ✅ NEW: CANCEL SIGHTSEEING BOOKING
-async def cancel_sightseeing_booking(tool_context: ToolContext) -> dict:
-    """Cancel sightseeing booking with email notification"""
+async def cancel_sightseeing_booking(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Cancel sightseeing booking with email notification
+
+    Args:
+        email_now: Send this cancellation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
     try:
         trip_plan = tool_context.state.get("trip_plan", {})
         
@@ -258,17 +295,7 @@ async def cancel_sightseeing_booking(tool_context: ToolContext) -> dict:
         booking_id = sightseeing.get('booking_id', 'N/A')
         budget = sightseeing.get('budget', 0)
         
-        cancelled_bookings = tool_context.state.get("cancelled_bookings", [])
-        cancelled_bookings.append({
-            "type": "sightseeing",
-            "booking_id": booking_id,
-            "details": sightseeing,
-            "cancelled_at": datetime.now().isoformat()
-        })
-        tool_context.state["cancelled_bookings"] = cancelled_bookings
-        
-        del trip_plan['sightseeing']
-        tool_context.state["trip_plan"] = trip_plan
+        record_cancellation(tool_context.state, "sightseeing", sightseeing)
         
         user_email = tool_context.state.get("user_email")
         user_name = tool_context.state.get("user_name", "Traveler")
@@ -290,11 +317,15 @@ async def cancel_sightseeing_booking(tool_context: ToolContext) -> dict:
                     user_name=user_name,
                     booking_type="SIGHTSEEING - CANCELLED",
                     booking_details=cancellation_details,
-                    booking_id=booking_id
+                    booking_id=booking_id,
+                    immediate=email_now,
+                    session_id=tool_context.state.get("session_id")
                 )
                 
                 if results["email_sent"]:
                     notification_msg = f"\n\n📧 **Cancellation confirmation sent to {user_email}**"
+                elif results.get("queued"):
+                    notification_msg = f"\n\n📬 **Cancellation will be included in your itinerary email to {user_email}**"
                 else:
                     notification_msg = f"\n\n⚠️ **Email notification failed**"
                     
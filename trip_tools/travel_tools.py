@@ -8,6 +8,9 @@ from loguru import logger
 
 # ✅ IMPORT NOTIFICATION SERVICE
 from core.notifications import notification_service
+from .booking_events import record_booking, record_cancellation
+from .idempotency import find_duplicate, remember_booking
+from .price_index import lookup_price
 
 from core.ticket_utils import (
     generate_pnr, generate_ticket_number, generate_boarding_pass,
@@ -140,24 +143,22 @@ def check_travel_state(tool_context: ToolContext) -> dict:
         }
 
 
-async def book_travel(tool_context: ToolContext) -> dict:
-    """Book travel with email notification."""
-    trip_plan = tool_context.state.get("trip_plan", {})
-    mode = tool_context.state.get("travel_mode")
-    
-    price = tool_context.state.get("travel_price")
-    
+def travel_request(state) -> dict:
+    """The state fields a travel booking is made from (its idempotency key)"""
+    return {
+        "from": state.get("travel_from"), "to": state.get("travel_to"),
+        "date": state.get("travel_date"), "mode": state.get("travel_mode"),
+        "transport_name": state.get("transport_name"), "price": state.get("travel_price"),
+    }
+
+
+def prepare_travel_booking(state) -> dict:
+    """Price and ticket a travel booking from the state, without recording it"""
+    mode = state.get("travel_mode")
+    price = state.get("travel_price")
     if not price:
-        conversation_result = tool_context.state.get("conversation_result", "")
-        price_match = re.search(r'₹\s*(\d+)\s*-\s*₹\s*(\d+)', conversation_result)
-        if price_match:
-            price = int(price_match.group(1))
-        else:
-            price_match = re.search(r'₹\s*(\d+)', conversation_result)
-            if price_match:
-                price = int(price_match.group(1))
-            else:
-                price = 0
+        candidate = lookup_price(state, "travel", state.get("travel_from"), state.get("travel_to"), mode)
+        price = candidate["min"] if candidate else 0
 
     id_map = {
         "train": generate_pnr,
@@ -166,24 +167,38 @@ async def book_travel(tool_context: ToolContext) -> dict:
         "ferry": generate_ferry_ticket,
         "metro": generate_metro_token,
         "tram": generate_tram_pass,
-        "cab": lambda: "CAB-" + tool_context.state.get("travel_from", "")[:2].upper() + "-" + tool_context.state.get("travel_to", "")[:2].upper(),
-        "car": lambda: "CAR-" + tool_context.state.get("travel_date", "").replace("-", "")
+        "cab": lambda: "CAB-" + state.get("travel_from", "")[:2].upper() + "-" + state.get("travel_to", "")[:2].upper(),
+        "car": lambda: "CAR-" + state.get("travel_date", "").replace("-", "")
     }
 
-    travel_id = id_map.get(mode, lambda: "TKT-UNKNOWN")()
-
-    travel = {
-        "from": tool_context.state.get("travel_from"),
-        "to": tool_context.state.get("travel_to"),
-        "date": tool_context.state.get("travel_date"),
+    return {
+        "from": state.get("travel_from"),
+        "to": state.get("travel_to"),
+        "date": state.get("travel_date"),
         "mode": mode,
-        "transport_name": tool_context.state.get("transport_name"),
+        "transport_name": state.get("transport_name"),
         "price": price,
-        "ticket_id": travel_id
+        "ticket_id": id_map.get(mode, lambda: "TKT-UNKNOWN")()
     }
 
-    trip_plan["travel"] = travel
-    tool_context.state["trip_plan"] = trip_plan
+
+async def book_travel(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Book travel with email notification.
+
+    Args:
+        email_now: Send this confirmation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
+    # A retried call for the same trip gets the original booking back
+    dedup_key, duplicate = find_duplicate(tool_context.state, "travel", travel_request(tool_context.state))
+    if duplicate:
+        return duplicate
+
+    travel = prepare_travel_booking(tool_context.state)
+    mode, price, travel_id = travel["mode"], travel["price"], travel["ticket_id"]
+
+    record_booking(tool_context.state, "travel", travel)
 
     user_email = tool_context.state.get("user_email")
     user_name = tool_context.state.get("user_name", "Traveler")
@@ -199,12 +214,16 @@ async def book_travel(tool_context: ToolContext) -> dict:
                 user_name=user_name,
                 booking_type="Travel",
                 booking_details=travel,
-                booking_id=travel_id
+                booking_id=travel_id,
+                immediate=email_now,
+                session_id=tool_context.state.get("session_id")
             )
             
             if results["email_sent"]:
                 notification_msg = f"\n\n📧 **Confirmation email sent to {user_email}**"
                 logger.info(f"✅ Travel booking email sent successfully to {user_email}")
+            elif results.get("queued"):
+                notification_msg = f"\n\n📬 **Confirmation will be included in your itinerary email to {user_email}**"
             else:
                 notification_msg = f"\n\n⚠️ **Email notification failed**"
                 logger.warning(f"❌ Travel booking email failed for {user_email}")
@@ -219,7 +238,7 @@ async def book_travel(tool_context: ToolContext) -> dict:
     transport_info = f" via {travel['transport_name']}" if travel.get('transport_name') else ""
     price_info = f"Estimated cost: ₹{price}." if price > 0 else "Price to be confirmed."
     
-    return {
+    result = {
         "action": "book_travel",
         "status": "success",
         "message": (
@@ -233,11 +252,19 @@ async def book_travel(tool_context: ToolContext) -> dict:
         ),
         "travel_details": travel
     }
+    remember_booking(tool_context.state, dedup_key, result)
+    return result
 
 
 # ✅ NEW: CANCEL TRAVEL BOOKING
-async def cancel_travel_booking(tool_context: ToolContext) -> dict:
-    """Cancel travel booking with email notification"""
+async def cancel_travel_booking(tool_context: ToolContext, email_now: bool = False) -> dict:
+    """
+    Cancel travel booking with email notification
+
+    Args:
+        email_now: Send this cancellation right away instead of holding it for
+            the itinerary email; set it only when the user asks for the email now.
+    """
     try:
         trip_plan = tool_context.state.get("trip_plan", {})
         
@@ -252,18 +279,7 @@ async def cancel_travel_booking(tool_context: ToolContext) -> dict:
         travel_id = travel.get('ticket_id', 'N/A')
         price = travel.get('price', 0)
         
-        # Store in cancelled history
-        cancelled_bookings = tool_context.state.get("cancelled_bookings", [])
-        cancelled_bookings.append({
-            "type": "travel",
-            "booking_id": travel_id,
-            "details": travel,
-            "cancelled_at": datetime.now().isoformat()
-        })
-        tool_context.state["cancelled_bookings"] = cancelled_bookings
-        
-        del trip_plan['travel']
-        tool_context.state["trip_plan"] = trip_plan
+        record_cancellation(tool_context.state, "travel", travel)
         
         user_email = tool_context.state.get("user_email")
         user_name = tool_context.state.get("user_name", "Traveler")
@@ -285,11 +301,15 @@ async def cancel_travel_booking(tool_context: ToolContext) -> dict:
                     user_name=user_name,
                     booking_type="TRAVEL - CANCELLED",
                     booking_details=cancellation_details,
-                    booking_id=travel_id
+                    booking_id=travel_id,
+                    immediate=email_now,
+                    session_id=tool_context.state.get("session_id")
                 )
                 
                 if results["email_sent"]:
                     notification_msg = f"\n\n📧 **Cancellation confirmation sent to {user_email}**"
+                elif results.get("queued"):
+                    notification_msg = f"\n\n📬 **Cancellation will be included in your itinerary email to {user_email}**"
                 else:
                     notification_msg = f"\n\n⚠️ **Email notification failed**"
                     
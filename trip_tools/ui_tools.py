@@ -39,8 +39,8 @@ async def identify_user(tool_context: ToolContext, user_input: str) -> str:
                 
                 logger.info(f"✅ Returning user: {existing_user.name} ({user_id})")
                 
-                # ✅ LOAD LAST ACTIVE SESSION
-                sessions = await db_manager.list_user_sessions(user_id, active_only=True)
+                # ✅ LOAD LAST ACTIVE SESSION (only the most recent one is needed)
+                sessions, _ = await db_manager.list_user_sessions_page(user_id, limit=1, active_only=True)
                 
                 if sessions:
                     last_session = sessions[0]  # Most recent